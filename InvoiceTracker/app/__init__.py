@@ -6,16 +6,18 @@ import os
 import logging
 import urllib.parse
 
-from flask import Flask, session, request, redirect, url_for, flash
+import click
+from flask import Flask, session, request, redirect, url_for, flash, jsonify
 from dotenv import load_dotenv
+from werkzeug.local import LocalProxy
 
-from .extensions import db, migrate, csrf, login_manager
+from . import db_pool, db_routing, membership
+from .extensions import db, csrf, login_manager
 from .blueprints import register_blueprints
-from .cli import register_cli
 # Import wszystkich modeli - wymagane dla Alembic autogenerate
 from .models import (
     Account, AccountScheduleSettings, Case, Invoice,
-    NotificationLog, NotificationSettings, SyncStatus, User
+    NotificationLog, NotificationOutbox, NotificationSettings, SyncStatus, User
 )
 
 load_dotenv()
@@ -50,8 +52,13 @@ def create_app(config_class=None):
     # Rejestracja blueprintów
     register_blueprints(app)
 
-    # Rejestracja komend CLI
-    register_cli(app)
+    # Komendy CLI i Flask-Migrate (flask db) - tylko gdy aplikacje tworzy komenda flask;
+    # proces web (gunicorn) nie importuje modulu CLI ani alembic
+    if _is_cli_app():
+        from flask_migrate import Migrate
+        from .cli import register_cli
+        Migrate(app, db)
+        register_cli(app)
 
     # Middleware i context processors
     _register_middleware(app)
@@ -60,6 +67,24 @@ def create_app(config_class=None):
     return app
 
 
+def _is_cli_app():
+    """Czy aplikacja jest tworzona przez komende flask (ScriptInfo.load_app w kontekscie click)."""
+    return click.get_current_context(silent=True) is not None
+
+
+def _default_pool_profile():
+    """
+    Profil puli gdy DB_POOL_PROFILE nie jest ustawiony.
+
+    Komendy flask (flask db upgrade, przebudowy i backfille) - profil cli bez
+    statement_timeout: migracje na duzych kontach nie sa przerywane w polowie.
+    "flask run" (serwer deweloperski) i procesy web - profil domyslny.
+    """
+    if _is_cli_app() and click.get_current_context().info_name != 'run':
+        return db_pool.CLI_PROFILE
+    return db_pool.DEFAULT_PROFILE
+
+
 def _configure_app(app, config_class):
     """Konfiguruje aplikację Flask."""
     # Secret key
@@ -97,6 +122,23 @@ def _configure_app(app, config_class):
     app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Pula polaczen wg roli procesu: web (App Engine) / worker (zadania w tle) / cli
+    app.config['DB_POOL_PROFILE'] = os.environ.get('DB_POOL_PROFILE') or _default_pool_profile()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_pool.build_engine_options(app.config['DB_POOL_PROFILE'], db_uri)
+    log.info(f"DB Pool: profil '{app.config['DB_POOL_PROFILE']}' {db_pool.get_profile(app.config['DB_POOL_PROFILE'])}")
+
+    # Replika odczytu (opcjonalna) - listy, raporty, eksporty (app/db_routing.py)
+    replica_uri = os.environ.get('SQLALCHEMY_REPLICA_URI')
+    replica_instance = os.environ.get('REPLICA_INSTANCE_CONNECTION_NAME')
+    if is_app_engine and replica_instance:
+        replica_uri = f"postgresql+psycopg2://{db_user}:{safe_password}@/{db_name}?host=/cloudsql/{replica_instance}"
+    if replica_uri:
+        app.config['SQLALCHEMY_BINDS'] = db_routing.build_replica_bind(
+            replica_uri, db_pool.build_engine_options(app.config['DB_POOL_PROFILE'], replica_uri)
+        )
+        log.info(f"DB Replica: {replica_uri.split('@')[0].split('://')[0]}://***")
+    app.config['REPLICA_STALENESS_SECONDS'] = int(os.environ.get('REPLICA_STALENESS_SECONDS', 15))
+
     # Legacy SMTP config (fallback)
     app.config['INFAKT_API_KEY'] = os.environ.get('INFAKT_API_KEY')
     app.config['SMTP_SERVER'] = os.environ.get('SMTP_SERVER')
@@ -105,6 +147,41 @@ def _configure_app(app, config_class):
     app.config['SMTP_PASSWORD'] = os.environ.get('SMTP_PASSWORD')
     app.config['EMAIL_FROM'] = os.environ.get('EMAIL_FROM', app.config.get('SMTP_USERNAME'))
 
+    # Przechowywanie tresci NotificationLog: 'template' | 'compressed' | 'inline'
+    app.config['NOTIFICATION_BODY_STORAGE'] = os.environ.get('NOTIFICATION_BODY_STORAGE', 'template')
+
+    # Cache statystyk per konto (lokalny LRU + opcjonalnie wspolny Redis)
+    app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL')
+    app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 300))
+    app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+
+    # Cache procesu uzytkownikow i dostepu do kont (sekundy, 0 = tylko w zakresie zadania)
+    app.config['MEMBERSHIP_CACHE_TTL'] = int(os.environ.get('MEMBERSHIP_CACHE_TTL', 0))
+
+    # Instrumentacja zapytan SQL per zadanie (opcjonalna) + progi ostrzezen w logu
+    app.config['SQL_INSTRUMENTATION'] = os.environ.get('SQL_INSTRUMENTATION', 'false').lower() == 'true'
+    app.config['SQL_WARN_QUERIES'] = int(os.environ.get('SQL_WARN_QUERIES', 100))
+    app.config['SQL_WARN_DB_TIME_MS'] = int(os.environ.get('SQL_WARN_DB_TIME_MS', 1000))
+    app.config['SQL_WARN_REPEATED'] = int(os.environ.get('SQL_WARN_REPEATED', 20))
+
+    # Endpointy /diagnostics/* (dane calego procesu, wszystkich kont) - tylko dla tych
+    # uzytkownikow (email, lista po przecinku); pusta = endpointy wylaczone, zostaje CLI
+    app.config['DIAGNOSTICS_ADMIN_EMAILS'] = {
+        email.strip().lower()
+        for email in os.environ.get('DIAGNOSTICS_ADMIN_EMAILS', '').split(',')
+        if email.strip()
+    }
+
+    # Rejestr wolnych zapytan z planem EXPLAIN (ms, 0 = wylaczony) + rozmiar bufora
+    app.config['SLOW_QUERY_MS'] = int(os.environ.get('SLOW_QUERY_MS', 0))
+    app.config['SLOW_QUERY_LOG_SIZE'] = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 100))
+
+    # Szablony: katalog bytecode cache Jinja (brak = katalog tymczasowy, pusty = wylaczony;
+    # przy CACHE_REDIS_URL bytecode w Redis) + cache HTML wierszy list spraw (0 = wylaczony)
+    app.config['JINJA_BYTECODE_CACHE_DIR'] = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 5000))
+    app.config['FRAGMENT_CACHE_TTL'] = int(os.environ.get('FRAGMENT_CACHE_TTL', 3600))
+
     if not app.config['INFAKT_API_KEY']:
         log.warning("Brak INFAKT_API_KEY!")
     if not all([app.config['SMTP_SERVER'], app.config['SMTP_USERNAME'], app.config['SMTP_PASSWORD']]):
@@ -114,7 +191,6 @@ def _configure_app(app, config_class):
 def _init_extensions(app):
     """Inicjalizuje rozszerzenia Flask."""
     db.init_app(app)
-    migrate.init_app(app, db)
     csrf.init_app(app)
 
     # Flask-Login initialization
@@ -122,8 +198,8 @@ def _init_extensions(app):
 
     @login_manager.user_loader
     def load_user(user_id):
-        """Flask-Login user loader callback."""
-        return User.query.get(int(user_id))
+        """Flask-Login user loader callback (cache uzytkownikow - app.membership)."""
+        return membership.load_user(int(user_id))
 
     # Exempt tasks blueprint from CSRF (called by Cloud Tasks, not browser)
     from .blueprints.tasks import tasks_bp
@@ -133,9 +209,31 @@ def _init_extensions(app):
     from .extensions import configure_tenant_filtering
     configure_tenant_filtering(app)
 
+    # Cache statystyk per konto + uniewaznianie po zapisach
+    from .cache import configure_cache
+    configure_cache(app)
+
+    # Cache uzytkownikow i dostepu do kont + uniewaznianie po zmianach
+    membership.configure_membership(app)
+
+    # Replika odczytu - odczyty z bazy glownej po wlasnym zapisie uzytkownika
+    db_routing.configure_db_routing(app)
+
+    # Metryki SQL (cache kompilacji zapytan, opcjonalnie instrumentacja per zadanie)
+    from .sql_metrics import configure_sql_metrics
+    configure_sql_metrics(app)
+
+    # Rejestr wolnych zapytan (EXPLAIN, bufor cykliczny)
+    from .slow_queries import configure_slow_queries
+    configure_slow_queries(app)
+
     # Dodaj min do Jinja2
     app.jinja_env.globals.update(min=min)
 
+    # Bytecode cache szablonow + cache fragmentow wierszy list spraw (cached_row)
+    from .template_cache import configure_template_cache
+    configure_template_cache(app)
+
 
 def _register_middleware(app):
     """Rejestruje middleware i context processors."""
@@ -149,8 +247,8 @@ def _register_middleware(app):
         UPDATED: Filtruje po dostępie użytkownika (User.accounts).
         """
         if current_user.is_authenticated:
-            # Zwróć tylko konta do których użytkownik ma dostęp
-            accounts = current_user.get_accessible_accounts()
+            # Zwróć tylko konta do których użytkownik ma dostęp (id + nazwa, cache membership)
+            accounts = membership.get_active_account_refs(current_user.id)
             return dict(active_accounts=accounts)
         return dict(active_accounts=[])
 
@@ -164,8 +262,8 @@ def _register_middleware(app):
         """
         account_id = session.get('current_account_id')
         if account_id:
-            account = Account.query.get(account_id)
-            return dict(current_account=account)
+            # Leniwie - zapytanie tylko gdy szablon uzyje current_account (raz na zadanie)
+            return dict(current_account=LocalProxy(lambda: membership.get_current_account(account_id)))
         return dict(current_account=None)
 
     @app.before_request
@@ -189,8 +287,12 @@ def _register_middleware(app):
             'auth.logout',
             'sync.cron_run_sync',
             'sync.cron_run_mail',  # Cloud Tasks CRON endpoint - mail
+            'sync.cron_daily_snapshot',  # CRON endpoint - dzienne migawki kont
+            'sync.cron_drain_outbox',  # CRON endpoint - ponowienia wysylek z outboxa
             'tasks.run_sync_for_account',  # Cloud Tasks endpoint - sync
-            'tasks.run_mail_for_account'  # Cloud Tasks endpoint - mail
+            'tasks.run_mail_for_account',  # Cloud Tasks endpoint - mail
+            'tasks.drain_outbox',  # Cloud Tasks endpoint - outbox
+            'tasks.warmup'  # App Engine warmup (/_ah/warmup)
         }
 
         # Sprawdź czy to endpoint publiczny
@@ -202,17 +304,24 @@ def _register_middleware(app):
         if is_cli_bp:
             return None
 
+        # API (JSON) - bledy autoryzacji jako JSON zamiast przekierowania do logowania
+        is_api_bp = request.blueprint == 'api_v1'
+
         # KROK 1: Sprawdź autentykację (NAJPIERW!)
         if not current_user.is_authenticated:
             # Wyczyść ewentualne śmieci z sesji
             session.pop('current_account_id', None)
             session.pop('current_account_name', None)
             session.pop('logged_in', None)
+            if is_api_bp:
+                return jsonify({"success": False, "message": "Wymagane logowanie."}), 401
             flash("Musisz się zalogować, aby uzyskać dostęp.", "warning")
             return redirect(url_for('auth.login'))
 
         # KROK 2: Sprawdź wybór profilu
         if not session.get('current_account_id'):
+            if is_api_bp:
+                return jsonify({"success": False, "message": "Wybierz profil."}), 403
             flash("Wybierz profil aby kontynuować.", "warning")
             return redirect(url_for('auth.select_account'))
 
@@ -222,6 +331,8 @@ def _register_middleware(app):
             log.warning(f"Security Alert: User {current_user.id} tried accessing unauthorized account {account_id}")
             session.pop('current_account_id', None)
             session.pop('current_account_name', None)
+            if is_api_bp:
+                return jsonify({"success": False, "message": "Brak dostępu do tego profilu."}), 403
             flash("Brak dostępu do tego profilu.", "danger")
             return redirect(url_for('auth.select_account'))
 
@@ -1,8 +1,10 @@
 """
 Blueprinty aplikacji.
 """
+from .api import api_bp
 from .auth import auth_bp
 from .cases import cases_bp
+from .reports import reports_bp
 from .settings import settings_bp
 from .sync import sync_bp
 from .tasks import tasks_bp
@@ -15,8 +17,10 @@ def register_blueprints(app):
     Args:
         app: Instancja Flask application
     """
+    app.register_blueprint(api_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(cases_bp)
+    app.register_blueprint(reports_bp)
     app.register_blueprint(settings_bp)
     app.register_blueprint(sync_bp)
     app.register_blueprint(tasks_bp)
@@ -0,0 +1,102 @@
+"""
+Blueprint API odczytu (v1) - JSON dla integracji (BI / ERP).
+
+Tylko odczyt (GET), autoryzacja jak w aplikacji (sesja + wybrany profil).
+Odpowiedzi z ETag / Last-Modified wg Account.data_version - odpytywanie
+bez zmian danych konczy sie 304 bez zapytan list.
+
+Parametry list: fields, search, sort_by, sort_order, cursor, limit
+(+ show_unpaid dla zakonczonych).
+"""
+import logging
+
+from flask import Blueprint, request, session, jsonify
+
+from ..services import api_service
+from .conditional import conditional_on_data_version
+
+log = logging.getLogger(__name__)
+
+api_bp = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+def _error(message, status):
+    return jsonify({"success": False, "message": message}), status
+
+
+def _list_cases(scope, default_fields):
+    """Wspolna obsluga list spraw (aktywne / zakonczone)."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        return _error("Wybierz profil.", 403)
+
+    try:
+        fields = api_service.parse_fields(request.args.get('fields'), list(api_service.CASE_FIELDS), default_fields)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    result = api_service.list_cases(
+        account_id, scope, fields,
+        search_query=request.args.get('search', '').strip().lower(),
+        sort_by=request.args.get('sort_by', 'case_number'),
+        sort_order=request.args.get('sort_order', 'asc'),
+        show_unpaid=request.args.get('show_unpaid', '') == '1',
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', api_service.DEFAULT_LIMIT, type=int)
+    )
+    return jsonify({"success": True, "fields": fields, **result})
+
+
+@api_bp.route('/cases/active')
+@conditional_on_data_version
+def active_cases():
+    """Aktywne sprawy (filtry i sortowanie jak lista spraw aktywnych)."""
+    return _list_cases('active', api_service.DEFAULT_ACTIVE_FIELDS)
+
+
+@api_bp.route('/cases/completed')
+@conditional_on_data_version
+def completed_cases():
+    """Zakonczone sprawy (filtry i sortowanie jak lista zakonczonych)."""
+    return _list_cases('completed', api_service.DEFAULT_COMPLETED_FIELDS)
+
+
+@api_bp.route('/cases/<path:case_number>')
+@conditional_on_data_version
+def case_detail(case_number):
+    """Szczegoly sprawy (pole notifications - historia powiadomien)."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        return _error("Wybierz profil.", 403)
+
+    try:
+        fields = api_service.parse_fields(
+            request.args.get('fields'), api_service.DETAIL_FIELDS, api_service.DETAIL_FIELDS
+        )
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    item = api_service.get_case(account_id, case_number, fields)
+    if item is None:
+        return _error("Nie znaleziono sprawy.", 404)
+    return jsonify({"success": True, "data": item})
+
+
+@api_bp.route('/clients/<client_id>')
+@conditional_on_data_version
+def client_summary(client_id):
+    """Podsumowanie klienta z kartoteki (zadluzenie, liczby spraw, postep)."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        return _error("Wybierz profil.", 403)
+
+    available = list(api_service.CLIENT_FIELDS)
+    try:
+        fields = api_service.parse_fields(request.args.get('fields'), available, available)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    item = api_service.get_client_summary(account_id, client_id, fields)
+    if item is None:
+        return _error("Nie znaleziono klienta.", 404)
+    return jsonify({"success": True, "data": item})
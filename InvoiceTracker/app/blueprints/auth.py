@@ -5,7 +5,6 @@ Logowanie, wylogowanie, wybór profilu.
 UPDATED: Integracja z Flask-Login (User model zamiast .env credentials).
 """
 import os
-import requests
 from datetime import datetime
 from flask import Blueprint, render_template, redirect, url_for, flash, session, request
 from flask_login import login_user, logout_user, login_required, current_user
@@ -49,6 +48,7 @@ def verify_recaptcha_enterprise(token: str, action: str = 'REGISTER') -> bool:
             }
         }
 
+        import requests  # leniwie - tylko rejestracja (import requests wydluza zimny start)
         response = requests.post(url, json=payload, timeout=10)
         result = response.json()
 
@@ -4,18 +4,32 @@ Aktywne sprawy, zakonczone, szczegoly, klienci.
 """
 import logging
 
-from flask import Blueprint, render_template, redirect, url_for, request, flash, session
+from flask import Blueprint, render_template, redirect, url_for, request, flash, session, jsonify
 
 from ..models import Account
-from ..services import case_service, notification_service, payment_service
+from ..services import case_service, client_service, notification_service, payment_service
 from ..forms import MarkPaidForm, SendManualForm, ReopenCaseForm, ManualSyncForm
+from .conditional import conditional_on_data_version
 
 log = logging.getLogger(__name__)
 
 cases_bp = Blueprint('cases', __name__)
 
 
+def _list_cursor():
+    """
+    Kursor paginacji z URL.
+
+    Domyslnie listy uzywaja paginacji kursorowej (keyset). Parametr 'page'
+    (stare linki/zakladki) przelacza na paginacje numerowana.
+    """
+    if 'page' in request.args and 'cursor' not in request.args:
+        return None
+    return request.args.get('cursor', '')
+
+
 @cases_bp.route('/')
+@conditional_on_data_version
 def active_cases():
     """Lista aktywnych spraw windykacyjnych."""
     account_id = session.get('current_account_id')
@@ -32,7 +46,8 @@ def active_cases():
             sort_by=request.args.get('sort_by', 'case_number'),
             sort_order=request.args.get('sort_order', 'asc'),
             page=request.args.get('page', 1, type=int),
-            per_page=100
+            per_page=100,
+            cursor=_list_cursor()
         )
         return render_template('cases.html', sync_form=sync_form, **result)
     except Exception as e:
@@ -55,6 +70,7 @@ def active_cases():
 
 
 @cases_bp.route('/completed')
+@conditional_on_data_version
 def completed_cases():
     """Lista zakonczonych spraw windykacyjnych."""
     account_id = session.get('current_account_id')
@@ -70,7 +86,8 @@ def completed_cases():
             sort_order=request.args.get('sort_order', 'asc'),
             page=request.args.get('page', 1, type=int),
             per_page=100,
-            show_unpaid=request.args.get('show_unpaid', '') == '1'
+            show_unpaid=request.args.get('show_unpaid', '') == '1',
+            cursor=_list_cursor()
         )
         return render_template('completed.html', **result)
     except Exception as e:
@@ -92,6 +109,7 @@ def completed_cases():
 
 
 @cases_bp.route('/case/<path:case_number>')
+@conditional_on_data_version
 def case_detail(case_number):
     """Szczegoly sprawy windykacyjnej."""
     account_id = session.get('current_account_id')
@@ -112,7 +130,22 @@ def case_detail(case_number):
         return redirect(url_for('cases.active_cases'))
 
 
+@cases_bp.route('/notification/<int:log_id>/body')
+def notification_body(log_id):
+    """Tresc pojedynczego powiadomienia (JSON) - ladowana przy rozwinieciu podgladu."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        return jsonify({"success": False, "message": "Wybierz profil."}), 403
+
+    result = case_service.get_notification_body(account_id, log_id)
+    if not result:
+        return jsonify({"success": False, "message": "Nie znaleziono powiadomienia."}), 404
+
+    return jsonify({"success": True, **result})
+
+
 @cases_bp.route('/client/<client_id>')
+@conditional_on_data_version
 def client_cases(client_id):
     """Lista spraw dla konkretnego klienta."""
     account_id = session.get('current_account_id')
@@ -131,6 +164,50 @@ def client_cases(client_id):
         return redirect(url_for('cases.active_cases'))
 
 
+@cases_bp.route('/clients')
+@conditional_on_data_version
+def clients():
+    """Lista klientow z agregatami zadluzenia (kartoteka Client)."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        flash("Wybierz profil.", "warning")
+        return redirect(url_for('auth.select_account'))
+
+    try:
+        result = client_service.get_client_list(
+            account_id=account_id,
+            search_query=request.args.get('search', '').strip().lower(),
+            sort_by=request.args.get('sort_by', 'open_debt'),
+            sort_order=request.args.get('sort_order', 'desc'),
+            page=request.args.get('page', 1, type=int),
+            per_page=100,
+            debtors_only=request.args.get('debtors_only', '') == '1'
+        )
+        return render_template('clients.html', **result)
+    except Exception as e:
+        log.error(f"General error in clients: {e}", exc_info=True)
+        flash("Blad ladowania listy klientow.", "danger")
+        return redirect(url_for('cases.active_cases'))
+
+
+@cases_bp.route('/clients/top')
+@conditional_on_data_version
+def top_debtors():
+    """Najwieksi dluznicy (sortowanie po Client.open_debt bez agregacji przy odczycie)."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        flash("Wybierz profil.", "warning")
+        return redirect(url_for('auth.select_account'))
+
+    try:
+        result = client_service.get_top_debtors(account_id)
+        return render_template('clients.html', **result)
+    except Exception as e:
+        log.error(f"General error in top_debtors: {e}", exc_info=True)
+        flash("Blad ladowania listy dluznikow.", "danger")
+        return redirect(url_for('cases.active_cases'))
+
+
 @cases_bp.route('/mark_paid/<int:invoice_id>', methods=['POST'])
 def mark_invoice_paid(invoice_id):
     """Oznacza fakture jako oplacona (POST z CSRF)."""
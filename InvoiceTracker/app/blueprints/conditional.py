@@ -0,0 +1,112 @@
+"""
+Warunkowe odpowiedzi HTTP (ETag / Last-Modified) dla widokow konta.
+
+Widok oznaczony @conditional_on_data_version nie jest renderowany, gdy
+przegladarka ma aktualna wersje strony - odpowiedz 304 Not Modified kosztuje
+jedno zapytanie po PK konta zamiast zapytan listy i renderowania szablonu.
+
+ETag (slaby - tokeny CSRF w HTML roznia sie miedzy renderami) zalezy od:
+- Account.data_version (kazdy zapis danych konta)
+- uzytkownika i pelnego URL (parametry wyszukiwania, sortowania, strony)
+- daty (kolumna "dni po terminie" zmienia sie codziennie)
+- 30-minutowego okna czasu (token CSRF w formularzach wazny 1h)
+- wersji wdrozenia (GAE_VERSION - zmiany szablonow)
+
+Wersja odczytana przez dekorator jest zapamietywana dla zadania
+(data_version.set_request_data_version) - kazdy fragment strony trzymany
+w cache (liczniki, statystyki, raport wiekowania, wiersze list) jest
+kluczowany ta sama wersja co ETag. Strona z nowym ETag nie zawiera
+statystyk policzonych dla starszej wersji danych.
+"""
+import hashlib
+import os
+import time
+from datetime import date, datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+from ..db_routing import read_replica
+from ..services import data_version
+
+# Okno waznosci strony w cache przegladarki (sekundy)
+CSRF_WINDOW_SECONDS = 1800
+
+
+def _compute_etag(account_id, version, window):
+    """Buduje wartosc ETag dla biezacego zadania."""
+    parts = [
+        str(account_id),
+        str(version),
+        str(current_user.get_id() if current_user.is_authenticated else ''),
+        request.full_path,
+        date.today().isoformat(),
+        str(window),
+        os.environ.get('GAE_VERSION', ''),
+    ]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _last_modified(changed_at, window):
+    """Last-Modified: najpozniejsze z (zmiana danych, poczatek dnia, poczatek okna)."""
+    candidates = [
+        datetime.combine(date.today(), datetime.min.time()),
+        datetime.utcfromtimestamp(window * CSRF_WINDOW_SECONDS),
+    ]
+    if changed_at:
+        candidates.append(changed_at)
+    return max(candidates).replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _is_not_modified(etag, last_modified):
+    """Sprawdza naglowki If-None-Match / If-Modified-Since (If-None-Match ma pierwszenstwo)."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return request.if_modified_since >= last_modified
+    return False
+
+
+def conditional_on_data_version(view):
+    """
+    Dekorator widoku GET: ETag/Last-Modified z Account.data_version + 304.
+
+    Pomijany gdy brak wybranego konta. Gdy w sesji czekaja komunikaty flash
+    (strona musi je wyswietlic) odpowiedz nie ma ETag ani 304, ale wersja
+    danych i tak jest odczytana przed widokiem - klucz cache strony.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        account_id = session.get('current_account_id')
+        if request.method != 'GET' or not account_id:
+            return view(*args, **kwargs)
+
+        # Wersja odczytana PRZED renderowaniem - zapis w trakcie da nowy ETag.
+        # Z tego samego zrodla co listy (replika) - ETag nie wyprzedza tresci z opoznionej repliki.
+        with read_replica():
+            version, changed_at = data_version.get_data_version(account_id)
+        if version is None:
+            return view(*args, **kwargs)
+        # Ta sama wersja jest kluczem cache strony (liczniki, statystyki, wiersze list)
+        data_version.set_request_data_version(account_id, version)
+        if session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        window = int(time.time() // CSRF_WINDOW_SECONDS)
+        etag = _compute_etag(account_id, version, window)
+        last_modified = _last_modified(changed_at, window)
+
+        if _is_not_modified(etag, last_modified):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    return wrapper
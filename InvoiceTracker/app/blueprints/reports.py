@@ -0,0 +1,161 @@
+"""
+Blueprint raportow.
+Raport wiekowania naleznosci (HTML + CSV strumieniowo), trendy z dziennych migawek,
+eksport spraw i historii powiadomien (CSV / NDJSON strumieniowo).
+"""
+import logging
+from datetime import date, datetime
+
+from flask import Blueprint, Response, render_template, redirect, url_for, request, flash, session, stream_with_context
+
+from ..services import export_service, report_service, snapshot_service
+from .conditional import conditional_on_data_version
+
+log = logging.getLogger(__name__)
+
+reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+
+@reports_bp.route('/aging')
+@conditional_on_data_version
+def aging_report():
+    """Raport wiekowania naleznosci aktywnych spraw."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        flash("Wybierz profil.", "warning")
+        return redirect(url_for('auth.select_account'))
+
+    try:
+        report = report_service.get_aging_report(account_id)
+        return render_template('reports_aging.html', **report)
+    except Exception as e:
+        log.error(f"General error in aging_report: {e}", exc_info=True)
+        flash("Blad generowania raportu wiekowania.", "danger")
+        return redirect(url_for('cases.active_cases'))
+
+
+@reports_bp.route('/aging.csv')
+def aging_report_csv():
+    """
+    Raport wiekowania jako CSV (odpowiedz strumieniowa).
+
+    Parametr detail=1 - lista faktur z przedzialem zamiast podsumowania.
+    """
+    account_id = session.get('current_account_id')
+    if not account_id:
+        flash("Wybierz profil.", "warning")
+        return redirect(url_for('auth.select_account'))
+
+    detail = request.args.get('detail', '') == '1'
+    filename = f"wiekowanie_{'faktury_' if detail else ''}{date.today().isoformat()}.csv"
+
+    # stream_with_context - kontekst zadania (tenant, sesja DB) zyje do konca generatora
+    return Response(
+        stream_with_context(report_service.iter_aging_csv(account_id, detail=detail)),
+        mimetype='text/csv; charset=utf-8',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@reports_bp.route('/trends')
+@conditional_on_data_version
+def trends():
+    """Trendy konta z dziennych migawek (AccountDailySnapshot)."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        flash("Wybierz profil.", "warning")
+        return redirect(url_for('auth.select_account'))
+
+    try:
+        result = snapshot_service.get_trend(account_id, request.args.get('days', 30, type=int))
+        return render_template('reports_trends.html', **result)
+    except Exception as e:
+        log.error(f"General error in trends: {e}", exc_info=True)
+        flash("Blad ladowania trendow.", "danger")
+        return redirect(url_for('cases.active_cases'))
+
+
+def _parse_date(value):
+    """Data z parametru URL (YYYY-MM-DD) lub None."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
+def _export_response(generator, fmt, name):
+    """Odpowiedz strumieniowa eksportu (plik do pobrania)."""
+    filename = f"{name}_{date.today().isoformat()}.{fmt}"
+    # stream_with_context - kontekst zadania (tenant, sesja DB) zyje do konca generatora
+    return Response(
+        stream_with_context(generator),
+        mimetype=export_service.EXPORT_MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@reports_bp.route('/export/active.<fmt>')
+def export_active_cases(fmt):
+    """Eksport aktywnych spraw - parametry search/sort_by/sort_order jak lista spraw."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        flash("Wybierz profil.", "warning")
+        return redirect(url_for('auth.select_account'))
+    if fmt not in export_service.EXPORT_FORMATS:
+        flash("Nieobslugiwany format eksportu.", "warning")
+        return redirect(url_for('cases.active_cases'))
+
+    generator = export_service.iter_active_cases(
+        account_id, fmt,
+        search_query=request.args.get('search', '').strip().lower(),
+        sort_by=request.args.get('sort_by', 'case_number'),
+        sort_order=request.args.get('sort_order', 'asc')
+    )
+    return _export_response(generator, fmt, 'sprawy_aktywne')
+
+
+@reports_bp.route('/export/completed.<fmt>')
+def export_completed_cases(fmt):
+    """Eksport zakonczonych spraw - parametry search/sort_by/sort_order/show_unpaid jak lista."""
+    account_id = session.get('current_account_id')
+    if not account_id:
+        flash("Wybierz profil.", "warning")
+        return redirect(url_for('auth.select_account'))
+    if fmt not in export_service.EXPORT_FORMATS:
+        flash("Nieobslugiwany format eksportu.", "warning")
+        return redirect(url_for('cases.completed_cases'))
+
+    generator = export_service.iter_completed_cases(
+        account_id, fmt,
+        search_query=request.args.get('search', '').strip().lower(),
+        sort_by=request.args.get('sort_by', 'case_number'),
+        sort_order=request.args.get('sort_order', 'asc'),
+        show_unpaid=request.args.get('show_unpaid', '') == '1'
+    )
+    return _export_response(generator, fmt, 'sprawy_zakonczone')
+
+
+@reports_bp.route('/export/notifications.<fmt>')
+def export_notifications(fmt):
+    """
+    Eksport historii powiadomien (bez tresci).
+
+    Parametry: search (faktura / klient / email), date_from, date_to (YYYY-MM-DD),
+    sort_order (po dacie wysylki, domyslnie desc).
+    """
+    account_id = session.get('current_account_id')
+    if not account_id:
+        flash("Wybierz profil.", "warning")
+        return redirect(url_for('auth.select_account'))
+    if fmt not in export_service.EXPORT_FORMATS:
+        flash("Nieobslugiwany format eksportu.", "warning")
+        return redirect(url_for('cases.active_cases'))
+
+    generator = export_service.iter_notifications(
+        account_id, fmt,
+        search_query=request.args.get('search', '').strip().lower(),
+        date_from=_parse_date(request.args.get('date_from')),
+        date_to=_parse_date(request.args.get('date_to')),
+        sort_order=request.args.get('sort_order', 'desc')
+    )
+    return _export_response(generator, fmt, 'powiadomienia')
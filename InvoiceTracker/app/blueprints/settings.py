@@ -9,6 +9,7 @@ from ..extensions import db
 from ..models import Account, Invoice, NotificationSettings, AccountScheduleSettings
 from ..constants import CANONICAL_NOTIFICATION_STAGES
 from ..forms import SettingsForm, EmailUpdateForm
+from ..services import data_version
 
 log = logging.getLogger(__name__)
 
@@ -122,6 +123,8 @@ def settings_view():
                 # Zapis do bazy
                 db.session.add(account)
                 db.session.add(schedule_settings)
+                # Dane firmowe (Account) nie sa sledzone automatycznie - jawna zmiana wersji
+                data_version.mark_account_changed(account_id)
                 db.session.commit()
 
                 flash("Wszystkie ustawienia zostały pomyślnie zapisane.", "success")
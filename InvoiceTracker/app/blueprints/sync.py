@@ -7,10 +7,14 @@ import logging
 from datetime import date, datetime, timedelta, timezone as dt_timezone, time as dt_time
 from zoneinfo import ZoneInfo
 
-from flask import Blueprint, render_template, redirect, url_for, request, flash, session, jsonify
+from flask import Blueprint, render_template, redirect, url_for, request, flash, session, jsonify, current_app
+from flask_login import current_user
 
+from .. import db_pool, slow_queries, sql_metrics
+from ..db_routing import replica_reads
+from ..extensions import db
 from ..models import Account, SyncStatus, AccountScheduleSettings
-from ..services import diagnostic_service
+from ..services import outbox_service, snapshot_service
 from ..services.cloud_tasks import enqueue_sync_task, enqueue_mail_task
 from ..forms import ManualSyncForm
 
@@ -195,6 +199,54 @@ def cron_run_mail():
     }), 202
 
 
+@sync_bp.route('/cron/drain_outbox')
+def cron_drain_outbox():
+    """
+    CRON endpoint - oproznianie outboxa powiadomien co 5 minut (cron.yaml).
+    Wysyla ponowienia po bledach SMTP (available_at minal) i przejmuje
+    porzucone wpisy "sending" - bez niego ponowienie czekaloby do kolejnej
+    wysylki konta (raz dziennie).
+    """
+    is_cron_request = request.headers.get('X-Appengine-Cron') == 'true'
+
+    is_local_dev = os.environ.get('GAE_ENV') != 'standard'
+    allow_local_cron = os.environ.get('ALLOW_LOCAL_CRON', 'false').lower() == 'true'
+
+    if not is_cron_request:
+        if is_local_dev and allow_local_cron:
+            log.info("[CRON Outbox] LOCAL DEV MODE: Pozwalam na wywolanie bez naglowka")
+        else:
+            log.warning("Nieautoryzowana proba wywolania /cron/drain_outbox")
+            return jsonify({"status": "ignored", "message": "Request not from App Engine Cron"}), 200
+
+    summary = outbox_service.drain_outbox(max_batches=outbox_service.CRON_MAX_BATCHES)
+    log.info(f"[CRON Outbox] {summary}")
+    return jsonify({"status": "ok", **summary}), 200
+
+
+@sync_bp.route('/cron/daily_snapshot')
+def cron_daily_snapshot():
+    """
+    CRON endpoint - dzienne migawki wszystkich aktywnych kont (AccountDailySnapshot).
+    Uruchamiany raz dziennie pod koniec dnia (cron.yaml).
+    """
+    is_cron_request = request.headers.get('X-Appengine-Cron') == 'true'
+
+    is_local_dev = os.environ.get('GAE_ENV') != 'standard'
+    allow_local_cron = os.environ.get('ALLOW_LOCAL_CRON', 'false').lower() == 'true'
+
+    if not is_cron_request:
+        if is_local_dev and allow_local_cron:
+            log.info("[CRON Snapshot] LOCAL DEV MODE: Pozwalam na wywolanie bez naglowka")
+        else:
+            log.warning("Nieautoryzowana proba wywolania /cron/daily_snapshot")
+            return jsonify({"status": "ignored", "message": "Request not from App Engine Cron"}), 200
+
+    summary = snapshot_service.take_snapshots_for_all_accounts()
+    log.info(f"[CRON Snapshot] Zapisano migawki: {summary['accounts']} kont, bledow: {summary['errors']}")
+    return jsonify({"status": "ok", **summary}), 200
+
+
 @sync_bp.route('/test/mail-debug/<int:account_id>')
 def test_mail_debug(account_id):
     """
@@ -217,7 +269,8 @@ def test_mail_debug(account_id):
     simulate_break = request.args.get('simulate_break', 'false').lower() == 'true'
     send_real_emails = request.args.get('send_real_emails', 'false').lower() == 'true'
 
-    # Uruchom diagnostyke przez serwis
+    # Uruchom diagnostyke przez serwis (modul ladowany dopiero przy uzyciu)
+    from ..services import diagnostic_service
     result = diagnostic_service.run_mail_diagnostic(
         account_id=account_id,
         simulate_break=simulate_break,
@@ -231,7 +284,72 @@ def test_mail_debug(account_id):
     return jsonify(result), 200
 
 
+def _diagnostics_forbidden():
+    """
+    Dostep do /diagnostics/* - tylko uzytkownicy z DIAGNOSTICS_ADMIN_EMAILS.
+
+    Returns:
+        Odpowiedz 403 lub None gdy dostep dozwolony
+    """
+    admins = current_app.config.get('DIAGNOSTICS_ADMIN_EMAILS') or set()
+    if not current_user.is_authenticated or (current_user.email or '').lower() not in admins:
+        return jsonify({"success": False, "error": "Forbidden - diagnostics admin only"}), 403
+    return None
+
+
+@sync_bp.route('/diagnostics/sql', methods=['GET', 'POST'])
+def sql_diagnostics():
+    """
+    ENDPOINT DIAGNOSTYCZNY - statystyki cache kompilacji zapytan SQL i puli polaczen (proces).
+    Tylko dla DIAGNOSTICS_ADMIN_EMAILS.
+
+    GET  - odczyt statystyk
+    POST - odczyt i wyzerowanie licznikow (token CSRF: pole csrf_token lub naglowek X-CSRFToken)
+    """
+    forbidden = _diagnostics_forbidden()
+    if forbidden:
+        return forbidden
+
+    stats = sql_metrics.get_compile_cache_stats()
+    pool_stats = db_pool.get_pool_stats(db.engine)
+    if request.method == 'POST':
+        sql_metrics.reset_compile_cache_stats()
+        db_pool.reset_pool_stats()
+    return jsonify({
+        "success": True,
+        "compile_cache": stats,
+        "pool": {"profile": current_app.config.get('DB_POOL_PROFILE'), **pool_stats},
+    }), 200
+
+
+@sync_bp.route('/diagnostics/slow-queries', methods=['GET', 'POST'])
+def slow_query_diagnostics():
+    """
+    ENDPOINT DIAGNOSTYCZNY - ostatnie wolne zapytania SQL z planem EXPLAIN (proces).
+    Bufor zawiera zapytania wszystkich kont - tylko dla DIAGNOSTICS_ADMIN_EMAILS.
+
+    GET  - odczyt bufora
+    POST - odczyt i wyczyszczenie bufora (token CSRF: pole csrf_token lub naglowek X-CSRFToken)
+
+    Parametry query:
+    - limit=N    : Liczba wpisow (domyslnie caly bufor)
+    """
+    forbidden = _diagnostics_forbidden()
+    if forbidden:
+        return forbidden
+
+    entries = slow_queries.get_slow_queries(request.args.get('limit', type=int))
+    if request.method == 'POST':
+        slow_queries.clear_slow_queries()
+    return jsonify({
+        "success": True,
+        "threshold_ms": slow_queries.get_threshold_ms(),
+        "entries": entries,
+    }), 200
+
+
 @sync_bp.route('/sync_status')
+@replica_reads
 def sync_status():
     """
     Panel monitorowania synchronizacji z filtrowaniem, paginacja i dashboard metrics.
@@ -1,12 +1,15 @@
 """
 Blueprint zadan w tle (Cloud Tasks).
 Endpoint wywolywany przez Cloud Tasks lub lokalny HTTP client.
+Zadanie rozgrzewajace App Engine (/_ah/warmup).
 """
 import logging
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 
 from ..services.update_db import run_full_sync
+from ..services import outbox_service
 from ..tenant_context import tenant_context
+from ..warmup import warm_up
 
 log = logging.getLogger(__name__)
 
@@ -144,3 +147,60 @@ def run_mail_for_account():
     except Exception as e:
         log.error(f"[Tasks] Error in mail task for account_id={account_id}: {e}", exc_info=True)
         return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@tasks_bp.route('/tasks/drain_outbox', methods=['POST'])
+def drain_outbox():
+    """
+    Endpoint oprozniajacy outbox powiadomien (partiami, SKIP LOCKED).
+    Moze byc wywolywany rownolegle przez wiele workerow.
+
+    Expected JSON body (opcjonalne):
+        {
+            "account_id": int,   # None = wszystkie konta
+            "batch_size": int,
+            "max_batches": int
+        }
+    """
+    if not _is_valid_task_request():
+        log.warning("[Tasks] Unauthorized request to /tasks/drain_outbox")
+        return jsonify({
+            'status': 'error',
+            'message': 'Unauthorized - not a valid task request'
+        }), 403
+
+    data = request.get_json(silent=True) or {}
+    account_id = data.get('account_id')
+    batch_size = data.get('batch_size') or outbox_service.DEFAULT_BATCH_SIZE
+    max_batches = data.get('max_batches')
+
+    try:
+        log.info(f"[Tasks] Draining outbox (account_id={account_id}, batch_size={batch_size})")
+        summary = outbox_service.drain_outbox(
+            account_id=account_id,
+            batch_size=batch_size,
+            max_batches=max_batches
+        )
+        log.info(f"[Tasks] Outbox drained: {summary}")
+
+        return jsonify({'status': 'success', 'summary': summary}), 200
+
+    except Exception as e:
+        log.error(f"[Tasks] Error draining outbox: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@tasks_bp.route('/_ah/warmup')
+def warmup():
+    """
+    Zadanie rozgrzewajace App Engine (app.yaml: inbound_services: - warmup).
+    Otwiera pule polaczen, kompiluje glowne szablony, laduje cache i moduly
+    zanim instancja dostanie ruch uzytkownikow.
+    """
+    try:
+        result = warm_up(current_app._get_current_object())
+        return jsonify({'status': 'success', **result}), 200
+
+    except Exception as e:
+        log.error(f"[Tasks] Warmup failed: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -0,0 +1,217 @@
+"""
+Cache statystyk per konto.
+
+Dwa poziomy:
+- lokalny LRU w procesie (zawsze) - ograniczona liczba wpisow + TTL
+- wspolny backend Redis (opcjonalnie, CACHE_REDIS_URL) - wspoldzielony miedzy
+  instancjami App Engine i workerami
+
+Uniewaznianie przez generacje konta: klucz wpisu zawiera numer generacji,
+a invalidate_account() zwieksza generacje - stare wpisy przestaja byc
+trafiane i wygasaja same (LRU / TTL). Bez Redis generacja jest lokalna dla
+procesu - inne instancje widza zmiane najpozniej po CACHE_TTL sekund.
+
+Zapisy zmieniajace dane konta (synchronizacja, oplacenie, przywrocenie,
+wysylka, ustawienia) zwiekszaja Account.data_version (models.bump_account_data_version),
+ktory planuje uniewaznienie - cache konta jest uniewazniany po COMMIT (nie
+przed - inne zadanie mogloby zapisac stan sprzed transakcji).
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 1024
+
+# Klucz w session.info - konta do uniewaznienia po COMMIT
+_PENDING_KEY = '_cache_invalidate_accounts'
+_KEY_PREFIX = 'invoicetracker'
+
+
+class LRUCache:
+    """Lokalny cache LRU z TTL (thread-safe)."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Zwraca wartosc lub None (brak / wygasly wpis).
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Zapisuje wartosc, usuwajac najdawniej uzywane wpisy ponad limit."""
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """Wspolny backend Redis. Bledy polaczenia traktowane jak brak wpisu."""
+
+    def __init__(self, url):
+        import redis  # opcjonalna zaleznosc - tylko gdy CACHE_REDIS_URL ustawiony
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key):
+        try:
+            raw = self._client.get(key)
+        except Exception as e:
+            log.warning(f"[cache] Redis GET nieudany: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        try:
+            self._client.set(key, json.dumps(value), ex=ttl)
+        except Exception as e:
+            log.warning(f"[cache] Redis SET nieudany: {e}")
+
+    def get_generation(self, account_id):
+        try:
+            return int(self._client.get(f"{_KEY_PREFIX}:gen:{account_id}") or 0)
+        except Exception as e:
+            log.warning(f"[cache] Redis odczyt generacji nieudany: {e}")
+            return None
+
+    def bump_generation(self, account_id):
+        try:
+            self._client.incr(f"{_KEY_PREFIX}:gen:{account_id}")
+        except Exception as e:
+            log.warning(f"[cache] Redis INCR generacji nieudany: {e}")
+
+
+# Stan modulu (ustawiany w configure_cache)
+_local = LRUCache()
+_shared = None
+_ttl = DEFAULT_TTL
+_generations = {}
+_generations_lock = threading.Lock()
+
+
+def _generation(account_id):
+    """Aktualna generacja konta (wspolna z Redis, lokalna jako fallback)."""
+    if _shared is not None:
+        generation = _shared.get_generation(account_id)
+        if generation is not None:
+            return generation
+    return _generations.get(account_id, 0)
+
+
+def get_or_compute(account_id, name, compute, ttl=None):
+    """
+    Zwraca wartosc z cache lub oblicza ja i zapisuje.
+
+    Args:
+        account_id: ID konta
+        name: Nazwa wpisu (np. "active_stats", "count:active:fraza")
+        compute: Funkcja bez argumentow zwracajaca wartosc (serializowalna do JSON)
+        ttl: Czas zycia w sekundach (domyslnie CACHE_TTL)
+
+    Returns:
+        Wartosc z cache lub wynik compute()
+    """
+    ttl = ttl if ttl is not None else _ttl
+    key = f"{_KEY_PREFIX}:acct:{account_id}:{_generation(account_id)}:{name}"
+
+    value = _local.get(key)
+    if value is not None:
+        return value
+
+    if _shared is not None:
+        value = _shared.get(key)
+        if value is not None:
+            _local.set(key, value, ttl)
+            return value
+
+    value = compute()
+    _local.set(key, value, ttl)
+    if _shared is not None:
+        _shared.set(key, value, ttl)
+    return value
+
+
+def invalidate_account(account_id):
+    """
+    Uniewaznia wszystkie wpisy cache konta.
+
+    Args:
+        account_id: ID konta
+    """
+    with _generations_lock:
+        _generations[account_id] = _generations.get(account_id, 0) + 1
+    if _shared is not None:
+        _shared.bump_generation(account_id)
+    log.debug(f"[cache] Uniewazniono cache konta {account_id}")
+
+
+def invalidate_account_on_commit(session, account_id):
+    """
+    Planuje uniewaznienie cache konta po zatwierdzeniu transakcji sesji.
+
+    Args:
+        session: Sesja SQLAlchemy
+        account_id: ID konta
+    """
+    if account_id is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(account_id)
+
+
+def configure_cache(app):
+    """
+    Konfiguruje backend cache i uniewaznianie po COMMIT.
+    Wywolywane w create_app() po init_app.
+    """
+    global _local, _shared, _ttl
+    from .extensions import db
+
+    _ttl = app.config.get('CACHE_TTL', DEFAULT_TTL)
+    _local = LRUCache(max_entries=app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES), ttl=_ttl)
+
+    _shared = None
+    redis_url = app.config.get('CACHE_REDIS_URL')
+    if redis_url:
+        try:
+            _shared = RedisBackend(redis_url)
+            log.info("[cache] Wspolny backend: Redis")
+        except ImportError:
+            log.warning("[cache] CACHE_REDIS_URL ustawiony, ale pakiet 'redis' nie jest zainstalowany - tylko cache lokalny")
+
+    @event.listens_for(db.session, 'after_commit')
+    def _invalidate_committed_accounts(session):
+        """Uniewaznia cache kont zmienionych w zatwierdzonej transakcji."""
+        for account_id in session.info.pop(_PENDING_KEY, ()):
+            invalidate_account(account_id)
@@ -21,6 +21,8 @@ def register_cli(app):
     @app.cli.command('archive-active-cases')
     def archive_active_cases_cli():
         """Archiwizuje wszystkie aktywne Cases dla Aquatest jako archived_before_reset"""
+        from .services.batch_scan import stream_scan
+
         print("=" * 80)
         print("ARCHIWIZACJA AKTYWNYCH SPRAW - Aquatest")
         print("=" * 80)
@@ -37,11 +39,12 @@ def register_cli(app):
         active_cases = Case.query.filter_by(
             account_id=account.id,
             status='active'
-        ).all()
+        ).order_by(Case.id)
+        active_count = active_cases.count()
 
-        print(f"\nZnaleziono {len(active_cases)} aktywnych spraw do archiwizacji")
+        print(f"\nZnaleziono {active_count} aktywnych spraw do archiwizacji")
 
-        if len(active_cases) == 0:
+        if active_count == 0:
             print("\nBrak aktywnych spraw do archiwizacji")
             print("=" * 80)
             return
@@ -55,11 +58,10 @@ def register_cli(app):
             print("=" * 80)
             return
 
-        # Archiwizuj Cases
+        # Archiwizuj Cases - partiami (flush + odlaczenie od sesji), jeden COMMIT na koncu
         archived_count = 0
-        for case in active_cases:
+        for case in stream_scan(active_cases, flush_batches=True):
             case.status = 'archived_before_reset'
-            db.session.add(case)
 
             # Dodaj wpis do NotificationLog
             log_entry = NotificationLog(
@@ -149,6 +151,8 @@ def register_cli(app):
     @app.cli.command('verify-sync-state')
     def verify_sync_state_cli():
         """Weryfikuje stan synchronizacji dla Aquatest"""
+        from .services.batch_scan import stream_scan
+
         print("=" * 80)
         print("WERYFIKACJA STANU SYNCHRONIZACJI - Aquatest")
         print("=" * 80)
@@ -169,16 +173,17 @@ def register_cli(app):
         active_cases = Case.query.filter_by(
             account_id=account.id,
             status='active'
-        ).all()
+        ).order_by(Case.id)
+        active_count = active_cases.count()
 
-        print(f"   Liczba aktywnych spraw: {len(active_cases)}")
+        print(f"   Liczba aktywnych spraw: {active_count}")
 
-        if active_cases:
+        if active_count:
             print(f"\n   Pierwsze 5 aktywnych spraw:")
-            for case in active_cases[:5]:
+            for case in active_cases.limit(5):
                 print(f"      - {case.case_number} (client: {case.client_company_name})")
-            if len(active_cases) > 5:
-                print(f"      ... i {len(active_cases) - 5} wiecej")
+            if active_count > 5:
+                print(f"      ... i {active_count - 5} wiecej")
 
         # === ORPHANED INVOICES ===
         print("\n" + "-" * 80)
@@ -191,13 +196,14 @@ def register_cli(app):
             Invoice.case_id == None,
             Invoice.left_to_pay > 0,
             Invoice.status.in_(['sent', 'printed'])
-        ).all()
+        ).order_by(Invoice.id)
+        orphaned_count = orphaned.count()
 
-        print(f"   Liczba orphaned invoices dla profilu {account.name}: {len(orphaned)}")
+        print(f"   Liczba orphaned invoices dla profilu {account.name}: {orphaned_count}")
 
-        if orphaned:
+        if orphaned_count:
             print(f"\n   Szczegoly:")
-            for inv in orphaned:
+            for inv in stream_scan(orphaned):
                 print(f"      - {inv.invoice_number}: {inv.left_to_pay/100.0:.2f} PLN (termin: {inv.payment_due_date})")
 
         # === OSTATNIE SYNCHRONIZACJE ===
@@ -780,3 +786,413 @@ def register_cli(app):
             print("   flask migrate-credentials")
 
         print("\n" + "=" * 60)
+
+    # ==========================================================================
+    # NOTIFICATION OUTBOX
+    # ==========================================================================
+
+    @app.cli.command('drain-outbox')
+    @click.option('--account-id', type=int, default=None,
+                  help='Ogranicz do jednego konta (domyslnie wszystkie)')
+    @click.option('--batch-size', type=int, default=50, help='Rozmiar partii')
+    @click.option('--loop', is_flag=True, default=False,
+                  help='Dzialaj w petli jako dlugo zyjacy worker')
+    @click.option('--interval', type=int, default=30,
+                  help='Przerwa miedzy przebiegami w trybie --loop (sekundy)')
+    def drain_outbox_cli(account_id, batch_size, loop, interval):
+        """
+        Oproznia outbox powiadomien (wysylka + NotificationLog w jednej transakcji).
+
+        Mozna uruchomic wiele workerow rownolegle - partie sa pobierane
+        przez SELECT ... FOR UPDATE SKIP LOCKED.
+
+        Użycie:
+            flask drain-outbox
+            flask drain-outbox --account-id 1 --batch-size 100
+            flask drain-outbox --loop --interval 30
+        """
+        import time
+        from .services.outbox_service import drain_outbox
+
+        while True:
+            summary = drain_outbox(account_id=account_id, batch_size=batch_size)
+            print(f"[{datetime.utcnow().isoformat()}] Outbox: wyslano={summary['sent']}, "
+                  f"bledy={summary['failed']}, ponowienia={summary['retry']}, "
+                  f"partie={summary['batches']}, zamkniete sprawy={summary['closed_cases']}, "
+                  f"usuniete stare wpisy={summary['purged']}")
+            if not loop:
+                break
+            time.sleep(interval)
+
+    @app.cli.command('backfill-case-progress')
+    @click.option('--account-id', type=int, default=None,
+                  help='Ogranicz do jednego konta (domyslnie wszystkie)')
+    def backfill_case_progress_cli(account_id):
+        """
+        Przelicza Case.max_stage / last_notified_at z historii NotificationLog.
+        Kartoteka klientow (Client.max_stage) zmienionych spraw jest
+        przeliczana w tej samej transakcji.
+
+        Użycie:
+            flask backfill-case-progress
+            flask backfill-case-progress --account-id 1
+        """
+        from .services.notification_service import recalculate_case_progress
+        from .tenant_context import tenant_context
+
+        print("=" * 60)
+        print("BACKFILL POSTEPU SPRAW (max_stage / last_notified_at)")
+        print("=" * 60)
+
+        query = Account.query
+        if account_id is not None:
+            query = query.filter_by(id=account_id)
+
+        total = 0
+        for account in query.order_by(Account.id).all():
+            with tenant_context(account.id):
+                updated = recalculate_case_progress(account.id)
+            total += updated
+            print(f"   {account.name} (ID: {account.id}): zaktualizowano {updated} spraw")
+
+        print(f"\nRazem zaktualizowano: {total} spraw")
+
+    @app.cli.command('rebuild-client-ledger')
+    @click.option('--account-id', type=int, default=None,
+                  help='Ogranicz do jednego konta (domyslnie wszystkie)')
+    def rebuild_client_ledger_cli(account_id):
+        """
+        Przebudowuje kartoteke klientow (Client) z agregatami spraw.
+
+        Użycie:
+            flask rebuild-client-ledger
+            flask rebuild-client-ledger --account-id 1
+        """
+        from .services.client_service import rebuild_client_ledger
+        from .tenant_context import tenant_context
+
+        print("=" * 60)
+        print("PRZEBUDOWA KARTOTEKI KLIENTOW")
+        print("=" * 60)
+
+        query = Account.query
+        if account_id is not None:
+            query = query.filter_by(id=account_id)
+
+        total = 0
+        for account in query.order_by(Account.id).all():
+            with tenant_context(account.id):
+                refreshed = rebuild_client_ledger(account.id)
+            total += refreshed
+            print(f"   {account.name} (ID: {account.id}): przeliczono {refreshed} klientow")
+
+        print(f"\nRazem przeliczono: {total} klientow")
+
+    @app.cli.command('take-daily-snapshots')
+    @click.option('--date', 'snapshot_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Dzien migawki YYYY-MM-DD (domyslnie dzisiaj)')
+    def take_daily_snapshots_cli(snapshot_date):
+        """
+        Zapisuje dzienne migawki wszystkich aktywnych kont (AccountDailySnapshot).
+
+        Użycie:
+            flask take-daily-snapshots
+            flask take-daily-snapshots --date 2026-10-18
+        """
+        from .services.snapshot_service import take_snapshots_for_all_accounts
+
+        print("=" * 60)
+        print("DZIENNE MIGAWKI KONT")
+        print("=" * 60)
+
+        summary = take_snapshots_for_all_accounts(snapshot_date.date() if snapshot_date else None)
+        print(f"Zapisano migawki: {summary['accounts']} kont, bledow: {summary['errors']}")
+
+    @app.cli.command('bench-case-lists')
+    @click.option('--account-id', type=int, required=True, help='ID konta z danymi do pomiaru')
+    @click.option('--per-page', 'per_page_values', default='100,1000', show_default=True,
+                  help='Rozmiary strony (po przecinku)')
+    @click.option('--repeat', type=int, default=5, show_default=True, help='Liczba powtorzen pomiaru czasu')
+    def bench_case_lists_cli(account_id, per_page_values, repeat):
+        """
+        Porownuje pobranie strony listy spraw: pary encji (Case, Invoice) vs projekcja kolumn.
+
+        Mierzy czas (mediana) i szczytowa pamiec (tracemalloc) zapytania strony
+        aktywnych spraw wraz z materializacja wierszy. Identity map czyszczona
+        przed kazdym pomiarem.
+
+        Użycie:
+            flask bench-case-lists --account-id 1
+            flask bench-case-lists --account-id 1 --per-page 100,1000 --repeat 10
+        """
+        import statistics
+        import time
+        import tracemalloc
+
+        from .services import case_service
+        from .tenant_context import tenant_context
+
+        def load_entities(per_page):
+            query = case_service.build_active_cases_query(account_id)
+            return case_service.order_cases(query, Case.case_number, 'asc').limit(per_page).all()
+
+        def load_projected(per_page):
+            query = case_service.build_active_cases_query(account_id).with_entities(
+                *case_service.ACTIVE_LIST_COLUMNS
+            )
+            return case_service.order_cases(query, Case.case_number, 'asc').limit(per_page).all()
+
+        print("=" * 60)
+        print("BENCHMARK STRONY LISTY SPRAW")
+        print("=" * 60)
+
+        with tenant_context(account_id):
+            for per_page in [int(value) for value in per_page_values.split(',') if value.strip()]:
+                print(f"\nper_page={per_page}")
+                for label, load in (('encje (Case, Invoice)', load_entities), ('projekcja kolumn', load_projected)):
+                    load(per_page)  # rozgrzewka (kompilacja zapytania, polaczenie)
+                    timings = []
+                    for _ in range(repeat):
+                        db.session.expunge_all()
+                        start = time.perf_counter()
+                        rows = load(per_page)
+                        timings.append(time.perf_counter() - start)
+
+                    db.session.expunge_all()
+                    tracemalloc.start()
+                    rows = load(per_page)
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+
+                    print(f"   {label:<24} wierszy={len(rows):<6} "
+                          f"mediana={statistics.median(timings) * 1000:8.2f} ms  "
+                          f"pamiec={peak / 1024:8.0f} KiB")
+                    db.session.expunge_all()
+
+    @app.cli.command('bench-credentials')
+    @click.option('--iterations', type=int, default=2000, show_default=True, help='Liczba odczytow')
+    def bench_credentials_cli(iterations):
+        """
+        Porownuje odczyt credentials konta: nowy Fernet + deszyfrowanie przy kazdym
+        odczycie vs wspoldzielony cipher i cache odszyfrowanych wartosci.
+
+        Odczyt jak przy wysylce maila i sprawdzaniu konfiguracji konta
+        (provider_settings, smtp_username, smtp_password). Konto testowe nie jest
+        zapisywane w bazie.
+
+        Użycie:
+            flask bench-credentials
+            flask bench-credentials --iterations 10000
+        """
+        import base64
+        import json
+        import time
+
+        from cryptography.fernet import Fernet
+
+        account = Account(name='bench-credentials', provider_type='infakt')
+        account.provider_settings = {'api_key': 'k' * 40}
+        account.smtp_server = 'smtp.example.com'
+        account.smtp_username = 'bench@example.com'
+        account.smtp_password = 'p' * 24
+        account.email_from = 'bench@example.com'
+
+        def uncached_cipher():
+            key_str = os.environ.get('ENCRYPTION_KEY', 'default_32_byte_key_for_dev!!!')
+            return Fernet(base64.urlsafe_b64encode(key_str.encode().ljust(32)[:32]))
+
+        def uncached_read():
+            settings = json.loads(uncached_cipher().decrypt(account._provider_settings_encrypted).decode())
+            username = uncached_cipher().decrypt(account._smtp_username_encrypted).decode()
+            password = uncached_cipher().decrypt(account._smtp_password_encrypted).decode()
+            return settings, username, password
+
+        def cached_read():
+            return account.provider_settings, account.smtp_username, account.smtp_password
+
+        print("=" * 60)
+        print("BENCHMARK ODCZYTU CREDENTIALS KONTA")
+        print("=" * 60)
+
+        assert uncached_read() == cached_read()
+        for label, read in (('bez cache (Fernet na odczyt)', uncached_read), ('cipher + cache wartosci', cached_read)):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                read()
+            elapsed = time.perf_counter() - start
+            print(f"   {label:<30} {iterations} odczytow: {elapsed * 1000:8.1f} ms "
+                  f"({elapsed / iterations * 1e6:7.1f} us/odczyt)")
+
+
+    @app.cli.command('bench-tenant-filter')
+    @click.option('--account-id', type=int, required=True, help='ID konta z danymi do pomiaru')
+    @click.option('--iterations', type=int, default=2000, show_default=True, help='Liczba wykonan kazdego zapytania')
+    def bench_tenant_filter_cli(account_id, iterations):
+        """
+        Mierzy narzut izolacji kont (filtr tenanta w do_orm_execute) na zapytanie.
+
+        Te same zapytania (z jawnym filtrem account_id) wykonywane w trybie sudo()
+        - bez filtra tenanta - i w tenant_context() - z filtrem. Dla kazdego trybu
+        czas na zapytanie i trafienia cache kompilacji SQLAlchemy.
+
+        Użycie:
+            flask bench-tenant-filter --account-id 1
+            flask bench-tenant-filter --account-id 1 --iterations 10000
+        """
+        import time
+
+        from . import sql_metrics
+        from .tenant_context import sudo, tenant_context
+
+        queries = (
+            ('lista spraw (Case)', lambda: (
+                Case.query.filter_by(account_id=account_id, status='active').order_by(Case.id).limit(20).all()
+            )),
+            ('join Case + Invoice', lambda: (
+                db.session.query(Case.id, Invoice.left_to_pay)
+                .join(Invoice, Case.id == Invoice.case_id)
+                .filter(Case.account_id == account_id)
+                .limit(20).all()
+            )),
+            ('NotificationLog po fakturze', lambda: (
+                NotificationLog.query.filter_by(account_id=account_id, invoice_number='bench').first()
+            )),
+        )
+        modes = (('sudo (bez filtra)', sudo), ('tenant_context (filtr)', lambda: tenant_context(account_id)))
+
+        print("=" * 60)
+        print("BENCHMARK NARZUTU FILTRA TENANTA")
+        print("=" * 60)
+
+        for query_label, run in queries:
+            print(f"\n{query_label}")
+            per_query = {}
+            for mode_label, context in modes:
+                with context():
+                    run()  # rozgrzewka (kompilacja zapytania, polaczenie)
+                    db.session.expunge_all()
+                    sql_metrics.reset_compile_cache_stats()
+                    start = time.perf_counter()
+                    for _ in range(iterations):
+                        run()
+                    elapsed = time.perf_counter() - start
+                    db.session.expunge_all()
+                stats = sql_metrics.get_compile_cache_stats()
+                per_query[mode_label] = elapsed / iterations * 1e6
+                print(f"   {mode_label:<24} {per_query[mode_label]:8.1f} us/zapytanie  "
+                      f"cache kompilacji: {stats['hits']}/{stats['hits'] + stats['misses']} "
+                      f"({stats['hit_rate']}%)")
+            overhead = per_query[modes[1][0]] - per_query[modes[0][0]]
+            print(f"   narzut filtra: {overhead:+.1f} us/zapytanie "
+                  f"({overhead * 100 / per_query[modes[0][0]]:+.1f}%)")
+
+
+    @app.cli.command('slow-queries')
+    @click.option('--account-id', type=int, required=True, help='ID konta z danymi')
+    @click.option('--threshold-ms', type=float, default=0, show_default=True,
+                  help='Prog zapisu zapytania w ms (0 = wszystkie zapytania)')
+    @click.option('--search', default='', help='Fraza wyszukiwania dla list spraw')
+    def slow_queries_cli(account_id, threshold_ms, search):
+        """
+        Wykonuje kluczowe zapytania aplikacji i wypisuje ich plany EXPLAIN.
+
+        Listy spraw aktywnych / zakonczonych i klientow (jak w widokach) oraz
+        lookup faktur po numerach (IN) z update_existing_cases. Zapytania
+        dluzsze niz --threshold-ms trafiaja do rejestru wolnych zapytan
+        (SQL, znormalizowane parametry, EXPLAIN (ANALYZE off)).
+
+        Użycie:
+            flask slow-queries --account-id 1
+            flask slow-queries --account-id 1 --threshold-ms 50 --search abc
+        """
+        from . import cache, slow_queries
+        from .services import case_service, client_service
+        from .tenant_context import tenant_context
+
+        print("=" * 60)
+        print(f"PLANY ZAPYTAN (prog: {threshold_ms:.0f} ms)")
+        print("=" * 60)
+
+        previous_threshold = slow_queries.get_threshold_ms()
+        slow_queries.clear_slow_queries()
+        slow_queries.set_threshold_ms(threshold_ms)
+        try:
+            with tenant_context(account_id):
+                cache.invalidate_account(account_id)
+                case_service.get_active_cases_for_account(account_id, search_query=search)
+                case_service.get_completed_cases_for_account(account_id, search_query=search)
+                client_service.get_client_list(account_id, search_query=search)
+
+                numbers = [number for (number,) in db.session.query(Case.case_number)
+                           .filter(Case.account_id == account_id, Case.status == 'active')
+                           .limit(100)]
+                db.session.query(Invoice, Case)\
+                    .join(Case, Invoice.case_id == Case.id)\
+                    .filter(Invoice.invoice_number.in_(numbers or ['-']))\
+                    .filter(Case.status == 'active')\
+                    .all()
+        finally:
+            slow_queries.set_threshold_ms(previous_threshold)
+
+        entries = list(reversed(slow_queries.get_slow_queries()))
+        for entry in entries:
+            print(f"\n[{entry['duration_ms']} ms] {entry['sql']}")
+            print(f"   Parametry: {entry['parameters']}")
+            for line in entry['plan'] or []:
+                print(f"   | {line}")
+        print(f"\nZapisano {len(entries)} zapytan")
+
+
+    @app.cli.command('import-report')
+    @click.option('--top', type=int, default=20, show_default=True, help='Liczba pozycji w zestawieniach')
+    def import_report_cli(top):
+        """
+        Raport czasu importow przy starcie procesu web (python -X importtime).
+
+        Tworzy aplikacje w osobnym procesie tak jak serwer WSGI (bez modulow
+        CLI) i wypisuje: laczny czas importow, najdrozsze moduly (lacznie
+        z zaleznosciami) i pakiety (suma czasu wlasnego modulow).
+
+        Użycie:
+            flask import-report
+            flask import-report --top 40
+        """
+        import subprocess
+        import sys
+        from collections import defaultdict
+
+        package = app.import_name
+        code = f"import {package} as m; m.create_app()"
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              capture_output=True, text=True, cwd=os.getcwd())
+        if proc.returncode != 0:
+            print(f"BLAD: create_app() zakonczone kodem {proc.returncode}")
+            print(proc.stderr[-2000:])
+            return
+
+        # Linie: "import time: <self us> | <cumulative us> | <wciecie><modul>"
+        modules = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            depth = (len(name) - len(name.lstrip())) // 2
+            modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+
+        total_us = sum(self_us for _, self_us, _, _ in modules)
+        by_package = defaultdict(int)
+        for name, self_us, _, _ in modules:
+            by_package[name.split('.')[0]] += self_us
+
+        print("=" * 60)
+        print(f"CZAS IMPORTOW create_app() ({package})")
+        print("=" * 60)
+        print(f"   Modulow: {len(modules)}, lacznie: {total_us / 1000:.1f} ms")
+
+        print(f"\nNajdrozsze moduly (z zaleznosciami):")
+        for name, _, cumulative_us, depth in sorted(modules, key=lambda m: -m[2])[:top]:
+            print(f"   {cumulative_us / 1000:8.1f} ms  {'  ' * min(depth, 4)}{name}")
+
+        print(f"\nPakiety (suma czasu wlasnego):")
+        for name, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+            print(f"   {self_us / 1000:8.1f} ms  {name}")
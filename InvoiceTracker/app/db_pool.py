@@ -0,0 +1,179 @@
+"""
+Profile puli polaczen bazy danych per rola procesu.
+
+Rola wybierana zmienna DB_POOL_PROFILE (brak zmiennej: cli dla komend flask
+poza "flask run", web dla pozostalych procesow):
+- web    - instancje App Engine obslugujace zadania HTTP (krotkie zapytania)
+- worker - procesy zadan w tle (sync / wysylka / outbox) - mniej polaczen, dluzsze zapytania
+- cli    - jednorazowe komendy flask (migracje, przebudowy) - jedno polaczenie, bez limitu czasu
+
+Kazdy profil: rozmiar puli, overflow, czas oczekiwania na polaczenie,
+pool_pre_ping (wykrywa zerwane polaczenia po failoverze Cloud SQL),
+pool_recycle i statement_timeout (PostgreSQL). Wartosci profilu mozna
+nadpisac zmiennymi DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT_MS.
+
+Czas pobrania polaczenia z puli (oczekiwanie na wolne polaczenie +
+ewentualne nawiazanie + pre-ping) mierzy TimedQueuePool - get_pool_stats().
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = 'web'
+CLI_PROFILE = 'cli'
+
+POOL_PROFILES = {
+    'web': {
+        'pool_size': 5,
+        'max_overflow': 5,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'statement_timeout_ms': 30000,
+    },
+    'worker': {
+        'pool_size': 2,
+        'max_overflow': 3,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'statement_timeout_ms': 300000,
+    },
+    'cli': {
+        'pool_size': 1,
+        'max_overflow': 2,
+        'pool_timeout': 60,
+        'pool_recycle': 3600,
+        'statement_timeout_ms': 0,
+    },
+}
+
+# Zmienne srodowiskowe nadpisujace wartosci profilu
+_ENV_OVERRIDES = {
+    'pool_size': 'DB_POOL_SIZE',
+    'max_overflow': 'DB_MAX_OVERFLOW',
+    'pool_timeout': 'DB_POOL_TIMEOUT',
+    'pool_recycle': 'DB_POOL_RECYCLE',
+    'statement_timeout_ms': 'DB_STATEMENT_TIMEOUT_MS',
+}
+
+_lock = threading.Lock()
+_checkout_stats = {'checkouts': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'timeouts': 0, 'invalidated': 0}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool mierzacy czas pobrania polaczenia (metryki puli procesu)."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with _lock:
+                _checkout_stats['timeouts'] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with _lock:
+                _checkout_stats['checkouts'] += 1
+                _checkout_stats['wait_total'] += elapsed
+                _checkout_stats['wait_max'] = max(_checkout_stats['wait_max'], elapsed)
+
+
+@event.listens_for(TimedQueuePool, 'invalidate')
+def _count_invalidated(dbapi_connection, connection_record, exception):
+    """Polaczenia odrzucone (np. pre-ping po failoverze, blad polaczenia)."""
+    with _lock:
+        _checkout_stats['invalidated'] += 1
+
+
+def get_profile(name):
+    """
+    Ustawienia profilu puli z nadpisaniami ze zmiennych srodowiskowych.
+
+    Args:
+        name: Nazwa profilu (web / worker / cli)
+
+    Returns:
+        dict: pool_size, max_overflow, pool_timeout, pool_recycle, statement_timeout_ms
+
+    Raises:
+        ValueError: Nieznany profil
+    """
+    if name not in POOL_PROFILES:
+        raise ValueError(f"Nieznany profil puli DB_POOL_PROFILE={name} (dostepne: {', '.join(POOL_PROFILES)})")
+    profile = dict(POOL_PROFILES[name])
+    for key, env_name in _ENV_OVERRIDES.items():
+        if os.environ.get(env_name):
+            profile[key] = int(os.environ[env_name])
+    return profile
+
+
+def build_engine_options(profile_name, db_uri):
+    """
+    Opcje silnika (SQLALCHEMY_ENGINE_OPTIONS) dla profilu.
+
+    SQLite (lokalne testy) - tylko pool_pre_ping; rozmiar puli i statement_timeout
+    dotycza serwera PostgreSQL.
+
+    Args:
+        profile_name: Nazwa profilu (web / worker / cli)
+        db_uri: SQLALCHEMY_DATABASE_URI
+
+    Returns:
+        dict: Opcje create_engine
+    """
+    profile = get_profile(profile_name)
+    if db_uri.startswith('sqlite'):
+        return {'pool_pre_ping': True}
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': profile['pool_size'],
+        'max_overflow': profile['max_overflow'],
+        'pool_timeout': profile['pool_timeout'],
+        'pool_recycle': profile['pool_recycle'],
+        'pool_pre_ping': True,
+    }
+    if profile['statement_timeout_ms'] and db_uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f"-c statement_timeout={profile['statement_timeout_ms']}"}
+    return options
+
+
+def get_pool_stats(engine):
+    """
+    Metryki puli polaczen procesu.
+
+    Args:
+        engine: Silnik SQLAlchemy (db.engine)
+
+    Returns:
+        dict: {'checkouts', 'wait_avg_ms', 'wait_max_ms', 'timeouts', 'invalidated',
+               'size', 'checked_out', 'overflow'} - rozmiary tylko dla QueuePool
+    """
+    with _lock:
+        stats = dict(_checkout_stats)
+    checkouts = stats['checkouts']
+    result = {
+        'checkouts': checkouts,
+        'wait_avg_ms': round(stats['wait_total'] * 1000 / checkouts, 2) if checkouts else None,
+        'wait_max_ms': round(stats['wait_max'] * 1000, 2),
+        'timeouts': stats['timeouts'],
+        'invalidated': stats['invalidated'],
+    }
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        result.update({'size': pool.size(), 'checked_out': pool.checkedout(), 'overflow': pool.overflow()})
+    return result
+
+
+def reset_pool_stats():
+    """Zeruje liczniki oczekiwania na polaczenie."""
+    with _lock:
+        for key in _checkout_stats:
+            _checkout_stats[key] = 0.0 if key.startswith('wait') else 0
@@ -0,0 +1,147 @@
+"""
+Kierowanie zapytan tylko do odczytu na replike bazy (opcjonalnie).
+
+Replika to dodatkowy bind SQLAlchemy (SQLALCHEMY_BINDS['replica']) -
+konfigurowany gdy ustawiono SQLALCHEMY_REPLICA_URI lub (App Engine)
+REPLICA_INSTANCE_CONNECTION_NAME. Bez repliki wszystko dziala na bazie glownej.
+
+Zasady:
+- na replike trafiaja tylko SELECT-y wykonane w bloku read_replica()
+  (lub w funkcji z dekoratorem @replica_reads) - listy spraw, klienci,
+  historia synchronizacji, eksporty, raporty
+- zapisy (flush, INSERT / UPDATE / DELETE, text()) zawsze na bazie glownej;
+  sesja z niezapisanymi zmianami czyta z bazy glownej
+- po wlasnym zapisie uzytkownika (COMMIT w zadaniu HTTP) jego odczyty przez
+  REPLICA_STALENESS_SECONDS sekund ida na baze glowna - uzytkownik widzi
+  swoje zmiany mimo opoznienia replikacji
+
+Zadania w tle (sync, wysylka) nie uzywaja repliki.
+"""
+import inspect
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+log = logging.getLogger(__name__)
+
+REPLICA_BIND_KEY = 'replica'
+DEFAULT_STALENESS_SECONDS = 15
+
+# Klucz w sesji Flask - do kiedy (timestamp) czytac z bazy glownej po wlasnym zapisie
+_PRIMARY_UNTIL_KEY = '_db_primary_until'
+# Klucz w session.info - transakcja zawiera zapis
+_WROTE_KEY = '_db_routing_wrote'
+
+_use_replica: ContextVar[bool] = ContextVar('use_read_replica', default=False)
+
+# Stan modulu (ustawiany w configure_db_routing)
+_staleness_seconds = DEFAULT_STALENESS_SECONDS
+
+
+@contextmanager
+def read_replica():
+    """
+    Blok, w ktorym zapytania SELECT moga trafic na replike.
+
+    Usage:
+        with read_replica():
+            cases = case_service.get_active_cases_for_account(account_id)
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_reads(func):
+    """
+    Dekorator - funkcja tylko do odczytu, SELECT-y moga trafic na replike.
+
+    Dla generatorow (eksporty strumieniowe) blok obejmuje cale iterowanie.
+    """
+    if inspect.isgeneratorfunction(func):
+        @wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            with read_replica():
+                yield from func(*args, **kwargs)
+        return generator_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with read_replica():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def is_primary_pinned():
+    """Czy odczyty biezacego uzytkownika sa przypiete do bazy glownej (swiezy wlasny zapis)."""
+    if not has_request_context():
+        return False
+    return flask_session.get(_PRIMARY_UNTIL_KEY, 0) > time.time()
+
+
+class RoutingSession(Session):
+    """Sesja Flask-SQLAlchemy kierujaca SELECT-y z bloku read_replica() na replike."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _use_replica.get() and isinstance(clause, Select)
+                and not self._flushing and not (self.new or self.dirty or self.deleted)):
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None and not is_primary_pinned():
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def build_replica_bind(uri, engine_options):
+    """
+    Konfiguracja bindu repliki do SQLALCHEMY_BINDS.
+
+    Args:
+        uri: Adres bazy repliki
+        engine_options: Opcje silnika (profil puli - db_pool.build_engine_options)
+
+    Returns:
+        dict: {'replica': {'url': uri, **engine_options}}
+    """
+    return {REPLICA_BIND_KEY: {'url': uri, **engine_options}}
+
+
+def configure_db_routing(app):
+    """
+    Konfiguruje ochrone przed nieaktualnymi odczytami po wlasnych zapisach.
+    Wywolywane w create_app() po init_app.
+    """
+    global _staleness_seconds
+    from .extensions import db
+
+    _staleness_seconds = app.config.get('REPLICA_STALENESS_SECONDS', DEFAULT_STALENESS_SECONDS)
+    if REPLICA_BIND_KEY not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+
+    @event.listens_for(db.session, 'after_flush')
+    def _mark_flush_write(session, flush_context):
+        session.info[_WROTE_KEY] = True
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def _mark_statement_write(orm_execute_state):
+        if not orm_execute_state.is_select:
+            orm_execute_state.session.info[_WROTE_KEY] = True
+
+    @event.listens_for(db.session, 'after_commit')
+    def _pin_reads_to_primary(session):
+        if session.info.pop(_WROTE_KEY, False) and has_request_context():
+            flask_session[_PRIMARY_UNTIL_KEY] = time.time() + _staleness_seconds
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _reset_write_flag(session):
+        session.info.pop(_WROTE_KEY, None)
+
+    log.info(f"[db_routing] Replika odczytu wlaczona (odczyty po zapisie z bazy glownej przez {_staleness_seconds}s)")
@@ -1,19 +1,21 @@
 """
 Rozszerzenia Flask.
-Inicjalizacja obiektów SQLAlchemy i Migrate oraz konfiguracja multi-tenancy.
+Inicjalizacja obiektów SQLAlchemy, CSRF i Flask-Login oraz konfiguracja multi-tenancy.
+Flask-Migrate (alembic) jest inicjalizowany tylko dla komend flask (create_app).
 """
 import logging
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from flask_login import LoginManager
 from sqlalchemy import event
 from sqlalchemy.orm import with_loader_criteria
 
+from .db_routing import RoutingSession
+
 log = logging.getLogger(__name__)
 
-db = SQLAlchemy()
-migrate = Migrate()
+# Sesja z opcjonalnym kierowaniem odczytow na replike (db_routing.read_replica)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 csrf = CSRFProtect()
 
 # Flask-Login configuration
@@ -41,13 +43,20 @@ def configure_tenant_filtering(app):
     na SyncStatus.account_id.
     """
     from .tenant_context import get_tenant, is_sudo
-    from .models import Case, NotificationLog, NotificationSettings, SyncStatus, AccountScheduleSettings, Invoice
+    from .models import (
+        Case, NotificationLog, NotificationSettings, SyncStatus, AccountScheduleSettings, Invoice,
+        NotificationOutbox, Client, AccountDailySnapshot
+    )
 
     # Zarejestruj modele z account_id (włącznie z Invoice po migracji 2025120200)
-    for model in [Case, NotificationLog, NotificationSettings, SyncStatus, AccountScheduleSettings, Invoice]:
+    for model in [Case, NotificationLog, NotificationSettings, SyncStatus, AccountScheduleSettings, Invoice,
+                  NotificationOutbox, Client, AccountDailySnapshot]:
         register_tenant_model(model)
         log.debug(f"[tenant] Zarejestrowano model: {model.__name__}")
 
+    # Modele filtrowane (z kolumna account_id) - sprawdzane raz, nie przy kazdym zapytaniu
+    tenant_classes = frozenset(model for model in TENANT_MODELS if hasattr(model, 'account_id'))
+
     @event.listens_for(db.session, 'do_orm_execute')
     def _apply_tenant_filter(orm_execute_state):
         """
@@ -59,6 +68,10 @@ def configure_tenant_filtering(app):
         2. NIE jesteśmy w trybie sudo()
         3. Tenant ID jest ustawiony (get_tenant() != None)
         4. Model jest zarejestrowany w TENANT_MODELS
+
+        Kryterium jako lambda - SQLAlchemy analizuje ja raz (klucz cache = miejsce
+        w kodzie), a tenant_id z domkniecia trafia do zapytania jako parametr.
+        Skompilowany SQL jest wspolny dla wszystkich kont (cache kompilacji).
         """
         # Tylko dla SELECT
         if not orm_execute_state.is_select:
@@ -78,31 +91,21 @@ def configure_tenant_filtering(app):
             # Brak kontekstu - może być login page, pozwól przejść
             return
 
-        # Oznacz że filtr został zastosowany (anti-recursion)
+        # Znajdź modele w zapytaniu które wymagają filtrowania
+        models = [mapper.class_ for mapper in orm_execute_state.all_mappers if mapper.class_ in tenant_classes]
+        if not models:
+            return
+
+        # Oznacz że filtr został zastosowany (anti-recursion) i dodaj filtry jednym klonem zapytania
         orm_execute_state.execution_options = orm_execute_state.execution_options.union(
             {'_tenant_filter_applied': True}
         )
-
-        # Znajdź modele w zapytaniu które wymagają filtrowania
-        for mapper in orm_execute_state.all_mappers:
-            model_class = mapper.class_
-
-            # Sprawdź czy model jest zarejestrowany
-            if model_class not in TENANT_MODELS:
-                continue
-
-            # Sprawdź czy model ma account_id (dodatkowe zabezpieczenie)
-            if not hasattr(model_class, 'account_id'):
-                continue
-
-            # Dodaj filtr
-            orm_execute_state.statement = orm_execute_state.statement.options(
-                with_loader_criteria(
-                    model_class,
-                    model_class.account_id == tenant_id,
-                    include_aliases=True
-                )
-            )
-            log.debug(f"[tenant] Dodano filtr account_id={tenant_id} dla {model_class.__name__}")
+        orm_execute_state.statement = orm_execute_state.statement.options(*(
+            with_loader_criteria(model_class, lambda cls: cls.account_id == tenant_id, include_aliases=True)
+            for model_class in models
+        ))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"[tenant] Dodano filtr account_id={tenant_id} dla "
+                      f"{', '.join(model_class.__name__ for model_class in models)}")
 
     log.info("[tenant] Konfiguracja multi-tenancy filtering zakończona")
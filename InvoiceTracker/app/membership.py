@@ -0,0 +1,204 @@
+"""
+Cache uzytkownikow i ich dostepu do kont (User <-> Account).
+
+Kazde zadanie zalogowanego uzytkownika potrzebuje: uzytkownika (load_user),
+sprawdzenia dostepu do wybranego konta (require_login), listy kont do menu
+(inject_active_accounts) i biezacego konta (inject_current_account).
+
+Dwa poziomy:
+- zakres zadania (flask.g) - zawsze; dostep i lista kont z jednego zapytania,
+  biezace konto ladowane dopiero gdy szablon go uzyje
+- cache procesu z krotkim TTL (MEMBERSHIP_CACHE_TTL > 0, domyslnie wylaczony) -
+  dane uzytkownika i lista jego kont bez zapytan do bazy
+
+Zmiany uzytkownika, powiazan z kontami (przyznanie / odebranie dostepu) lub
+kont (dezaktywacja, zmiana nazwy) uniewazniaja cache po COMMIT. Inne procesy
+(instancje App Engine, CLI) widza zmiane najpozniej po MEMBERSHIP_CACHE_TTL sekund.
+"""
+import logging
+from collections import namedtuple
+
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from .cache import LRUCache
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+
+# Klucz w session.info - uzytkownicy do uniewaznienia po COMMIT (None = wszyscy)
+_PENDING_KEY = '_membership_invalidate'
+
+# Kolumny uzytkownika trzymane w cache procesu (bez hasha hasla - ladowany na zadanie)
+_USER_COLUMNS = ('id', 'email', 'is_active', 'created_at', 'last_login_at')
+
+# Lekka reprezentacja konta w menu / sprawdzaniu dostepu
+AccountRef = namedtuple('AccountRef', ['id', 'name', 'is_active'])
+
+# Stan modulu (ustawiany w configure_membership)
+_ttl = 0
+_users = LRUCache(max_entries=DEFAULT_MAX_ENTRIES)
+_memberships = LRUCache(max_entries=DEFAULT_MAX_ENTRIES)
+
+
+def _request_memo():
+    """Slownik zapamietanych wartosci biezacego zadania (pusty poza kontekstem aplikacji)."""
+    if not has_app_context():
+        return {}
+    if '_membership_memo' not in g:
+        g._membership_memo = {}
+    return g._membership_memo
+
+
+def load_user(user_id):
+    """
+    Laduje uzytkownika dla Flask-Login.
+
+    Przy wlaczonym cache procesu obiekt jest odtwarzany z zapamietanych kolumn
+    i dolaczany do sesji bez zapytania (merge load=False).
+
+    Args:
+        user_id: ID uzytkownika
+
+    Returns:
+        User lub None
+    """
+    from .extensions import db
+    from .models import User
+
+    if _ttl:
+        data = _users.get(user_id)
+        if data is not None:
+            user = User(**data)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None and _ttl:
+        _users.set(user_id, {name: getattr(user, name) for name in _USER_COLUMNS})
+    return user
+
+
+def get_account_refs(user_id):
+    """
+    Konta powiazane z uzytkownikiem (takze nieaktywne), posortowane po nazwie.
+
+    Args:
+        user_id: ID uzytkownika
+
+    Returns:
+        tuple[AccountRef]
+    """
+    memo = _request_memo()
+    key = ('accounts', user_id)
+    if key in memo:
+        return memo[key]
+
+    refs = _memberships.get(user_id) if _ttl else None
+    if refs is None:
+        from .extensions import db
+        from .models import Account, account_users
+
+        rows = (
+            db.session.query(Account.id, Account.name, Account.is_active)
+            .join(account_users, account_users.c.account_id == Account.id)
+            .filter(account_users.c.user_id == user_id)
+            .order_by(Account.name)
+            .all()
+        )
+        refs = tuple(AccountRef(*row) for row in rows)
+        if _ttl:
+            _memberships.set(user_id, refs)
+
+    memo[key] = refs
+    return refs
+
+
+def has_access(user_id, account_id):
+    """Czy uzytkownik jest powiazany z kontem (niezaleznie od Account.is_active)."""
+    return any(ref.id == account_id for ref in get_account_refs(user_id))
+
+
+def get_active_account_refs(user_id):
+    """Aktywne konta uzytkownika (menu przelaczania profilu)."""
+    return [ref for ref in get_account_refs(user_id) if ref.is_active]
+
+
+def get_current_account(account_id):
+    """
+    Biezace konto (obiekt Account) - jedno ladowanie na zadanie.
+
+    Args:
+        account_id: ID konta
+
+    Returns:
+        Account lub None
+    """
+    memo = _request_memo()
+    key = ('current_account', account_id)
+    if key not in memo:
+        from .extensions import db
+        from .models import Account
+        memo[key] = db.session.get(Account, account_id)
+    return memo[key]
+
+
+def invalidate_user(user_id):
+    """Uniewaznia cache uzytkownika i jego kont."""
+    _users.delete(user_id)
+    _memberships.delete(user_id)
+    _request_memo().pop(('accounts', user_id), None)
+
+
+def invalidate_all():
+    """Uniewaznia cache wszystkich uzytkownikow (np. zmiana konta)."""
+    _users.clear()
+    _memberships.clear()
+    _request_memo().clear()
+
+
+def configure_membership(app):
+    """
+    Konfiguruje cache procesu i uniewaznianie po COMMIT.
+    Wywolywane w create_app() po init_app.
+    """
+    global _ttl, _users, _memberships
+    from .extensions import db
+    from .models import Account, User
+
+    _ttl = app.config.get('MEMBERSHIP_CACHE_TTL', 0)
+    max_entries = app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+    _users = LRUCache(max_entries=max_entries, ttl=_ttl)
+    _memberships = LRUCache(max_entries=max_entries, ttl=_ttl)
+    if _ttl:
+        log.info(f"[membership] Cache procesu wlaczony (TTL {_ttl}s)")
+
+    @event.listens_for(db.session, 'after_flush')
+    def _collect_membership_changes(session, flush_context):
+        """Zbiera uzytkownikow, ktorych dane lub powiazania z kontami zmienily sie."""
+        pending = session.info.setdefault(_PENDING_KEY, set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, User) and obj.id is not None:
+                pending.add(obj.id)
+            elif isinstance(obj, Account) and obj not in session.new:
+                # Dezaktywacja / zmiana nazwy / usuniecie konta - dotyczy wszystkich jego uzytkownikow
+                attrs = sa_inspect(obj).attrs
+                if (obj in session.deleted or attrs.is_active.history.has_changes()
+                        or attrs.name.history.has_changes()):
+                    pending.add(None)
+
+    @event.listens_for(db.session, 'after_commit')
+    def _invalidate_committed_membership(session):
+        pending = session.info.pop(_PENDING_KEY, ())
+        if None in pending:
+            invalidate_all()
+            return
+        for user_id in pending:
+            invalidate_user(user_id)
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _reset_membership_changes(session):
+        session.info.pop(_PENDING_KEY, None)
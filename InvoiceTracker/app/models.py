@@ -3,18 +3,26 @@ Modele SQLAlchemy aplikacji.
 Wszystkie modele dla multi-tenant systemu windykacji.
 """
 from datetime import datetime
-from cryptography.fernet import Fernet
 from collections import OrderedDict
 import base64
+import hashlib
 import json
 import logging
 import os
+import zlib
+from functools import lru_cache
 
+from flask import current_app, has_app_context
 from flask_login import UserMixin
+from sqlalchemy import case as sql_case, event, func, insert, select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from . import cache
 from .extensions import db
 from .constants import CANONICAL_NOTIFICATION_STAGES
+from .utils import stage_to_number
 
 
 class Case(db.Model):
@@ -25,6 +33,10 @@ class Case(db.Model):
 
     MULTI-TENANCY: case_number jest unique PER ACCOUNT (nie globalnie).
     Constraint: UNIQUE(case_number, account_id)
+
+    max_stage / last_notified_at - denormalizacja z NotificationLog (aktualizowane
+    przy kazdym zapisie logu, patrz _update_case_progress). Pozwala sortowac
+    i paginowac po postepie w SQL. Naprawa: flask backfill-case-progress.
     """
     id = db.Column(db.Integer, primary_key=True)
     case_number = db.Column(db.String(50), nullable=False)
@@ -35,10 +47,14 @@ class Case(db.Model):
     status = db.Column(db.String(50), default="active")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    max_stage = db.Column(db.Integer, default=0, nullable=False)  # 0-5
+    last_notified_at = db.Column(db.DateTime, nullable=True)
 
     # MULTI-TENANCY: Compound unique constraint per account
     __table_args__ = (
         db.UniqueConstraint('case_number', 'account_id', name='uq_case_number_account'),
+        db.Index('idx_case_account_status_max_stage', 'account_id', 'status', 'max_stage'),
+        db.Index('idx_case_account_client', 'account_id', 'client_id'),
     )
 
     # Relacja 1:1 – każda sprawa odpowiada jednej fakturze
@@ -93,9 +109,256 @@ class Invoice(db.Model):
         return f'<Invoice {self.invoice_number} for client {self.client_id}>'
 
 
+class Client(db.Model):
+    """
+    Model Client – kartoteka klienta per konto z zagregowanymi danymi spraw.
+
+    Agregaty (open_debt, active_count, closed_count, oldest_due_date, max_stage)
+    sa utrzymywane przy zapisie: zmiany Case/Invoice/NotificationLog w transakcji
+    oznaczaja klienta, a przed COMMIT jego wiersz jest przeliczany z jego spraw
+    (Client.refresh - jedno zapytanie agregujace na partie klientow). Listy klientow
+    i "najwieksi dluznicy" nie agreguja przy odczycie.
+
+    Dane kontaktowe z najnowszej faktury klienta (jak dotychczas w widoku klienta).
+    Przebudowa: flask rebuild-client-ledger
+    """
+    __tablename__ = 'client'
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False, index=True)
+    client_id = db.Column(db.String(50), nullable=False)
+    company_name = db.Column(db.String(200), nullable=True)
+    nip = db.Column(db.String(50), nullable=True)
+    email = db.Column(db.String(100), nullable=True)
+    address = db.Column(db.String(255), nullable=True)
+    open_debt = db.Column(db.BigInteger, nullable=False, default=0)  # grosze, suma aktywnych spraw
+    active_count = db.Column(db.Integer, nullable=False, default=0)
+    closed_count = db.Column(db.Integer, nullable=False, default=0)
+    oldest_due_date = db.Column(db.Date, nullable=True)  # najstarszy termin aktywnej sprawy
+    max_stage = db.Column(db.Integer, nullable=False, default=0)  # max etap aktywnych spraw
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'client_id', name='uq_client_account_client_id'),
+        db.Index('idx_client_account_open_debt', 'account_id', 'open_debt'),
+    )
+
+    REFRESH_BATCH_SIZE = 500
+
+    @classmethod
+    def _aggregate_query(cls, account_id, client_ids):
+        """Agregaty spraw klientow (jedno zapytanie GROUP BY client_id)."""
+        case_t = Case.__table__
+        inv_t = Invoice.__table__
+        is_active = case_t.c.status == 'active'
+        return select(
+            case_t.c.client_id,
+            func.max(case_t.c.client_company_name).label('case_company_name'),
+            func.max(case_t.c.client_nip).label('case_nip'),
+            func.coalesce(func.sum(sql_case((is_active, func.coalesce(inv_t.c.left_to_pay, 0)), else_=0)), 0).label('open_debt'),
+            func.coalesce(func.sum(sql_case((is_active, 1), else_=0)), 0).label('active_count'),
+            func.coalesce(func.sum(sql_case((is_active, 0), else_=1)), 0).label('closed_count'),
+            func.min(sql_case((is_active, inv_t.c.payment_due_date))).label('oldest_due_date'),
+            func.coalesce(func.max(sql_case((is_active, case_t.c.max_stage), else_=0)), 0).label('max_stage'),
+        ).select_from(
+            case_t.outerjoin(inv_t, inv_t.c.case_id == case_t.c.id)
+        ).where(
+            case_t.c.account_id == account_id,
+            case_t.c.client_id.in_(client_ids)
+        ).group_by(case_t.c.client_id)
+
+    @classmethod
+    def _details_query(cls, account_id, client_ids):
+        """Dane kontaktowe z najnowszej faktury kazdego klienta."""
+        inv_t = Invoice.__table__
+        ranked = select(
+            inv_t.c.client_id,
+            inv_t.c.client_company_name,
+            inv_t.c.client_nip,
+            inv_t.c.client_email,
+            inv_t.c.client_address,
+            func.row_number().over(
+                partition_by=inv_t.c.client_id,
+                order_by=(inv_t.c.invoice_date.desc().nullslast(), inv_t.c.id.desc())
+            ).label('rn')
+        ).where(
+            inv_t.c.account_id == account_id,
+            inv_t.c.client_id.in_(client_ids)
+        ).subquery()
+        return select(ranked).where(ranked.c.rn == 1)
+
+    @classmethod
+    def refresh(cls, connection, account_id, client_ids):
+        """
+        Przelicza wiersze Client dla podanych klientow konta.
+
+        Klienci bez spraw sa usuwani. INSERT ... ON CONFLICT DO UPDATE -
+        bezpieczne przy rownoleglych workerach (PostgreSQL/SQLite).
+
+        Args:
+            connection: Polaczenie biezacej transakcji (session.connection())
+            account_id: ID konta
+            client_ids: Iterowalne ID klientow (Case.client_id)
+
+        Returns:
+            int: Liczba przeliczonych klientow
+        """
+        client_ids = sorted({cid for cid in client_ids if cid})
+        table = cls.__table__
+        dialect = connection.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            dialect_insert = None
+
+        refreshed = 0
+        for start in range(0, len(client_ids), cls.REFRESH_BATCH_SIZE):
+            batch = client_ids[start:start + cls.REFRESH_BATCH_SIZE]
+            details = {row.client_id: row for row in connection.execute(cls._details_query(account_id, batch))}
+            now = datetime.utcnow()
+
+            rows = []
+            for agg in connection.execute(cls._aggregate_query(account_id, batch)):
+                detail = details.get(agg.client_id)
+                rows.append({
+                    'account_id': account_id,
+                    'client_id': agg.client_id,
+                    'company_name': (detail.client_company_name if detail else None) or agg.case_company_name,
+                    'nip': (detail.client_nip if detail else None) or agg.case_nip,
+                    'email': detail.client_email if detail else None,
+                    'address': detail.client_address if detail else None,
+                    'open_debt': int(agg.open_debt or 0),
+                    'active_count': int(agg.active_count or 0),
+                    'closed_count': int(agg.closed_count or 0),
+                    'oldest_due_date': agg.oldest_due_date,
+                    'max_stage': int(agg.max_stage or 0),
+                    'updated_at': now,
+                })
+
+            # Klienci bez spraw (np. zmiana client_id sprawy)
+            gone = set(batch) - {row['client_id'] for row in rows}
+            if gone:
+                connection.execute(table.delete().where(
+                    table.c.account_id == account_id, table.c.client_id.in_(gone)
+                ))
+
+            if not rows:
+                continue
+
+            if dialect_insert is not None:
+                stmt = dialect_insert(table)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c.account_id, table.c.client_id],
+                    set_={key: stmt.excluded[key] for key in rows[0] if key not in ('account_id', 'client_id')}
+                )
+                connection.execute(stmt, rows)
+            else:
+                existing = {row.client_id for row in connection.execute(
+                    select(table.c.client_id).where(table.c.account_id == account_id, table.c.client_id.in_(batch))
+                )}
+                for row in rows:
+                    if row['client_id'] in existing:
+                        connection.execute(table.update().where(
+                            table.c.account_id == account_id, table.c.client_id == row['client_id']
+                        ).values(**row))
+                    else:
+                        connection.execute(insert(table).values(**row))
+
+            refreshed += len(rows)
+        return refreshed
+
+    def __repr__(self):
+        return f'<Client {self.client_id} debt={self.open_debt}>'
+
+
+class NotificationBody(db.Model):
+    """
+    Model NotificationBody – magazyn tresci powiadomien adresowany trescia (SHA-256).
+
+    Rodzaje wpisow (kind):
+    - 'template': tekst szablonu maila; NotificationLog przechowuje tylko digest szablonu
+      i parametry renderowania, tresc jest renderowana na zadanie
+    - 'body': skompresowana gotowa tresc (wpisy spoza szablonow i zmigrowane stare wpisy)
+
+    Identyczne tresci zapisywane sa tylko raz (zlib). Brak account_id - wpis jest
+    osiagalny wylacznie przez digest z NotificationLog danego konta.
+    """
+    __tablename__ = 'notification_body'
+
+    digest = db.Column(db.String(64), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False, default='body')
+    template_key = db.Column(db.String(20), nullable=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def compute_digest(kind, text):
+        """Digest SHA-256 tresci (z prefiksem rodzaju wpisu)."""
+        return hashlib.sha256(f"{kind}:{text}".encode('utf-8')).hexdigest()
+
+    @classmethod
+    def store(cls, connection, kind, text, template_key=None):
+        """
+        Zapisuje tresc (jesli jeszcze nie istnieje) i zwraca jej digest.
+
+        INSERT ... ON CONFLICT DO NOTHING - bezpieczne przy rownoleglych workerach.
+
+        Args:
+            connection: Polaczenie biezacej transakcji (session.connection())
+            kind: 'template' lub 'body'
+            text: Tresc do zapisania
+            template_key: Klucz szablonu z MAIL_TEMPLATES (tylko dla 'template')
+
+        Returns:
+            str: Digest tresci
+        """
+        digest = cls.compute_digest(kind, text)
+        values = {
+            'digest': digest,
+            'kind': kind,
+            'template_key': template_key,
+            'data': zlib.compress(text.encode('utf-8'), 9),
+            'size': len(text),
+            'created_at': datetime.utcnow(),
+        }
+
+        dialect = connection.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            dialect_insert = None
+
+        if dialect_insert is not None:
+            connection.execute(dialect_insert(cls.__table__).values(**values).on_conflict_do_nothing())
+        elif connection.execute(cls.__table__.select().where(cls.digest == digest)).first() is None:
+            connection.execute(insert(cls.__table__).values(**values))
+
+        return digest
+
+    @property
+    def text(self):
+        """Rozpakowana tresc."""
+        return zlib.decompress(self.data).decode('utf-8')
+
+    def __repr__(self):
+        return f'<NotificationBody {self.kind} {self.digest[:12]}>'
+
+
 class NotificationLog(db.Model):
     """
     Model NotificationLog – zapisuje historię wysłanych powiadomień (e-maili).
+
+    Tresc (body) nie jest przechowywana w wierszu - zaleznie od
+    NOTIFICATION_BODY_STORAGE trafia do NotificationBody:
+    - 'template' (domyslnie): digest szablonu + render_params, renderowanie na zadanie
+    - 'compressed': skompresowana tresc adresowana digestem
+    - 'inline': stary tryb - pelny HTML w kolumnie body
+    Tresci spoza szablonow zawsze zapisywane sa jako 'compressed'.
     """
     id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False, index=True)
@@ -104,15 +367,129 @@ class NotificationLog(db.Model):
     invoice_number = db.Column(db.String(50))
     email_to = db.Column(db.String(100))
     subject = db.Column(db.String(200))
-    body = db.Column(db.Text)
+    _body = db.Column('body', db.Text)  # Tryb 'inline'
+    body_digest = db.Column(db.String(64), db.ForeignKey('notification_body.digest'), nullable=True, index=True)
+    render_params = db.Column(db.Text, nullable=True)  # JSON (tryb 'template')
     stage = db.Column(db.String(255))
     mode = db.Column(db.String(20))
     scheduled_date = db.Column(db.DateTime)
 
+    stored_body = db.relationship('NotificationBody', lazy='select')
+
+    @property
+    def body(self):
+        """Tresc powiadomienia (renderowana z szablonu lub rozpakowana)."""
+        pending = self.__dict__.get('_pending_body')
+        if pending is not None:
+            return pending['body']
+        if self._body is not None:
+            return self._body
+        if self.stored_body is None:
+            return None
+        if self.stored_body.kind == 'template':
+            return self.stored_body.text.format(**json.loads(self.render_params or '{}'))
+        return self.stored_body.text
+
+    @body.setter
+    def body(self, value):
+        self.set_body(value)
+
+    def set_body(self, body, template_key=None, template=None, render_params=None):
+        """
+        Ustawia tresc powiadomienia. Zapis do NotificationBody nastepuje przy flush.
+
+        Args:
+            body: Wyrenderowana tresc (HTML lub tekst)
+            template_key: Klucz szablonu z MAIL_TEMPLATES (opcjonalnie)
+            template: Tekst szablonu uzyty do renderowania (opcjonalnie)
+            render_params: dict parametrow renderowania (opcjonalnie)
+        """
+        self.__dict__['_pending_body'] = {
+            'body': body,
+            'template_key': template_key,
+            'template': template,
+            'render_params': render_params,
+        }
+        self._body = None
+        self.body_digest = None
+        self.render_params = None
+
+    def _store_pending_body(self, session):
+        """Zapisuje oczekujaca tresc wg NOTIFICATION_BODY_STORAGE (wywolywane z before_flush)."""
+        pending = self.__dict__.pop('_pending_body', None)
+        if pending is None or pending['body'] is None:
+            return
+
+        storage = 'template'
+        if has_app_context():
+            storage = current_app.config.get('NOTIFICATION_BODY_STORAGE', 'template')
+
+        if storage == 'inline':
+            self._body = pending['body']
+            return
+
+        connection = session.connection()
+        template = pending['template']
+        render_params = pending['render_params']
+
+        # Tryb szablonowy tylko gdy szablon + parametry odtwarzaja dokladnie wyslana tresc
+        if (storage == 'template' and template and render_params is not None
+                and template.format(**render_params) == pending['body']):
+            self.body_digest = NotificationBody.store(connection, 'template', template, pending['template_key'])
+            self.render_params = json.dumps(render_params, ensure_ascii=False, sort_keys=True)
+        else:
+            self.body_digest = NotificationBody.store(connection, 'body', pending['body'])
+
     def __repr__(self):
         return f'<NotificationLog {self.subject} to {self.email_to} at {self.sent_at}>'
 
 
+class NotificationOutbox(db.Model):
+    """
+    Model NotificationOutbox – transakcyjna kolejka zaplanowanych powiadomien.
+
+    Planowanie (scheduler) zapisuje tu wyrenderowane maile zbiorczo, a workery
+    (outbox_service.drain_outbox) pobieraja je partiami przez SELECT ... FOR UPDATE
+    SKIP LOCKED. Oznaczenie wpisu jako "sent" i zapis NotificationLog odbywaja sie
+    w tej samej transakcji - restart workera nie powoduje duplikatow w historii.
+
+    Status: "pending" -> "sending" -> "sent" | "failed" (po MAX_ATTEMPTS probach).
+    Wpis "sent" nie przechowuje tresci (body / render_params = NULL - tresc jest
+    w NotificationLog); wpisy zakonczone sa usuwane po outbox_service.RETENTION.
+
+    MULTI-TENANCY: UNIQUE(account_id, invoice_number, stage) - jeden wpis na etap faktury.
+    """
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False, index=True)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=True)
+    invoice_number = db.Column(db.String(50), nullable=False)
+    client_id = db.Column(db.String(50))
+    email_to = db.Column(db.String(255))
+    subject = db.Column(db.String(200))
+    body = db.Column(db.Text)
+    template_key = db.Column(db.String(20), nullable=True)
+    render_params = db.Column(db.Text, nullable=True)  # JSON - do zapisu NotificationLog w trybie szablonowym
+    stage = db.Column(db.String(255), nullable=False)
+    mode = db.Column(db.String(20), default="Automatyczne")
+    status = db.Column(db.String(20), default="pending", nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'invoice_number', 'stage', name='uq_outbox_account_invoice_stage'),
+        db.Index('idx_outbox_status_available', 'status', 'available_at'),
+    )
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.invoice_number} [{self.stage}] {self.status}>'
+
+
 class SyncStatus(db.Model):
     """
     Model SyncStatus – rejestruje informacje o przebiegu synchronizacji:
@@ -132,6 +509,10 @@ class SyncStatus(db.Model):
       - updated_invoices_processed: faktury zaktualizowane podczas update_existing_cases()
       - new_sync_duration: czas trwania sync_new_invoices()
       - update_sync_duration: czas trwania update_existing_cases()
+
+      INSTRUMENTACJA SQL (tylko gdy SQL_INSTRUMENTATION=true, inaczej NULL):
+      - db_queries: liczba zapytan SQL wykonanych podczas synchronizacji
+      - db_time: laczny czas zapytan SQL (w sekundach)
     """
     id = db.Column(db.Integer, primary_key=True)
     # MULTI-TENANCY: Powiązanie z kontem (NOT NULL - wymagane dla tenant isolation)
@@ -153,6 +534,10 @@ class SyncStatus(db.Model):
     new_sync_duration = db.Column(db.Float, default=0.0)
     update_sync_duration = db.Column(db.Float, default=0.0)
 
+    # INSTRUMENTACJA SQL (NULL gdy wylaczona)
+    db_queries = db.Column(db.Integer, nullable=True)
+    db_time = db.Column(db.Float, nullable=True)
+
     @classmethod
     def get_next_sync_number(cls, account_id):
         """Zwraca następny numer synchronizacji dla danego konta."""
@@ -163,6 +548,39 @@ class SyncStatus(db.Model):
         return f'<SyncStatus #{self.sync_number} {self.sync_type}: {self.processed} faktur, {self.duration:.2f}s>'
 
 
+class AccountDailySnapshot(db.Model):
+    """
+    Model AccountDailySnapshot – dzienny stan konta (szereg czasowy do wykresow trendow).
+
+    Jeden wiersz na konto i dzien: liczba i kwota aktywnych spraw, liczby spraw
+    zamknietych (oplacone / nieoplacone) oraz liczba maili wyslanych danego dnia
+    per etap. Zapisywany przez snapshot_service (CRON /cron/daily_snapshot,
+    flask take-daily-snapshots) - ponowne uruchomienie nadpisuje wiersz dnia.
+    """
+    __tablename__ = 'account_daily_snapshot'
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False)
+    snapshot_date = db.Column(db.Date, nullable=False)
+    active_count = db.Column(db.Integer, nullable=False, default=0)
+    total_debt = db.Column(db.BigInteger, nullable=False, default=0)  # grosze
+    closed_paid_count = db.Column(db.Integer, nullable=False, default=0)
+    closed_unpaid_count = db.Column(db.Integer, nullable=False, default=0)
+    emails_stage_1 = db.Column(db.Integer, nullable=False, default=0)
+    emails_stage_2 = db.Column(db.Integer, nullable=False, default=0)
+    emails_stage_3 = db.Column(db.Integer, nullable=False, default=0)
+    emails_stage_4 = db.Column(db.Integer, nullable=False, default=0)
+    emails_stage_5 = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'snapshot_date', name='uq_snapshot_account_date'),
+    )
+
+    def __repr__(self):
+        return f'<AccountDailySnapshot {self.account_id} {self.snapshot_date}>'
+
+
 class NotificationSettings(db.Model):
     """
     Model NotificationSettings – przechowuje ustawienia powiadomień w bazie danych.
@@ -332,8 +750,9 @@ class User(UserMixin, db.Model):
         return check_password_hash(self._password_hash, password)
 
     def has_access_to_account(self, account_id):
-        """Check if user has access to specific account."""
-        return self.accounts.filter_by(id=account_id).first() is not None
+        """Check if user has access to specific account (cached per request - app.membership)."""
+        from .membership import has_access
+        return has_access(self.id, account_id)
 
     def get_accessible_accounts(self):
         """Return list of accounts user can access."""
@@ -343,6 +762,28 @@ class User(UserMixin, db.Model):
         return f'<User {self.email} (ID: {self.id})>'
 
 
+# Odszyfrowane credentials kont - klucz: SHA-256 szyfrogramu (nie tresc), ograniczony
+# rozmiar + TTL; wpis usuwany przy nadpisaniu wartosci (setter)
+DECRYPTED_CACHE_TTL = 300
+DECRYPTED_CACHE_MAX_ENTRIES = 256
+_decrypted_values = cache.LRUCache(max_entries=DECRYPTED_CACHE_MAX_ENTRIES, ttl=DECRYPTED_CACHE_TTL)
+
+
+@lru_cache(maxsize=4)
+def _fernet_for_key(key_str):
+    """Fernet dla klucza z ENCRYPTION_KEY (jeden obiekt na klucz, nie na odczyt)."""
+    # Import przy pierwszym uzyciu - cryptography nie wydluza startu procesu (warmup.py)
+    from cryptography.fernet import Fernet
+
+    # Ensure key is exactly 32 bytes
+    key_bytes = key_str.encode().ljust(32)[:32]
+    return Fernet(base64.urlsafe_b64encode(key_bytes))
+
+
+def _ciphertext_key(ciphertext):
+    return hashlib.sha256(ciphertext).digest()
+
+
 class Account(db.Model):
     """
     Model Account - reprezentuje profil/konto (np. Aquatest, Pozytron Szkolenia).
@@ -385,6 +826,11 @@ class Account(db.Model):
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Wersja danych konta - zwiekszana w transakcjach zapisujacych sprawy, faktury,
+    # logi i ustawienia (bump_account_data_version). ETag/Last-Modified widokow.
+    data_version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    data_changed_at = db.Column(db.DateTime, nullable=True)
+
     # Relationships
     cases = db.relationship('Case', backref='account', lazy=True)
     notification_logs = db.relationship('NotificationLog', backref='account', lazy=True)
@@ -392,12 +838,29 @@ class Account(db.Model):
 
     @staticmethod
     def _get_cipher():
-        """Returns Fernet cipher for encryption/decryption"""
-        key_str = os.environ.get('ENCRYPTION_KEY', 'default_32_byte_key_for_dev!!!')
-        # Ensure key is exactly 32 bytes
-        key_bytes = key_str.encode().ljust(32)[:32]
-        key = base64.urlsafe_b64encode(key_bytes)
-        return Fernet(key)
+        """Returns Fernet cipher for encryption/decryption (cached per key)"""
+        return _fernet_for_key(os.environ.get('ENCRYPTION_KEY', 'default_32_byte_key_for_dev!!!'))
+
+    @classmethod
+    def _decrypt(cls, ciphertext):
+        """
+        Deszyfruje wartosc (str) z cache odszyfrowanych wartosci.
+
+        Kazdy odczyt property (szablony, wysylka maili) trafia tutaj - Fernet
+        (HMAC + AES) liczony raz na szyfrogram w czasie DECRYPTED_CACHE_TTL.
+        """
+        key = _ciphertext_key(ciphertext)
+        value = _decrypted_values.get(key)
+        if value is None:
+            value = cls._get_cipher().decrypt(ciphertext).decode()
+            _decrypted_values.set(key, value)
+        return value
+
+    @staticmethod
+    def _forget_decrypted(ciphertext):
+        """Usuwa odszyfrowana wartosc z cache (nadpisanie credentials)."""
+        if ciphertext:
+            _decrypted_values.delete(_ciphertext_key(ciphertext))
 
     @property
     def infakt_api_key(self) -> str | None:
@@ -416,8 +879,7 @@ class Account(db.Model):
 
         # Fallback na starą kolumnę (migracja w toku)
         if self._infakt_api_key_encrypted:
-            cipher = self._get_cipher()
-            return cipher.decrypt(self._infakt_api_key_encrypted).decode()
+            return self._decrypt(self._infakt_api_key_encrypted)
         return None
 
     @infakt_api_key.setter
@@ -427,6 +889,7 @@ class Account(db.Model):
 
         Backward compatibility - zapisuje do starej kolumny.
         """
+        self._forget_decrypted(self._infakt_api_key_encrypted)
         cipher = self._get_cipher()
         self._infakt_api_key_encrypted = cipher.encrypt(value.encode())
 
@@ -439,9 +902,8 @@ class Account(db.Model):
         """Deszyfruje i zwraca credentials providera jako dict."""
         if self._provider_settings_encrypted:
             try:
-                cipher = self._get_cipher()
-                decrypted = cipher.decrypt(self._provider_settings_encrypted).decode()
-                return json.loads(decrypted)
+                # Nowy dict przy kazdym odczycie - modyfikacja wyniku nie zmienia cache
+                return json.loads(self._decrypt(self._provider_settings_encrypted))
             except (json.JSONDecodeError, Exception) as e:
                 # Loguj błąd, ale nie crashuj - zwróć None i pozwól na ponowną konfigurację
                 logging.getLogger(__name__).error(
@@ -453,6 +915,7 @@ class Account(db.Model):
     @provider_settings.setter
     def provider_settings(self, value: dict | None):
         """Szyfruje i zapisuje credentials providera jako JSON."""
+        self._forget_decrypted(self._provider_settings_encrypted)
         if value is None:
             self._provider_settings_encrypted = None
             return
@@ -464,13 +927,13 @@ class Account(db.Model):
     def smtp_username(self):
         """Decrypts and returns SMTP username"""
         if self._smtp_username_encrypted:
-            cipher = self._get_cipher()
-            return cipher.decrypt(self._smtp_username_encrypted).decode()
+            return self._decrypt(self._smtp_username_encrypted)
         return None
 
     @smtp_username.setter
     def smtp_username(self, value):
         """Encrypts and stores SMTP username"""
+        self._forget_decrypted(self._smtp_username_encrypted)
         cipher = self._get_cipher()
         self._smtp_username_encrypted = cipher.encrypt(value.encode())
 
@@ -478,13 +941,13 @@ class Account(db.Model):
     def smtp_password(self):
         """Decrypts and returns SMTP password"""
         if self._smtp_password_encrypted:
-            cipher = self._get_cipher()
-            return cipher.decrypt(self._smtp_password_encrypted).decode()
+            return self._decrypt(self._smtp_password_encrypted)
         return None
 
     @smtp_password.setter
     def smtp_password(self, value):
         """Encrypts and stores SMTP password"""
+        self._forget_decrypted(self._smtp_password_encrypted)
         cipher = self._get_cipher()
         self._smtp_password_encrypted = cipher.encrypt(value.encode())
 
@@ -665,3 +1128,150 @@ class AccountScheduleSettings(db.Model):
             errors.append("Termin pobierania faktur musi być między 1-30 dni")
 
         return (len(errors) == 0, errors)
+
+
+@event.listens_for(Session, 'before_flush')
+def _store_notification_bodies(session, flush_context, instances):
+    """Zapisuje tresci NotificationLog do NotificationBody przed flush."""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, NotificationLog) and '_pending_body' in obj.__dict__:
+            obj._store_pending_body(session)
+
+
+@event.listens_for(NotificationLog, 'after_insert')
+def _update_case_progress(mapper, connection, target):
+    """
+    Aktualizuje Case.max_stage / last_notified_at po zapisie NotificationLog.
+
+    UPDATE w tej samej transakcji co INSERT logu. Wpisy bez rozpoznanego etapu
+    (np. "System", "Archiwizacja") nie zmieniaja postepu.
+    """
+    stage_num = stage_to_number(target.stage)
+    if stage_num == 0:
+        return
+
+    case_table = Case.__table__
+    sent_at = target.sent_at or datetime.utcnow()
+    connection.execute(
+        case_table.update()
+        .where(case_table.c.account_id == target.account_id,
+               case_table.c.case_number == target.invoice_number)
+        .values(
+            max_stage=sql_case(
+                (case_table.c.max_stage < stage_num, stage_num),
+                else_=case_table.c.max_stage
+            ),
+            last_notified_at=sql_case(
+                (case_table.c.last_notified_at.is_(None), sent_at),
+                (case_table.c.last_notified_at < sent_at, sent_at),
+                else_=case_table.c.last_notified_at
+            ),
+            # Bez zmiany updated_at (sortowanie zakonczonych spraw)
+            updated_at=case_table.c.updated_at
+        )
+    )
+
+
+# Modele, ktorych zapis zmienia dane widoczne w widokach konta
+DATA_VERSION_MODELS = (Case, Invoice, NotificationLog, SyncStatus, NotificationSettings, AccountScheduleSettings,
+                       AccountDailySnapshot)
+
+# Klucz w session.info - konta z data_version zwiekszonym w biezacej transakcji
+_DATA_VERSION_BUMPED = '_data_version_bumped'
+
+
+def bump_account_data_version(session, account_id):
+    """
+    Zwieksza Account.data_version (raz na transakcje sesji).
+
+    UPDATE w tej samej transakcji co zapis danych - wycofanie transakcji wycofuje
+    tez zmiane wersji. Po COMMIT uniewaznia cache konta (app.cache).
+
+    Args:
+        session: Sesja SQLAlchemy
+        account_id: ID konta
+    """
+    if account_id is None:
+        return
+    bumped = session.info.setdefault(_DATA_VERSION_BUMPED, set())
+    if account_id in bumped:
+        return
+    bumped.add(account_id)
+
+    account_table = Account.__table__
+    session.connection().execute(
+        account_table.update()
+        .where(account_table.c.id == account_id)
+        .values(
+            data_version=account_table.c.data_version + 1,
+            data_changed_at=datetime.utcnow()
+        )
+    )
+    cache.invalidate_account_on_commit(session, account_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_changed_accounts(session, flush_context):
+    """Zwieksza data_version kont, ktorych dane zmieniono w tym flush."""
+    changed = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj, include_collections=False)
+    ]
+    for obj in changed:
+        if isinstance(obj, DATA_VERSION_MODELS):
+            bump_account_data_version(session, obj.account_id)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _reset_bumped_accounts(session):
+    """Nowa transakcja - data_version moze byc zwiekszony ponownie."""
+    session.info.pop(_DATA_VERSION_BUMPED, None)
+
+
+# Modele, ktorych zapis zmienia agregaty klienta (Client)
+CLIENT_LEDGER_MODELS = (Case, Invoice, NotificationLog)
+
+# Klucz w session.info - (account_id, client_id) do przeliczenia przed COMMIT
+_TOUCHED_CLIENTS = '_touched_clients'
+
+
+def _touched_client_ids(obj):
+    """ID klientow dotknietych zmiana obiektu (z poprzednia wartoscia client_id)."""
+    client_ids = {obj.client_id}
+    if isinstance(obj, Case):
+        client_ids.update(sa_inspect(obj).attrs.client_id.history.deleted or ())
+    return client_ids
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_touched_clients(session, flush_context):
+    """Zbiera klientow, ktorych sprawy/faktury/logi zmieniono w tym flush."""
+    touched = session.info.setdefault(_TOUCHED_CLIENTS, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CLIENT_LEDGER_MODELS) and obj.account_id is not None:
+            for client_id in _touched_client_ids(obj):
+                if client_id:
+                    touched.add((obj.account_id, client_id))
+
+
+@event.listens_for(Session, 'before_commit')
+def _refresh_touched_clients(session):
+    """Przelicza agregaty dotknietych klientow w tej samej transakcji."""
+    session.flush()
+    touched = session.info.pop(_TOUCHED_CLIENTS, None)
+    if not touched:
+        return
+
+    by_account = {}
+    for account_id, client_id in touched:
+        by_account.setdefault(account_id, set()).add(client_id)
+
+    connection = session.connection()
+    for account_id, client_ids in by_account.items():
+        Client.refresh(connection, account_id, client_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_touched_clients(session):
+    """Wycofana transakcja - brak zmian do przeliczenia."""
+    session.info.pop(_TOUCHED_CLIENTS, None)
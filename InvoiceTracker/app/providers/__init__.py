@@ -3,8 +3,15 @@ Warstwa abstrakcji dostawców danych fakturowych.
 Umożliwia łatwą wymianę dostawcy (InFakt, wFirma, Fakturownia) bez zmian w logice synchronizacji.
 """
 from .base import InvoiceProvider
-from .factory import get_provider
-from .infakt import InFaktProvider
-from .wfirma import WFirmaProvider
+from .factory import get_provider, get_provider_class
 
 __all__ = ['InvoiceProvider', 'get_provider', 'InFaktProvider', 'WFirmaProvider']
+
+# Adaptery importowane leniwie (factory.PROVIDER_MAP)
+_LAZY_PROVIDERS = {'InFaktProvider': 'infakt', 'WFirmaProvider': 'wfirma'}
+
+
+def __getattr__(name):
+    if name in _LAZY_PROVIDERS:
+        return get_provider_class(_LAZY_PROVIDERS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
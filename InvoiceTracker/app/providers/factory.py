@@ -1,13 +1,15 @@
 """
 Fabryka providerów.
 Wybiera odpowiedni adapter na podstawie Account.provider_type.
+
+Moduly adapterow (i ich zaleznosci - requests) sa importowane dopiero przy
+pierwszym uzyciu providera - nie wydluzaja startu instancji.
 """
+import importlib
 import logging
 from typing import TYPE_CHECKING
 
 from .base import InvoiceProvider
-from .infakt import InFaktProvider
-from .wfirma import WFirmaProvider
 
 if TYPE_CHECKING:
     from ..models import Account
@@ -15,13 +17,27 @@ if TYPE_CHECKING:
 log = logging.getLogger(__name__)
 
 
-# Mapa obsługiwanych providerów
-PROVIDER_MAP: dict[str, type[InvoiceProvider]] = {
-    'infakt': InFaktProvider,
-    'wfirma': WFirmaProvider,
+# Mapa obsługiwanych providerów: typ -> (moduł, klasa adaptera)
+PROVIDER_MAP: dict[str, tuple[str, str]] = {
+    'infakt': ('.infakt', 'InFaktProvider'),
+    'wfirma': ('.wfirma', 'WFirmaProvider'),
 }
 
 
+def get_provider_class(provider_type: str) -> type[InvoiceProvider]:
+    """
+    Klasa adaptera dla typu providera (import modułu przy pierwszym użyciu).
+
+    Args:
+        provider_type: Klucz z PROVIDER_MAP ('infakt', 'wfirma')
+
+    Returns:
+        Klasa InvoiceProvider
+    """
+    module_name, class_name = PROVIDER_MAP[provider_type]
+    return getattr(importlib.import_module(module_name, package=__package__), class_name)
+
+
 def get_provider(account: "Account") -> InvoiceProvider:
     """
     Zwraca odpowiedni provider dla danego konta.
@@ -44,7 +60,7 @@ def get_provider(account: "Account") -> InvoiceProvider:
         raise ValueError(f"Nieobsługiwany provider: {provider_type}. "
                          f"Dostępne: {list(PROVIDER_MAP.keys())}")
 
-    provider_class = PROVIDER_MAP[provider_type]
+    provider_class = get_provider_class(provider_type)
 
     # Konfiguracja credentials dla każdego typu providera
     if provider_type == 'infakt':
@@ -15,4 +15,10 @@ from . import case_service
 from . import finance_service
 from . import notification_service
 from . import payment_service
-from . import diagnostic_service
+from . import outbox_service
+from . import search_service
+from . import data_version
+from . import client_service
+from . import report_service
+from . import snapshot_service
+from . import export_service
@@ -0,0 +1,259 @@
+"""
+Serwis API odczytu (v1).
+Sprawy aktywne / zakonczone, szczegoly sprawy i podsumowanie klienta jako JSON.
+
+- Wybor pol (fields=) - zapytanie pobiera tylko kolumny potrzebne do
+  wybranych pol (projekcja kolumn, bez obiektow ORM)
+- Paginacja kursorowa (keyset_pagination) - koszt strony staly, bez COUNT(*)
+- Filtry i sortowanie spraw wspolne z listami HTML (case_service.build_*_query)
+- Izolacja kont - jawny filtr account_id + filtr tenanta (do_orm_execute)
+"""
+import logging
+from datetime import date
+
+from ..db_routing import replica_reads
+from ..extensions import db
+from ..models import Case, Client, Invoice, NotificationLog
+from . import case_service, keyset_pagination
+from .finance_service import grosz_to_pln, calculate_left_to_pay
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def _iso(value):
+    """Data/czas w formacie ISO 8601 (None bez zmian)."""
+    return value.isoformat() if value is not None else None
+
+
+def _left_to_pay(row):
+    """Pozostalo do zaplaty (grosze) - left_to_pay lub wyliczone z kwot."""
+    if row.left_to_pay is not None:
+        return row.left_to_pay
+    return calculate_left_to_pay(row.gross_price, row.paid_price)
+
+
+# Pola spraw: nazwa -> (kolumny potrzebne do wyliczenia, funkcja (wiersz, dzis) -> wartosc)
+CASE_FIELDS = {
+    'case_number': ((Case.case_number,), lambda row, today: row.case_number),
+    'client_id': ((Case.client_id,), lambda row, today: row.client_id),
+    'client_company_name': ((Case.client_company_name,), lambda row, today: row.client_company_name),
+    'client_nip': ((Invoice.client_nip,), lambda row, today: row.client_nip),
+    'client_email': (
+        (Invoice.client_email, Invoice.override_email),
+        lambda row, today: row.override_email or row.client_email
+    ),
+    'status': ((Case.status,), lambda row, today: row.status),
+    'invoice_number': ((Invoice.invoice_number,), lambda row, today: row.invoice_number),
+    'invoice_date': ((Invoice.invoice_date,), lambda row, today: _iso(row.invoice_date)),
+    'payment_due_date': ((Invoice.payment_due_date,), lambda row, today: _iso(row.payment_due_date)),
+    'days_diff': (
+        (Invoice.payment_due_date,),
+        lambda row, today: (today - row.payment_due_date).days if row.payment_due_date else None
+    ),
+    'total_debt': (
+        (Invoice.left_to_pay, Invoice.gross_price, Invoice.paid_price),
+        lambda row, today: grosz_to_pln(_left_to_pay(row))
+    ),
+    'total_amount': ((Invoice.gross_price,), lambda row, today: grosz_to_pln(row.gross_price)),
+    'paid_amount': ((Invoice.paid_price,), lambda row, today: grosz_to_pln(row.paid_price)),
+    'paid_date': ((Invoice.paid_date,), lambda row, today: _iso(row.paid_date)),
+    'payment_method': ((Invoice.payment_method,), lambda row, today: row.payment_method),
+    'currency': ((Invoice.currency,), lambda row, today: row.currency),
+    'progress_percent': ((Case.max_stage,), lambda row, today: int((row.max_stage or 0) / 5 * 100)),
+    'updated_at': ((Case.updated_at,), lambda row, today: _iso(row.updated_at)),
+}
+
+# Domyslne pola list (odpowiednik kolumn tabel HTML)
+DEFAULT_ACTIVE_FIELDS = [
+    'case_number', 'client_id', 'client_company_name', 'client_nip', 'client_email',
+    'total_debt', 'days_diff', 'progress_percent', 'status',
+]
+DEFAULT_COMPLETED_FIELDS = DEFAULT_ACTIVE_FIELDS + ['paid_date', 'paid_amount', 'total_amount', 'payment_method']
+
+# Szczegoly sprawy - wszystkie pola sprawy + historia powiadomien (osobne zapytanie)
+DETAIL_NOTIFICATIONS_FIELD = 'notifications'
+DETAIL_FIELDS = list(CASE_FIELDS) + [DETAIL_NOTIFICATIONS_FIELD]
+
+CLIENT_FIELDS = {
+    'client_id': ((Client.client_id,), lambda row, today: row.client_id),
+    'company_name': ((Client.company_name,), lambda row, today: row.company_name),
+    'nip': ((Client.nip,), lambda row, today: row.nip),
+    'email': ((Client.email,), lambda row, today: row.email),
+    'address': ((Client.address,), lambda row, today: row.address),
+    'open_debt': ((Client.open_debt,), lambda row, today: grosz_to_pln(row.open_debt or 0)),
+    'active_count': ((Client.active_count,), lambda row, today: row.active_count),
+    'closed_count': ((Client.closed_count,), lambda row, today: row.closed_count),
+    'oldest_due_date': ((Client.oldest_due_date,), lambda row, today: _iso(row.oldest_due_date)),
+    'days_overdue': (
+        (Client.oldest_due_date,),
+        lambda row, today: (today - row.oldest_due_date).days if row.oldest_due_date else None
+    ),
+    'progress_percent': ((Client.max_stage,), lambda row, today: int((row.max_stage or 0) / 5 * 100)),
+    'updated_at': ((Client.updated_at,), lambda row, today: _iso(row.updated_at)),
+}
+
+
+def parse_fields(raw, available, default):
+    """
+    Parsuje parametr fields= (lista pol po przecinku).
+
+    Args:
+        raw: Wartosc parametru (None/"" = pola domyslne)
+        available: Dozwolone nazwy pol
+        default: Pola domyslne
+
+    Returns:
+        list: Nazwy pol (bez powtorzen, w kolejnosci podania)
+
+    Raises:
+        ValueError: Nieznane pole
+    """
+    if not raw:
+        return list(default)
+    names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Nieznane pola: {', '.join(unknown)}. Dostepne: {', '.join(available)}")
+    return names or list(default)
+
+
+def _projection(fields, field_map):
+    """Kolumny potrzebne do wybranych pol (kazda kolumna raz, etykieta = nazwa atrybutu)."""
+    columns = {}
+    for name in fields:
+        for column in field_map[name][0]:
+            columns.setdefault(column.key, column)
+    return [column.label(key) for key, column in columns.items()]
+
+
+def _serialize(row, fields, field_map, today):
+    """Slownik wybranych pol z wiersza projekcji."""
+    return {name: field_map[name][1](row, today) for name in fields}
+
+
+@replica_reads
+def list_cases(account_id, scope, fields, search_query="", sort_by="case_number", sort_order="asc",
+               show_unpaid=False, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Strona listy spraw z wybranymi polami (paginacja kursorowa).
+
+    Args:
+        account_id: ID konta
+        scope: "active" lub "completed"
+        fields: Lista pol (parse_fields)
+        search_query: Zapytanie wyszukiwania (juz w lowercase)
+        sort_by: Kolumna sortowania (klucz case_service.SORT_COLUMN_MAP_ACTIVE)
+        sort_order: "asc" lub "desc"
+        show_unpaid: Tylko nieoplacone (scope="completed")
+        cursor: Kursor z poprzedniej odpowiedzi (None = pierwsza strona)
+        limit: Rozmiar strony (1..MAX_LIMIT)
+
+    Returns:
+        dict: {'data', 'next_cursor', 'prev_cursor', 'sort_by', 'sort_order', 'limit'}
+    """
+    if scope == 'active':
+        query = case_service.build_active_cases_query(account_id, search_query)
+        default_sort = case_service.DEFAULT_SORT_ACTIVE
+    else:
+        query = case_service.build_completed_cases_query(account_id, search_query, show_unpaid)
+        default_sort = case_service.DEFAULT_SORT_COMPLETED
+
+    limit = max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+    sort_key, column, order = case_service.resolve_sort(sort_by, sort_order, default_sort)
+
+    # Projekcja: id + kolumna sortowania (kursor) + kolumny wybranych pol
+    query = query.with_entities(
+        Case.id.label('_id'), column.label('_sort'), *_projection(fields, CASE_FIELDS)
+    )
+    result = keyset_pagination.paginate_keyset(
+        query, column, Case.id, sort_key, order, cursor or '', limit,
+        row_key=lambda row: (row._sort, row._id)
+    )
+
+    today = date.today()
+    return {
+        'data': [_serialize(row, fields, CASE_FIELDS, today) for row in result['items']],
+        'next_cursor': result['next_cursor'],
+        'prev_cursor': result['prev_cursor'],
+        'sort_by': sort_key,
+        'sort_order': order,
+        'limit': limit,
+    }
+
+
+@replica_reads
+def get_case(account_id, case_number, fields):
+    """
+    Szczegoly sprawy z wybranymi polami.
+
+    Pole "notifications" - historia powiadomien bez tresci (osobne zapytanie,
+    wykonywane tylko gdy pole zostalo wybrane).
+
+    Args:
+        account_id: ID konta
+        case_number: Numer sprawy
+        fields: Lista pol (parse_fields z DETAIL_FIELDS)
+
+    Returns:
+        dict lub None: Dane sprawy (None gdy nie znaleziono)
+    """
+    case_fields = [name for name in fields if name != DETAIL_NOTIFICATIONS_FIELD]
+
+    row = (
+        db.session.query(Case.id.label('_id'), *_projection(case_fields, CASE_FIELDS))
+        .select_from(Case)
+        .outerjoin(Invoice, Case.id == Invoice.case_id)
+        .filter(Case.account_id == account_id, Case.case_number == case_number)
+        .first()
+    )
+    if row is None:
+        return None
+
+    item = _serialize(row, case_fields, CASE_FIELDS, date.today())
+    if DETAIL_NOTIFICATIONS_FIELD in fields:
+        logs = (
+            db.session.query(
+                NotificationLog.id, NotificationLog.sent_at, NotificationLog.stage,
+                NotificationLog.mode, NotificationLog.subject, NotificationLog.email_to
+            )
+            .filter(NotificationLog.account_id == account_id, NotificationLog.invoice_number == case_number)
+            .order_by(NotificationLog.sent_at.desc(), NotificationLog.id.desc())
+        )
+        item[DETAIL_NOTIFICATIONS_FIELD] = [
+            {
+                'id': lg.id,
+                'sent_at': _iso(lg.sent_at),
+                'stage': lg.stage,
+                'mode': lg.mode,
+                'subject': lg.subject,
+                'email_to': lg.email_to,
+            }
+            for lg in logs
+        ]
+    return item
+
+
+@replica_reads
+def get_client_summary(account_id, client_id, fields):
+    """
+    Podsumowanie klienta z kartoteki (Client) z wybranymi polami.
+
+    Args:
+        account_id: ID konta
+        client_id: ID klienta
+        fields: Lista pol (parse_fields z CLIENT_FIELDS)
+
+    Returns:
+        dict lub None: Dane klienta (None gdy nie znaleziono)
+    """
+    row = (
+        db.session.query(Client.id.label('_id'), *_projection(fields, CLIENT_FIELDS))
+        .filter(Client.account_id == account_id, Client.client_id == client_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return _serialize(row, fields, CLIENT_FIELDS, date.today())
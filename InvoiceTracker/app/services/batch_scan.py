@@ -0,0 +1,82 @@
+"""
+Strumieniowe skanowanie duzych wynikow zapytan ORM.
+
+Zamiast .all() (caly wynik w pamieci) lub petli OFFSET / LIMIT (kazda
+kolejna partia drozsza, bez stabilnego porzadku pomijane wiersze) wiersze
+sa pobierane partiami z jednego zapytania - yield_per. W PostgreSQL
+(psycopg2) yield_per wlacza stream_results: kursor po stronie serwera,
+proces trzyma w pamieci tylko biezaca partie.
+
+Po kazdej partii obiekty zaladowane w trakcie skanu (wiersze, obiekty
+doczytane relacjami, zapisane flush-em nowe obiekty) sa odlaczane od sesji
+(expunge) - pamiec procesu nie rosnie z rozmiarem konta. Obiekty obecne
+w sesji przed skanem (np. Account) i obiekty z niezapisanymi zmianami
+zostaja w sesji.
+
+Ograniczenia:
+- w trakcie skanu nie wolno wykonywac COMMIT / ROLLBACK - konczy transakcje
+  i zamyka kursor serwera; zapisy partiami - flush_batches=True, jeden
+  COMMIT po skanie
+- zapytanie nie moze uzywac joinedload kolekcji (yield_per tego nie wspiera)
+"""
+import logging
+
+from sqlalchemy import inspect as sa_inspect
+
+from ..extensions import db
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SCAN_BATCH_SIZE = 500
+
+
+def _release_batch(session, kept_keys):
+    """Odlacza od sesji obiekty zaladowane w trakcie skanu, bez niezapisanych zmian."""
+    released = 0
+    for key, obj in list(session.identity_map.items()):
+        if key in kept_keys:
+            continue
+        if sa_inspect(obj).modified:
+            continue
+        session.expunge(obj)
+        released += 1
+    return released
+
+
+def stream_scan(query, batch_size=DEFAULT_SCAN_BATCH_SIZE, flush_batches=False):
+    """
+    Iteruje po wyniku zapytania partiami, ze stala pamiecia procesu.
+
+    Usage:
+        for inv in stream_scan(Invoice.query.filter(...).order_by(Invoice.id)):
+            ...
+
+    Args:
+        query: Zapytanie ORM (Model.query / db.session.query)
+        batch_size: Liczba wierszy pobieranych z bazy na raz
+        flush_batches: Czy po kazdej partii wykonac flush (zmiany wierszy
+            i nowe obiekty trafiaja do bazy i moga zostac odlaczone od sesji)
+
+    Yields:
+        Kolejne wiersze wyniku (obiekty modelu lub krotki kolumn)
+    """
+    session = db.session()
+    kept_keys = set(session.identity_map.keys())
+    in_batch = 0
+    total = 0
+
+    for row in query.yield_per(batch_size):
+        yield row
+        in_batch += 1
+        if in_batch >= batch_size:
+            total += in_batch
+            in_batch = 0
+            if flush_batches:
+                session.flush()
+            _release_batch(session, kept_keys)
+
+    total += in_batch
+    if flush_batches:
+        session.flush()
+    _release_batch(session, kept_keys)
+    log.debug(f"[batch_scan] Przeskanowano {total} wierszy (partie po {batch_size})")
@@ -3,21 +3,31 @@ Serwis spraw windykacyjnych.
 Logika pobierania, przetwarzania i listowania spraw.
 
 SQL Performance Optimization:
-- Filtering (search) wykonywane na poziomie SQL (ILIKE)
+- Filtering (search) wykonywane na poziomie SQL (search_service - pg_trgm / ILIKE)
 - Sortowanie wykonywane na poziomie SQL (ORDER BY)
 - Paginacja wykonywane na poziomie SQL (.paginate())
-- NotificationLogs pobierane TYLKO dla wyswietlanej strony
-- Wyjatek: sortowanie po progress_percent - wykonywane w pamieci
+- Postep (progress_percent) z denormalizowanej kolumny Case.max_stage - sortowanie
+  i paginacja w SQL jak dla pozostalych kolumn, widok klienta bez zapytan o logi
+- Tryb paginacji kursorowej (keyset) - bez OFFSET i COUNT(*) na kazdej stronie
+- Statystyki i liczniki list w cache per konto (app.cache) - uniewaznianie po zapisach
+- Tresc powiadomienia pobierana na zadanie (get_notification_body)
+- Listy czytaja projekcje kolumn (ACTIVE_LIST_COLUMNS / COMPLETED_LIST_COLUMNS) -
+  krotki zamiast par (Case, Invoice), bez identity map i nieuzywanych kolumn
+  (notes, client_address, ...); porownanie: flask bench-case-lists
 """
 import logging
 from datetime import date
 
-from sqlalchemy import func, or_
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
 
+from .. import cache
+from ..db_routing import replica_reads
 from ..extensions import db
-from ..models import Case, Invoice, NotificationLog
+from ..models import Case, Client, Invoice, NotificationLog
 from ..constants import STAGE_MAPPING_PROGRESS
 from .finance_service import grosz_to_pln, calculate_left_to_pay
+from . import data_version, keyset_pagination, search_service
 
 log = logging.getLogger(__name__)
 
@@ -35,8 +45,38 @@ SORT_COLUMN_MAP_ACTIVE = {
     'client_email': Invoice.client_email,
     'total_debt': Invoice.left_to_pay,
     'days_diff': Invoice.payment_due_date,
+    'progress_percent': Case.max_stage,
 }
 
+# Kolumny wierszy list (projekcja zamiast par encji (Case, Invoice)).
+# Etykieta = nazwa atrybutu - musi zawierac kolumny z SORT_COLUMN_MAP_ACTIVE
+# (wartosc kursora keyset) i kolumne domyslnego sortowania.
+ACTIVE_LIST_COLUMNS = (
+    Case.id,
+    Case.case_number,
+    Case.client_id,
+    Case.client_company_name,
+    Case.status,
+    Case.max_stage,
+    Case.updated_at,
+    Invoice.client_nip,
+    Invoice.client_email,
+    Invoice.payment_due_date,
+    Invoice.gross_price,
+    Invoice.paid_price,
+    Invoice.left_to_pay,
+)
+COMPLETED_LIST_COLUMNS = ACTIVE_LIST_COLUMNS + (
+    Invoice.invoice_date,
+    Invoice.paid_date,
+    Invoice.payment_method,
+)
+
+# Domyslne sortowanie list (sort_key, kolumna, kierunek) gdy sort_by nieznany
+DEFAULT_SORT_ACTIVE = ('case_number', Case.case_number, 'asc')
+# Zakonczone - po dacie aktualizacji (najnowsze najpierw)
+DEFAULT_SORT_COMPLETED = ('updated_at', Case.updated_at, 'desc')
+
 
 # =============================================================================
 # HELPERY WEWNETRZNE
@@ -56,23 +96,6 @@ def _stage_from_log_text(text):
     return STAGE_MAPPING_PROGRESS.get(stage_key, 0)
 
 
-def _calculate_max_stage(logs):
-    """
-    Oblicza maksymalny etap z listy logow powiadomien.
-
-    Args:
-        logs: Lista obiektow NotificationLog
-
-    Returns:
-        int: Maksymalny numer etapu (0-5)
-    """
-    max_stage = 0
-    for lg in logs:
-        st = _stage_from_log_text(lg.stage)
-        max_stage = max(max_stage, st)
-    return max_stage
-
-
 def _calculate_progress_percent(max_stage):
     """
     Konwertuje numer etapu na procent postepu.
@@ -86,114 +109,94 @@ def _calculate_progress_percent(max_stage):
     return int((max_stage / 5) * 100)
 
 
-def _group_logs_by_invoice(logs):
-    """
-    Grupuje logi powiadomien po numerze faktury.
-
-    Args:
-        logs: Lista obiektow NotificationLog
-
-    Returns:
-        dict: {invoice_number: [NotificationLog, ...]}
-    """
-    logs_by_invoice = {}
-    for log_entry in logs:
-        if log_entry.invoice_number not in logs_by_invoice:
-            logs_by_invoice[log_entry.invoice_number] = []
-        logs_by_invoice[log_entry.invoice_number].append(log_entry)
-    return logs_by_invoice
-
-
-def _build_active_case_item(case_obj, invoice, logs_for_invoice):
+def _build_active_case_item(row):
     """
     Buduje slownik reprezentujacy aktywna sprawe do wyswietlenia.
 
     Args:
-        case_obj: Obiekt Case
-        invoice: Obiekt Invoice
-        logs_for_invoice: Lista NotificationLog dla tej faktury
+        row: Wiersz projekcji ACTIVE_LIST_COLUMNS
 
     Returns:
         dict: Dane sprawy gotowe do szablonu
     """
-    left = calculate_left_to_pay(invoice.gross_price, invoice.paid_price)
-    if invoice.left_to_pay is not None:
-        left = invoice.left_to_pay
+    left = calculate_left_to_pay(row.gross_price, row.paid_price)
+    if row.left_to_pay is not None:
+        left = row.left_to_pay
 
     day_diff = None
-    if invoice.payment_due_date:
-        day_diff = (date.today() - invoice.payment_due_date).days
+    if row.payment_due_date:
+        day_diff = (date.today() - row.payment_due_date).days
 
-    max_stage = _calculate_max_stage(logs_for_invoice)
-    progress_val = _calculate_progress_percent(max_stage)
+    progress_val = _calculate_progress_percent(row.max_stage or 0)
 
     return {
-        'case_number': case_obj.case_number,
-        'client_id': case_obj.client_id,
-        'client_company_name': case_obj.client_company_name,
-        'client_nip': invoice.client_nip,
-        'client_email': invoice.client_email if invoice.client_email else "Brak",
+        'id': row.id,
+        'case_number': row.case_number,
+        'client_id': row.client_id,
+        'client_company_name': row.client_company_name,
+        'client_nip': row.client_nip,
+        'client_email': row.client_email if row.client_email else "Brak",
         'total_debt': grosz_to_pln(left),
         'days_diff': day_diff,
         'progress_percent': progress_val,
-        'status': case_obj.status
+        'status': row.status
     }
 
 
-def _build_completed_case_item(case_obj, invoice, logs_for_invoice):
+def _build_completed_case_item(row):
     """
     Buduje slownik reprezentujacy zakonczona sprawe do wyswietlenia.
 
     Args:
-        case_obj: Obiekt Case
-        invoice: Obiekt Invoice
-        logs_for_invoice: Lista NotificationLog dla tej faktury
+        row: Wiersz projekcji COMPLETED_LIST_COLUMNS
 
     Returns:
         dict: Dane sprawy gotowe do szablonu
     """
-    left = calculate_left_to_pay(invoice.gross_price, invoice.paid_price)
-    if invoice.left_to_pay is not None:
-        left = invoice.left_to_pay
+    left = calculate_left_to_pay(row.gross_price, row.paid_price)
+    if row.left_to_pay is not None:
+        left = row.left_to_pay
 
     day_diff = None
-    if invoice.payment_due_date:
-        day_diff = (date.today() - invoice.payment_due_date).days
+    if row.payment_due_date:
+        day_diff = (date.today() - row.payment_due_date).days
 
-    max_stage = _calculate_max_stage(logs_for_invoice)
-    progress_val = _calculate_progress_percent(max_stage)
+    progress_val = _calculate_progress_percent(row.max_stage or 0)
 
     payment_info = {
-        'paid_date': invoice.paid_date.strftime('%Y-%m-%d') if invoice.paid_date else None,
-        'paid_amount': grosz_to_pln(invoice.paid_price),
-        'total_amount': grosz_to_pln(invoice.gross_price),
-        'payment_method': invoice.payment_method or "N/A"
+        'paid_date': row.paid_date.strftime('%Y-%m-%d') if row.paid_date else None,
+        'paid_amount': grosz_to_pln(row.paid_price),
+        'total_amount': grosz_to_pln(row.gross_price),
+        'payment_method': row.payment_method or "N/A"
     }
 
     return {
-        'case_number': case_obj.case_number,
-        'client_id': case_obj.client_id,
-        'client_company_name': case_obj.client_company_name,
-        'client_nip': invoice.client_nip,
-        'client_email': invoice.client_email if invoice.client_email else "Brak",
+        'id': row.id,
+        'case_number': row.case_number,
+        'client_id': row.client_id,
+        'client_company_name': row.client_company_name,
+        'client_nip': row.client_nip,
+        'client_email': row.client_email if row.client_email else "Brak",
         'total_debt': grosz_to_pln(left),
         'days_diff': day_diff,
         'progress_percent': progress_val,
-        'status': case_obj.status,
+        'status': row.status,
         'payment_info': payment_info,
-        'invoice_date': invoice.invoice_date.strftime('%Y-%m-%d') if invoice.invoice_date else None,
-        'payment_due_date': invoice.payment_due_date.strftime('%Y-%m-%d') if invoice.payment_due_date else None
+        'invoice_date': row.invoice_date.strftime('%Y-%m-%d') if row.invoice_date else None,
+        'payment_due_date': row.payment_due_date.strftime('%Y-%m-%d') if row.payment_due_date else None
     }
 
 
-def _build_client_case_item(case_obj, invoice, account_id):
+def _build_client_case_item(case_obj, invoice):
     """
     Buduje slownik reprezentujacy sprawe klienta.
 
+    Postep z denormalizowanej kolumny Case.max_stage - bez zapytania
+    o logi powiadomien dla kazdej sprawy.
+
     Args:
         case_obj: Obiekt Case
         invoice: Obiekt Invoice
-        account_id: ID konta
 
     Returns:
         dict lub None: Dane sprawy gotowe do szablonu
@@ -209,16 +212,7 @@ def _build_client_case_item(case_obj, invoice, account_id):
     if invoice.payment_due_date:
         day_diff = (date.today() - invoice.payment_due_date).days
 
-    try:
-        logs = NotificationLog.query.filter_by(
-            invoice_number=invoice.invoice_number,
-            account_id=account_id
-        ).all()
-    except Exception:
-        logs = []
-
-    max_stage = _calculate_max_stage(logs)
-    progress_val = _calculate_progress_percent(max_stage)
+    progress_val = _calculate_progress_percent(case_obj.max_stage or 0)
     effective_email = invoice.get_effective_email() if invoice else "Brak"
 
     return {
@@ -237,161 +231,247 @@ def _build_client_case_item(case_obj, invoice, account_id):
     }
 
 
+def _count_cases(query):
+    """Liczba spraw w zapytaniu listy - bez sortowania."""
+    return query.with_entities(func.count(Case.id)).order_by(None).scalar() or 0
+
+
+def _cached_count(account_id, query, scope, search_query):
+    """
+    Liczba spraw w zapytaniu listy - z cache per konto i wersja danych.
+
+    Args:
+        account_id: ID konta
+        query: Zapytanie listy z filtrami
+        scope: Rodzaj listy ("active", "completed", "completed_unpaid")
+        search_query: Fraza wyszukiwania (czesc klucza cache)
+
+    Returns:
+        int: Liczba spraw
+    """
+    version = data_version.get_request_data_version(account_id)
+    return cache.get_or_compute(
+        account_id, f"count:{scope}:{version}:{search_query or ''}", lambda: _count_cases(query)
+    )
+
+
+def _active_stats(account_id):
+    """
+    Agregat dla WSZYSTKICH aktywnych spraw konta (liczba + suma dlugu).
+
+    Returns:
+        dict: {'count': int, 'total_debt': int (grosze)}
+    """
+    stats = (
+        db.session.query(
+            func.count(Case.id).label('total_count'),
+            func.coalesce(func.sum(Invoice.left_to_pay), 0).label('total_debt')
+        )
+        .join(Invoice, Case.id == Invoice.case_id)
+        .filter(Case.account_id == account_id, Case.status == 'active')
+        .first()
+    )
+    return {'count': int(stats.total_count or 0), 'total_debt': int(stats.total_debt or 0)}
+
+
+def build_active_cases_query(account_id, search_query=""):
+    """
+    Zapytanie (Case, Invoice) listy aktywnych spraw z filtrem wyszukiwania, bez sortowania.
+    Wspolne dla listy, eksportu i API - te same filtry w kazdym miejscu.
+
+    Args:
+        account_id: ID konta
+        search_query: Zapytanie wyszukiwania (juz w lowercase)
+
+    Returns:
+        Query: Zapytanie (Case, Invoice)
+    """
+    query = (
+        db.session.query(Case, Invoice)
+        .join(Invoice, Case.id == Invoice.case_id)
+        .filter(Case.account_id == account_id, Case.status == 'active')
+    )
+    return search_service.apply_case_search(query, search_query, account_id)
+
+
+def build_completed_cases_query(account_id, search_query="", show_unpaid=False):
+    """
+    Zapytanie (Case, Invoice) listy zakonczonych spraw z filtrami, bez sortowania.
+
+    Args:
+        account_id: ID konta
+        search_query: Zapytanie wyszukiwania (juz w lowercase)
+        show_unpaid: Czy tylko nieoplacone
+
+    Returns:
+        Query: Zapytanie (Case, Invoice)
+    """
+    query = (
+        db.session.query(Case, Invoice)
+        .join(Invoice, Case.id == Invoice.case_id)
+        .filter(Case.account_id == account_id, Case.status != 'active')
+    )
+    if show_unpaid:
+        query = query.filter(Case.status == 'closed_nieoplacone')
+    return search_service.apply_case_search(query, search_query, account_id)
+
+
+def resolve_sort(sort_by, sort_order, default_sort):
+    """
+    Zamienia parametry sortowania z URL na (sort_key, kolumna, kierunek).
+
+    Args:
+        sort_by: Kolumna sortowania (klucz SORT_COLUMN_MAP_ACTIVE)
+        sort_order: "asc" lub "desc"
+        default_sort: (sort_key, kolumna, kierunek) gdy sort_by nieznany
+
+    Returns:
+        tuple: (sort_key, kolumna, kierunek)
+    """
+    if sort_by in SORT_COLUMN_MAP_ACTIVE:
+        return sort_by, SORT_COLUMN_MAP_ACTIVE[sort_by], sort_order
+    return default_sort
+
+
+def order_cases(query, column, order):
+    """ORDER BY kolumna + Case.id jako rozstrzygniecie remisow."""
+    if order == 'desc':
+        return query.order_by(column.desc().nullslast(), Case.id.desc())
+    return query.order_by(column.asc().nullsfirst(), Case.id.asc())
+
+
+def _paginate_cases(query, sort_by, sort_order, default_sort, page, per_page, cursor, count=None):
+    """
+    Sortuje i paginuje zapytanie listy spraw (projekcja *_LIST_COLUMNS).
+
+    Tryby:
+    - offset (cursor=None): ORDER BY + .paginate() (OFFSET; COUNT gdy brak count)
+    - keyset (cursor podany, "" = pierwsza strona): bez OFFSET i bez COUNT
+
+    Args:
+        query: Zapytanie listy z filtrami
+        sort_by: Kolumna sortowania (klucz SORT_COLUMN_MAP_ACTIVE)
+        sort_order: "asc" lub "desc"
+        default_sort: (sort_key, kolumna, kierunek) gdy sort_by nieznany
+        page: Numer strony (tryb offset)
+        per_page: Ilosc na strone
+        cursor: Kursor z URL (tryb keyset)
+        count: Funkcja zwracajaca liczbe wierszy (np. z cache) zamiast COUNT w .paginate()
+
+    Returns:
+        dict: {'mode', 'items', 'total', 'pages', 'next_cursor', 'prev_cursor'}
+    """
+    sort_key, column, order = resolve_sort(sort_by, sort_order, default_sort)
+
+    if cursor is not None:
+        result = keyset_pagination.paginate_keyset(
+            query, column, Case.id, sort_key, order, cursor, per_page,
+            row_key=lambda row: (getattr(row, column.key), row.id)
+        )
+        return {
+            'mode': 'keyset',
+            'items': result['items'],
+            'total': None,
+            'pages': None,
+            'next_cursor': result['next_cursor'],
+            'prev_cursor': result['prev_cursor']
+        }
+
+    query = order_cases(query, column, order)
+
+    if count is None:
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        total, pages = pagination.total, pagination.pages
+    else:
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+        total = count()
+        pages = (total + per_page - 1) // per_page if per_page > 0 else 1
+    return {
+        'mode': 'offset',
+        'items': pagination.items,
+        'total': total,
+        'pages': pages,
+        'next_cursor': None,
+        'prev_cursor': None
+    }
+
+
 # =============================================================================
 # GLOWNE FUNKCJE SERWISU
 # =============================================================================
 
+@replica_reads
 def get_active_cases_for_account(account_id, search_query="", sort_by="case_number",
-                                  sort_order="asc", page=1, per_page=100):
+                                  sort_order="asc", page=1, per_page=100, cursor=None):
     """
     Pobiera liste aktywnych spraw dla konta.
 
     SQL Performance Optimization:
-    - Stats (total_debt, active_count) - osobne zapytanie agregujace dla WSZYSTKICH aktywnych
-    - Search - SQL ILIKE na wielu kolumnach
-    - Sort - SQL ORDER BY (wyjatek: progress_percent w pamieci)
-    - Pagination - SQL .paginate()
-    - NotificationLogs - pobierane TYLKO dla wyswietlanej strony
+    - Stats (total_debt, active_count) - osobne zapytanie agregujace dla WSZYSTKICH aktywnych,
+      zapamietywane w cache per konto (uniewaznianie po sync / oplaceniu / przywroceniu / wysylce)
+    - Search - search_service (indeksy pg_trgm, fallback ILIKE)
+    - Sort - SQL ORDER BY (progress_percent po Case.max_stage)
+    - Pagination - SQL .paginate() lub keyset (cursor)
+    - Total w trybie keyset - z zapytania stats (bez COUNT na kazdej stronie)
 
     Args:
         account_id: ID konta
         search_query: Zapytanie wyszukiwania (juz w lowercase)
         sort_by: Kolumna sortowania
         sort_order: "asc" lub "desc"
-        page: Numer strony
+        page: Numer strony (tryb offset)
         per_page: Ilosc na strone
+        cursor: Kursor keyset (None = tryb offset, "" = pierwsza strona keyset)
 
     Returns:
         dict: Dane gotowe do render_template
     """
     # =========================================================================
-    # KROK 1: Stats dla WSZYSTKICH aktywnych spraw (bez filtra search)
+    # KROK 1: Stats dla WSZYSTKICH aktywnych spraw (bez filtra search, cache)
     # =========================================================================
-    stats_query = (
-        db.session.query(
-            func.count(Case.id).label('total_count'),
-            func.coalesce(func.sum(Invoice.left_to_pay), 0).label('total_debt')
-        )
-        .join(Invoice, Case.id == Invoice.case_id)
-        .filter(Case.account_id == account_id, Case.status == 'active')
-    )
-    stats = stats_query.first()
-    all_active_count = stats.total_count or 0
-    total_debt_cents = stats.total_debt or 0
+    version = data_version.get_request_data_version(account_id)
+    stats = cache.get_or_compute(account_id, f"active_stats:{version}", lambda: _active_stats(account_id))
+    all_active_count = stats['count']
+    total_debt_cents = stats['total_debt']
 
     log.info(f"[case_service] Stats: {all_active_count} aktywnych, {total_debt_cents} gr dlugu")
 
     # =========================================================================
-    # KROK 2: Bazowe zapytanie z JOIN
-    # =========================================================================
-    query = (
-        db.session.query(Case, Invoice)
-        .join(Invoice, Case.id == Invoice.case_id)
-        .filter(Case.account_id == account_id, Case.status == 'active')
-    )
-
-    # =========================================================================
-    # KROK 3: Filtr wyszukiwania (SQL ILIKE)
+    # KROK 2: Bazowe zapytanie z JOIN + filtr wyszukiwania (indeksy trigramowe / ILIKE)
     # =========================================================================
-    if search_query:
-        search_pattern = f"%{search_query}%"
-        query = query.filter(
-            or_(
-                Case.case_number.ilike(search_pattern),
-                Case.client_company_name.ilike(search_pattern),
-                Case.client_id.ilike(search_pattern),
-                Invoice.client_nip.ilike(search_pattern),
-                Invoice.client_email.ilike(search_pattern),
-            )
-        )
+    query = build_active_cases_query(account_id, search_query).with_entities(*ACTIVE_LIST_COLUMNS)
 
     # =========================================================================
-    # KROK 4: Sortowanie (SQL ORDER BY)
+    # KROK 3: Sortowanie + paginacja (offset lub keyset)
     # =========================================================================
-    sort_in_memory = (sort_by == 'progress_percent')
+    def count_filtered():
+        # Bez wyszukiwania total = liczba aktywnych ze stats (KROK 1)
+        if not search_query:
+            return all_active_count
+        return _cached_count(account_id, query, 'active', search_query)
+
+    paged = _paginate_cases(
+        query, sort_by, sort_order,
+        default_sort=DEFAULT_SORT_ACTIVE,
+        page=page, per_page=per_page, cursor=cursor, count=count_filtered
+    )
+    page_results = paged['items']
 
-    if not sort_in_memory and sort_by in SORT_COLUMN_MAP_ACTIVE:
-        column = SORT_COLUMN_MAP_ACTIVE[sort_by]
-        if sort_order == 'desc':
-            query = query.order_by(column.desc().nullslast())
-        else:
-            query = query.order_by(column.asc().nullsfirst())
+    if paged['mode'] == 'keyset':
+        filtered_count = count_filtered()
+        total_pages = (filtered_count + per_page - 1) // per_page if per_page > 0 else 1
     else:
-        # Default sort (takze dla progress_percent przed pobraniem)
-        query = query.order_by(Case.case_number.asc())
+        filtered_count = paged['total']
+        total_pages = paged['pages']
 
     # =========================================================================
-    # KROK 5: Paginacja
+    # KROK 4: Buduj case_items tylko dla strony (postep z Case.max_stage)
     # =========================================================================
-    if sort_in_memory:
-        # progress_percent wymaga pobrania wszystkich i sortowania w pamieci
-        all_results = query.all()
-        filtered_count = len(all_results)
-        total_pages = (filtered_count + per_page - 1) // per_page if per_page > 0 else 1
-
-        # Pobierz logi dla WSZYSTKICH przefiltrowanych
-        all_invoice_numbers = [inv.invoice_number for _, inv in all_results if inv]
-        all_logs = []
-        if all_invoice_numbers:
-            all_logs = NotificationLog.query.filter(
-                NotificationLog.invoice_number.in_(all_invoice_numbers),
-                NotificationLog.account_id == account_id
-            ).all()
-        logs_by_invoice = _group_logs_by_invoice(all_logs)
-
-        # Buduj WSZYSTKIE case_items
-        all_cases = []
-        for case_obj, inv in all_results:
-            if not inv:
-                continue
-            logs_for_invoice = logs_by_invoice.get(inv.invoice_number, [])
-            case_item = _build_active_case_item(case_obj, inv, logs_for_invoice)
-            all_cases.append(case_item)
-
-        # Sortuj w pamieci po progress_percent
-        all_cases.sort(
-            key=lambda x: x.get('progress_percent', 0),
-            reverse=(sort_order == 'desc')
-        )
-
-        # Paginuj w pamieci
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        cases_list = all_cases[start_idx:end_idx]
+    cases_list = []
+    for row in page_results:
+        cases_list.append(_build_active_case_item(row))
 
-        log.info(f"[case_service] Sort in-memory (progress): {filtered_count} spraw")
-
-    else:
-        # Standardowa sciezka - SQL pagination
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        page_results = pagination.items
-        filtered_count = pagination.total
-        total_pages = pagination.pages
-
-        # =====================================================================
-        # KROK 6: Pobierz NotificationLogs TYLKO dla wyswietlanej strony
-        # =====================================================================
-        invoice_numbers = [inv.invoice_number for _, inv in page_results if inv]
-        logs_for_page = []
-        if invoice_numbers:
-            logs_for_page = NotificationLog.query.filter(
-                NotificationLog.invoice_number.in_(invoice_numbers),
-                NotificationLog.account_id == account_id
-            ).all()
-        logs_by_invoice = _group_logs_by_invoice(logs_for_page)
-
-        # =====================================================================
-        # KROK 7: Buduj case_items tylko dla strony
-        # =====================================================================
-        cases_list = []
-        for case_obj, inv in page_results:
-            if not inv:
-                continue
-            logs_for_invoice = logs_by_invoice.get(inv.invoice_number, [])
-            case_item = _build_active_case_item(case_obj, inv, logs_for_invoice)
-            cases_list.append(case_item)
-
-        log.info(f"[case_service] SQL pagination: strona {page}/{total_pages}, {len(cases_list)} spraw")
+    log.info(f"[case_service] Pagination ({paged['mode']}): strona {page}/{total_pages}, {len(cases_list)} spraw")
 
     return {
         'cases': cases_list,
@@ -403,20 +483,24 @@ def get_active_cases_for_account(account_id, search_query="", sort_by="case_numb
         'page': page,
         'per_page': per_page,
         'total_pages': total_pages,
-        'total_count': filtered_count  # Filtered count (dla paginacji)
+        'total_count': filtered_count,  # Filtered count (dla paginacji)
+        'pagination_mode': paged['mode'],
+        'next_cursor': paged['next_cursor'],
+        'prev_cursor': paged['prev_cursor']
     }
 
 
+@replica_reads
 def get_completed_cases_for_account(account_id, search_query="", sort_by="case_number",
-                                     sort_order="asc", page=1, per_page=100, show_unpaid=False):
+                                     sort_order="asc", page=1, per_page=100, show_unpaid=False,
+                                     cursor=None):
     """
     Pobiera liste zakonczonych spraw dla konta.
 
     SQL Performance Optimization:
-    - Search - SQL ILIKE na wielu kolumnach
-    - Sort - SQL ORDER BY (wyjatek: progress_percent w pamieci)
-    - Pagination - SQL .paginate()
-    - NotificationLogs - pobierane TYLKO dla wyswietlanej strony
+    - Search - search_service (indeksy pg_trgm, fallback ILIKE)
+    - Sort - SQL ORDER BY (progress_percent po Case.max_stage)
+    - Pagination - SQL .paginate() lub keyset (cursor)
     - stage_counts - obliczane dla calej strony (kompromis wydajnosciowy)
 
     Args:
@@ -424,144 +508,54 @@ def get_completed_cases_for_account(account_id, search_query="", sort_by="case_n
         search_query: Zapytanie wyszukiwania (juz w lowercase)
         sort_by: Kolumna sortowania
         sort_order: "asc" lub "desc"
-        page: Numer strony
+        page: Numer strony (tryb offset)
         per_page: Ilosc na strone
         show_unpaid: Czy pokazywac tylko nieoplacone
+        cursor: Kursor keyset (None = tryb offset, "" = pierwsza strona keyset)
 
     Returns:
         dict: Dane gotowe do render_template
     """
     # =========================================================================
-    # KROK 1: Bazowe zapytanie z JOIN
+    # KROK 1: Bazowe zapytanie z JOIN + filtry (show_unpaid, wyszukiwanie)
     # =========================================================================
-    query = (
-        db.session.query(Case, Invoice)
-        .join(Invoice, Case.id == Invoice.case_id)
-        .filter(Case.account_id == account_id, Case.status != 'active')
+    query = build_completed_cases_query(account_id, search_query, show_unpaid).with_entities(
+        *COMPLETED_LIST_COLUMNS
     )
-
-    # Filtr show_unpaid
-    if show_unpaid:
-        query = query.filter(Case.status == 'closed_nieoplacone')
-
-    # =========================================================================
-    # KROK 2: Filtr wyszukiwania (SQL ILIKE)
-    # =========================================================================
-    if search_query:
-        search_pattern = f"%{search_query}%"
-        query = query.filter(
-            or_(
-                Case.case_number.ilike(search_pattern),
-                Case.client_company_name.ilike(search_pattern),
-                Case.client_id.ilike(search_pattern),
-                Invoice.client_nip.ilike(search_pattern),
-                Invoice.client_email.ilike(search_pattern),
-            )
-        )
+    scope = 'completed_unpaid' if show_unpaid else 'completed'
 
     # =========================================================================
-    # KROK 3: Sortowanie (SQL ORDER BY)
+    # KROK 2: Sortowanie + paginacja (offset lub keyset)
     # =========================================================================
-    sort_in_memory = (sort_by == 'progress_percent')
+    paged = _paginate_cases(
+        query, sort_by, sort_order,
+        default_sort=DEFAULT_SORT_COMPLETED,
+        page=page, per_page=per_page, cursor=cursor,
+        count=lambda: _cached_count(account_id, query, scope, search_query)
+    )
+    page_results = paged['items']
 
-    if not sort_in_memory and sort_by in SORT_COLUMN_MAP_ACTIVE:
-        column = SORT_COLUMN_MAP_ACTIVE[sort_by]
-        if sort_order == 'desc':
-            query = query.order_by(column.desc().nullslast())
-        else:
-            query = query.order_by(column.asc().nullsfirst())
+    if paged['mode'] == 'keyset':
+        filtered_count = _cached_count(account_id, query, scope, search_query)
+        total_pages = (filtered_count + per_page - 1) // per_page if per_page > 0 else 1
     else:
-        # Default sort - po dacie aktualizacji (najnowsze najpierw)
-        query = query.order_by(Case.updated_at.desc())
+        filtered_count = paged['total']
+        total_pages = paged['pages']
 
     # =========================================================================
-    # KROK 4: Paginacja
+    # KROK 3: Buduj case_items i zliczaj etapy (tylko dla strony)
     # =========================================================================
-    if sort_in_memory:
-        # progress_percent wymaga pobrania wszystkich i sortowania w pamieci
-        all_results = query.all()
-        filtered_count = len(all_results)
-        total_pages = (filtered_count + per_page - 1) // per_page if per_page > 0 else 1
+    cases_list = []
+    stage_counts = {i: 0 for i in range(1, 6)}
 
-        # Pobierz logi dla WSZYSTKICH przefiltrowanych
-        all_invoice_numbers = [inv.invoice_number for _, inv in all_results if inv]
-        all_logs = []
-        if all_invoice_numbers:
-            all_logs = NotificationLog.query.filter(
-                NotificationLog.invoice_number.in_(all_invoice_numbers),
-                NotificationLog.account_id == account_id
-            ).all()
-        logs_by_invoice = _group_logs_by_invoice(all_logs)
-
-        # Buduj WSZYSTKIE case_items i zliczaj etapy
-        all_cases = []
-        stage_counts = {i: 0 for i in range(1, 6)}
-
-        for case_obj, inv in all_results:
-            if not inv:
-                continue
-            logs_for_invoice = logs_by_invoice.get(inv.invoice_number, [])
-            case_item = _build_completed_case_item(case_obj, inv, logs_for_invoice)
-            all_cases.append(case_item)
-
-            # Zliczanie etapow
-            max_stage = _calculate_max_stage(logs_for_invoice)
-            stage_num = max(1, min(int(max_stage), 5))
-            if stage_num > 0:
-                stage_counts[stage_num] += 1
-
-        # Sortuj w pamieci po progress_percent
-        all_cases.sort(
-            key=lambda x: x.get('progress_percent', 0),
-            reverse=(sort_order == 'desc')
-        )
-
-        # Paginuj w pamieci
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        cases_list = all_cases[start_idx:end_idx]
+    for row in page_results:
+        cases_list.append(_build_completed_case_item(row))
 
-        log.info(f"[case_service] Completed sort in-memory (progress): {filtered_count} spraw")
+        # Zliczanie etapow (dla tej strony)
+        stage_num = max(1, min(int(row.max_stage or 0), 5))
+        stage_counts[stage_num] += 1
 
-    else:
-        # Standardowa sciezka - SQL pagination
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        page_results = pagination.items
-        filtered_count = pagination.total
-        total_pages = pagination.pages
-
-        # =====================================================================
-        # KROK 5: Pobierz NotificationLogs TYLKO dla wyswietlanej strony
-        # =====================================================================
-        invoice_numbers = [inv.invoice_number for _, inv in page_results if inv]
-        logs_for_page = []
-        if invoice_numbers:
-            logs_for_page = NotificationLog.query.filter(
-                NotificationLog.invoice_number.in_(invoice_numbers),
-                NotificationLog.account_id == account_id
-            ).all()
-        logs_by_invoice = _group_logs_by_invoice(logs_for_page)
-
-        # =====================================================================
-        # KROK 6: Buduj case_items i zliczaj etapy (tylko dla strony)
-        # =====================================================================
-        cases_list = []
-        stage_counts = {i: 0 for i in range(1, 6)}
-
-        for case_obj, inv in page_results:
-            if not inv:
-                continue
-            logs_for_invoice = logs_by_invoice.get(inv.invoice_number, [])
-            case_item = _build_completed_case_item(case_obj, inv, logs_for_invoice)
-            cases_list.append(case_item)
-
-            # Zliczanie etapow (dla tej strony)
-            max_stage = _calculate_max_stage(logs_for_invoice)
-            stage_num = max(1, min(int(max_stage), 5))
-            if stage_num > 0:
-                stage_counts[stage_num] += 1
-
-        log.info(f"[case_service] Completed SQL pagination: strona {page}/{total_pages}, {len(cases_list)} spraw")
+    log.info(f"[case_service] Completed pagination ({paged['mode']}): strona {page}/{total_pages}, {len(cases_list)} spraw")
 
     return {
         'cases': cases_list,
@@ -574,7 +568,10 @@ def get_completed_cases_for_account(account_id, search_query="", sort_by="case_n
         'per_page': per_page,
         'total_pages': total_pages,
         'total_count': filtered_count,
-        'show_unpaid_filter': show_unpaid
+        'show_unpaid_filter': show_unpaid,
+        'pagination_mode': paged['mode'],
+        'next_cursor': paged['next_cursor'],
+        'prev_cursor': paged['prev_cursor']
     }
 
 
@@ -615,7 +612,16 @@ def get_case_detail(account_id, case_number):
     if inv.payment_due_date:
         day_diff = (date.today() - inv.payment_due_date).days
 
-    logs = NotificationLog.query.filter_by(
+    # Bez tresci - pobierana na zadanie przez get_notification_body()
+    logs = NotificationLog.query.options(
+        load_only(
+            NotificationLog.id,
+            NotificationLog.sent_at,
+            NotificationLog.stage,
+            NotificationLog.mode,
+            NotificationLog.subject
+        )
+    ).filter_by(
         invoice_number=inv.invoice_number,
         account_id=account_id
     ).order_by(NotificationLog.sent_at.desc()).all()
@@ -629,8 +635,7 @@ def get_case_detail(account_id, case_number):
             "id": lg.id,
             "sent_at": lg.sent_at,
             "stage": f"{lg.stage} ({lg.mode})",
-            "subject": lg.subject,
-            "body": lg.body
+            "subject": lg.subject
         })
 
     progress_val = _calculate_progress_percent(max_stage_num)
@@ -645,6 +650,29 @@ def get_case_detail(account_id, case_number):
     }
 
 
+def get_notification_body(account_id, log_id):
+    """
+    Pobiera tresc pojedynczego powiadomienia (rozwiniecie podgladu w widoku sprawy).
+
+    Args:
+        account_id: ID konta
+        log_id: ID NotificationLog
+
+    Returns:
+        dict lub None: {'id', 'subject', 'body'} lub None jesli nie znaleziono
+    """
+    lg = NotificationLog.query.filter_by(id=log_id, account_id=account_id).first()
+    if not lg:
+        return None
+
+    return {
+        'id': lg.id,
+        'subject': lg.subject,
+        'body': lg.body
+    }
+
+
+@replica_reads
 def get_client_cases(account_id, client_id):
     """
     Pobiera sprawy dla konkretnego klienta.
@@ -658,34 +686,44 @@ def get_client_cases(account_id, client_id):
     """
     current_date = date.today()
 
-    # Pobierz najnowsza fakture dla danych klienta
-    latest_invoice = (
-        Invoice.query
-        .join(Case, Invoice.case_id == Case.id)
-        .filter(Case.account_id == account_id)
-        .filter(Case.client_id == client_id)
-        .order_by(Invoice.invoice_date.desc())
-        .first()
-    )
+    # Dane klienta z kartoteki (Client) - bez szukania najnowszej faktury
+    ledger = Client.query.filter_by(account_id=account_id, client_id=client_id).first()
 
     client_details = {}
-    if latest_invoice:
+    if ledger:
         client_details = {
-            'client_company_name': latest_invoice.client_company_name,
-            'client_nip': latest_invoice.client_nip,
-            'client_email': latest_invoice.client_email,
-            'client_address': latest_invoice.client_address
+            'client_company_name': ledger.company_name,
+            'client_nip': ledger.nip,
+            'client_email': ledger.email,
+            'client_address': ledger.address
         }
     else:
-        first_case = Case.query.filter_by(
-            client_id=client_id,
-            account_id=account_id
-        ).first()
-        if first_case:
+        # Fallback - kartoteka jeszcze nieprzebudowana (flask rebuild-client-ledger)
+        latest_invoice = (
+            Invoice.query
+            .join(Case, Invoice.case_id == Case.id)
+            .filter(Case.account_id == account_id)
+            .filter(Case.client_id == client_id)
+            .order_by(Invoice.invoice_date.desc())
+            .first()
+        )
+        if latest_invoice:
             client_details = {
-                'client_company_name': first_case.client_company_name,
-                'client_nip': first_case.client_nip
+                'client_company_name': latest_invoice.client_company_name,
+                'client_nip': latest_invoice.client_nip,
+                'client_email': latest_invoice.client_email,
+                'client_address': latest_invoice.client_address
             }
+        else:
+            first_case = Case.query.filter_by(
+                client_id=client_id,
+                account_id=account_id
+            ).first()
+            if first_case:
+                client_details = {
+                    'client_company_name': first_case.client_company_name,
+                    'client_nip': first_case.client_nip
+                }
 
     # Pobierz wszystkie sprawy klienta
     all_cases_for_client = (
@@ -702,7 +740,7 @@ def get_client_cases(account_id, client_id):
     total_debt_all_cents = 0
 
     for case_obj, inv in all_cases_for_client:
-        case_item = _build_client_case_item(case_obj, inv, account_id)
+        case_item = _build_client_case_item(case_obj, inv)
         if case_item:
             if case_obj.status == 'active':
                 total_debt_all_cents += int(case_item['total_debt'] * 100)
@@ -710,8 +748,13 @@ def get_client_cases(account_id, client_id):
             else:
                 completed_cases_list.append(case_item)
 
-    active_count = len(active_cases_list)
-    total_debt_all = grosz_to_pln(total_debt_all_cents)
+    if ledger:
+        # Agregaty utrzymywane przy zapisie (Client.refresh)
+        active_count = ledger.active_count
+        total_debt_all = grosz_to_pln(ledger.open_debt)
+    else:
+        active_count = len(active_cases_list)
+        total_debt_all = grosz_to_pln(total_debt_all_cents)
 
     active_cases_list.sort(key=lambda x: x['case_number'], reverse=True)
     completed_cases_list.sort(key=lambda x: x['case_number'], reverse=True)
@@ -0,0 +1,190 @@
+"""
+Serwis kartoteki klientow.
+Lista klientow, najwieksi dluznicy i przebudowa agregatow (Client).
+
+Agregaty klienta sa utrzymywane przy zapisie (models.Client.refresh) -
+listy sortuja i paginuja gotowe kolumny tabeli client, bez GROUP BY na
+sprawach przy kazdym odczycie.
+"""
+import logging
+from datetime import date
+
+from sqlalchemy import or_
+
+from ..db_routing import replica_reads
+from ..extensions import db
+from ..models import Case, Client
+from .finance_service import grosz_to_pln
+from .search_service import escape_like
+
+log = logging.getLogger(__name__)
+
+# Mapowanie nazw kolumn UI na kolumny Client
+SORT_COLUMN_MAP_CLIENTS = {
+    'client_id': Client.client_id,
+    'company_name': Client.company_name,
+    'nip': Client.nip,
+    'open_debt': Client.open_debt,
+    'active_count': Client.active_count,
+    'closed_count': Client.closed_count,
+    'oldest_due_date': Client.oldest_due_date,
+    'max_stage': Client.max_stage,
+}
+
+TOP_DEBTORS_LIMIT = 50
+
+
+def _build_client_item(client, today):
+    """
+    Buduje slownik reprezentujacy klienta do wyswietlenia.
+
+    Args:
+        client: Obiekt Client
+        today: Data biezaca (dni po terminie)
+
+    Returns:
+        dict: Dane klienta gotowe do szablonu
+    """
+    days_overdue = None
+    if client.oldest_due_date:
+        days_overdue = (today - client.oldest_due_date).days
+
+    return {
+        'client_id': client.client_id,
+        'company_name': client.company_name,
+        'nip': client.nip,
+        'email': client.email or "Brak",
+        'open_debt': grosz_to_pln(client.open_debt),
+        'active_count': client.active_count,
+        'closed_count': client.closed_count,
+        'days_overdue': days_overdue,
+        'progress_percent': int((client.max_stage or 0) / 5 * 100),
+    }
+
+
+@replica_reads
+def get_client_list(account_id, search_query="", sort_by="open_debt", sort_order="desc",
+                    page=1, per_page=100, debtors_only=False):
+    """
+    Pobiera liste klientow konta.
+
+    Args:
+        account_id: ID konta
+        search_query: Fraza wyszukiwania (ID klienta, nazwa, NIP, email - juz w lowercase)
+        sort_by: Kolumna sortowania (klucz SORT_COLUMN_MAP_CLIENTS)
+        sort_order: "asc" lub "desc"
+        page: Numer strony
+        per_page: Ilosc na strone
+        debtors_only: Tylko klienci z otwartym dlugiem
+
+    Returns:
+        dict: Dane gotowe do render_template
+    """
+    query = Client.query.filter(Client.account_id == account_id)
+
+    if debtors_only:
+        query = query.filter(Client.open_debt > 0)
+
+    if search_query:
+        pattern = f"%{escape_like(search_query)}%"
+        query = query.filter(or_(
+            Client.client_id.ilike(pattern, escape='\\'),
+            Client.company_name.ilike(pattern, escape='\\'),
+            Client.nip.ilike(pattern, escape='\\'),
+            Client.email.ilike(pattern, escape='\\'),
+        ))
+
+    if sort_by not in SORT_COLUMN_MAP_CLIENTS:
+        sort_by = 'open_debt'
+    column = SORT_COLUMN_MAP_CLIENTS[sort_by]
+    if sort_order == 'asc':
+        query = query.order_by(column.asc().nullsfirst(), Client.id.asc())
+    else:
+        query = query.order_by(column.desc().nullslast(), Client.id.desc())
+
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    today = date.today()
+
+    return {
+        'clients': [_build_client_item(client, today) for client in pagination.items],
+        'search_query': search_query,
+        'sort_by': sort_by,
+        'sort_order': sort_order,
+        'debtors_only': debtors_only,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': pagination.pages,
+        'total_count': pagination.total,
+        'top_mode': False
+    }
+
+
+@replica_reads
+def get_top_debtors(account_id, limit=TOP_DEBTORS_LIMIT):
+    """
+    Pobiera klientow z najwiekszym otwartym dlugiem (indeks account_id, open_debt).
+
+    Args:
+        account_id: ID konta
+        limit: Liczba klientow
+
+    Returns:
+        dict: Dane gotowe do render_template
+    """
+    clients = (
+        Client.query
+        .filter(Client.account_id == account_id, Client.open_debt > 0)
+        .order_by(Client.open_debt.desc(), Client.id.desc())
+        .limit(limit)
+        .all()
+    )
+    today = date.today()
+
+    return {
+        'clients': [_build_client_item(client, today) for client in clients],
+        'search_query': "",
+        'sort_by': 'open_debt',
+        'sort_order': 'desc',
+        'debtors_only': True,
+        'page': 1,
+        'per_page': limit,
+        'total_pages': 1,
+        'total_count': len(clients),
+        'top_mode': True
+    }
+
+
+@replica_reads
+def get_client(account_id, client_id):
+    """
+    Pobiera wiersz kartoteki klienta.
+
+    Returns:
+        Client lub None
+    """
+    return Client.query.filter_by(account_id=account_id, client_id=client_id).first()
+
+
+def rebuild_client_ledger(account_id):
+    """
+    Przelicza kartoteke klientow konta od zera (naprawa / pierwsze wypelnienie).
+
+    Args:
+        account_id: ID konta
+
+    Returns:
+        int: Liczba przeliczonych klientow
+    """
+    case_client_ids = {row[0] for row in db.session.query(Case.client_id).filter(
+        Case.account_id == account_id
+    ).distinct()}
+    ledger_client_ids = {row[0] for row in db.session.query(Client.client_id).filter(
+        Client.account_id == account_id
+    )}
+
+    # Wiersze klientow bez spraw tez sa przetwarzane (usuniecie)
+    refreshed = Client.refresh(db.session.connection(), account_id, case_client_ids | ledger_client_ids)
+    db.session.commit()
+
+    log.info(f"[client_service] Przebudowano kartoteke konta {account_id}: {refreshed} klientow")
+    return refreshed
@@ -0,0 +1,95 @@
+"""
+Serwis wersji danych konta.
+
+Account.data_version rosnie przy kazdej transakcji zmieniajacej dane konta:
+- automatycznie po flush zapisow Case/Invoice/NotificationLog/SyncStatus/
+  NotificationSettings/AccountScheduleSettings (synchronizacja, oplacenie,
+  przywrocenie, wysylka powiadomien) - models._bump_changed_accounts
+- jawnie (mark_account_changed) dla zapisow z pominieciem unit of work ORM
+  (bulk UPDATE) i zmian samego Account (dane firmowe w ustawieniach)
+
+Wersja sluzy do ETag/Last-Modified (odpowiedzi 304) i jako klucz cache.
+Wpisy cache stron konta (liczniki, statystyki, raporty, wiersze list) sa
+kluczowane wersja odczytana raz na zadanie (get_request_data_version) - ta sama,
+ktora @conditional_on_data_version wpisuje do ETag. Wersja jest w bazie,
+wiec zapis z innej instancji (Cloud Tasks) uniewaznia cache kazdego procesu.
+"""
+import logging
+
+from flask import g, has_request_context
+
+from ..db_routing import read_replica
+from ..extensions import db
+from ..models import Account, bump_account_data_version
+
+log = logging.getLogger(__name__)
+
+
+def mark_account_changed(account_id):
+    """
+    Zwieksza wersje danych konta w biezacej transakcji db.session.
+
+    Args:
+        account_id: ID konta
+    """
+    bump_account_data_version(db.session, account_id)
+
+
+def get_data_version(account_id):
+    """
+    Pobiera aktualna wersje danych konta (projekcja 2 kolumn po PK).
+
+    Args:
+        account_id: ID konta
+
+    Returns:
+        tuple: (data_version: int, data_changed_at: datetime lub None)
+               lub (None, None) gdy konto nie istnieje
+    """
+    row = db.session.query(
+        Account.data_version,
+        Account.data_changed_at
+    ).filter(Account.id == account_id).first()
+    if not row:
+        return None, None
+    return int(row.data_version or 0), row.data_changed_at
+
+
+def set_request_data_version(account_id, version):
+    """
+    Zapamietuje wersje danych konta odczytana w biezacym zadaniu
+    (@conditional_on_data_version) - kolejne get_request_data_version nie
+    odczytuja jej ponownie.
+
+    Args:
+        account_id: ID konta
+        version: Odczytana wersja danych
+    """
+    g._account_data_version = (account_id, version)
+
+
+def get_request_data_version(account_id):
+    """
+    Wersja danych konta dla biezacego zadania (klucz cache stron konta).
+
+    W zadaniu HTTP wersja jest odczytywana raz (lub ustawiona przez
+    @conditional_on_data_version przed widokiem) i zapamietywana w g - ETag
+    i wszystkie wpisy cache strony uzywaja tej samej wersji. Poza zadaniem
+    (CLI, zadania w tle) odczyt przy kazdym wywolaniu.
+
+    Args:
+        account_id: ID konta
+
+    Returns:
+        int lub None: Wersja danych (None gdy konto nie istnieje)
+    """
+    memo = g.get('_account_data_version') if has_request_context() else None
+    if memo is not None and memo[0] == account_id:
+        return memo[1]
+
+    # Z tego samego zrodla co listy spraw (replika / baza glowna po wlasnym zapisie)
+    with read_replica():
+        version, _ = get_data_version(account_id)
+    if has_request_context():
+        set_request_data_version(account_id, version)
+    return version
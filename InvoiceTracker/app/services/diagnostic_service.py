@@ -8,6 +8,7 @@ from datetime import date, datetime
 
 from ..extensions import db
 from ..models import Account, Invoice, Case, NotificationLog, NotificationSettings, AccountScheduleSettings
+from .batch_scan import stream_scan
 from .mail_utils import generate_email
 from .send_email import send_email_for_account
 
@@ -247,47 +248,39 @@ def run_mail_diagnostic(account_id, simulate_break=False, send_real_emails=False
 
     # Pobierz faktury (dokladnie tak samo jak scheduler)
     today = date.today()
-    batch_size = 100
-    offset = 0
 
     total_invoices = 0
     total_emails_would_send = 0
     invoices_with_multiple_stages = []
 
-    while True:
-        active_invoices = (
-            Invoice.query.join(Case, Invoice.case_id == Case.id)
-            .filter(Case.status == "active")
-            .filter(Case.account_id == account.id)
-            .order_by(Invoice.invoice_date.desc())
-            .offset(offset)
-            .limit(batch_size)
-            .all()
+    active_invoices = (
+        Invoice.query.join(Case, Invoice.case_id == Case.id)
+        .filter(Case.status == "active")
+        .filter(Case.account_id == account.id)
+        .order_by(Invoice.invoice_date.desc(), Invoice.id.desc())
+    )
+    # Faktyczna wysylka zapisuje NotificationLog COMMIT-em po kazdym mailu -
+    # kursor serwera nie przetrwa COMMIT, wiec wtedy faktury ladowane sa z gory
+    invoices = active_invoices.all() if send_real_emails else stream_scan(active_invoices)
+
+    for inv in invoices:
+        invoice_data = _process_invoice_for_diagnostic(
+            invoice=inv,
+            account=account,
+            notification_settings=notification_settings,
+            today=today,
+            simulate_break=simulate_break,
+            send_real_emails=send_real_emails
         )
 
-        if not active_invoices:
-            break
-
-        for inv in active_invoices:
-            invoice_data = _process_invoice_for_diagnostic(
-                invoice=inv,
-                account=account,
-                notification_settings=notification_settings,
-                today=today,
-                simulate_break=simulate_break,
-                send_real_emails=send_real_emails
-            )
-
-            if invoice_data:
-                total_invoices += 1
-                total_emails_would_send += invoice_data["total_emails_would_send"]
-                result["invoices_processed"].append(invoice_data)
-
-                # Oznacz faktury z wieloma stages
-                if invoice_data["total_emails_would_send"] > 1:
-                    invoices_with_multiple_stages.append(inv.invoice_number)
-
-        offset += batch_size
+        if invoice_data:
+            total_invoices += 1
+            total_emails_would_send += invoice_data["total_emails_would_send"]
+            result["invoices_processed"].append(invoice_data)
+
+            # Oznacz faktury z wieloma stages
+            if invoice_data["total_emails_would_send"] > 1:
+                invoices_with_multiple_stages.append(inv.invoice_number)
 
     # Podsumowanie
     problem_detected = "NO"
@@ -0,0 +1,248 @@
+"""
+Serwis eksportu danych.
+Eksport spraw aktywnych, zakonczonych i historii powiadomien (CSV / NDJSON).
+
+Eksport jest strumieniowy - generator zwraca kolejne porcje tekstu, a wiersze
+czytane sa kursorem serwerowym (yield_per) z projekcja kolumn, bez budowania
+listy obiektow ORM. Pamiec stala niezaleznie od liczby spraw.
+
+Filtry i sortowanie spraw sa wspolne z listami (case_service.build_*_query,
+resolve_sort) - eksport zawiera dokladnie to, co widac na liscie, bez paginacji.
+"""
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import or_
+
+from ..db_routing import replica_reads
+from ..extensions import db
+from ..models import Invoice, NotificationLog
+from . import case_service
+from .finance_service import grosz_to_pln, calculate_left_to_pay
+from .search_service import escape_like
+
+log = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+# Wiersze pobierane z kursora serwerowego na raz / wiersze w jednej porcji odpowiedzi
+EXPORT_BATCH_SIZE = 500
+
+# Kolumny eksportu (kolejnosc = kolejnosc w CSV)
+ACTIVE_FIELDS = [
+    'case_number', 'client_id', 'client_company_name', 'client_nip', 'client_email',
+    'invoice_number', 'payment_due_date', 'total_debt', 'days_diff', 'progress_percent', 'status',
+]
+COMPLETED_FIELDS = ACTIVE_FIELDS + [
+    'invoice_date', 'total_amount', 'paid_amount', 'paid_date', 'payment_method', 'updated_at',
+]
+NOTIFICATION_FIELDS = [
+    'id', 'sent_at', 'scheduled_date', 'client_id', 'invoice_number', 'email_to', 'subject', 'stage', 'mode',
+]
+
+# Projekcja kolumn spraw (kolumny list + numer faktury, bez obiektow Case / Invoice)
+_CASE_COLUMNS = case_service.COMPLETED_LIST_COLUMNS + (Invoice.invoice_number,)
+
+
+def csv_line(values):
+    """Pojedyncza linia CSV (separator ';' - polski Excel)."""
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=';').writerow(values)
+    return buffer.getvalue()
+
+
+def _csv_value(value):
+    """Wartosc komorki CSV (daty ISO, kwoty z dwoma miejscami po przecinku)."""
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return value
+
+
+def _json_default(value):
+    """Serializacja dat w NDJSON."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Nieobslugiwany typ: {type(value).__name__}")
+
+
+def _iter_export(fields, records, fmt):
+    """
+    Zamienia rekordy (dict) na porcje tekstu w wybranym formacie.
+
+    Porcja to EXPORT_BATCH_SIZE wierszy - mniej zapisow do gniazda niz
+    linia po linii, pamiec ograniczona rozmiarem porcji.
+
+    Args:
+        fields: Lista kolumn (naglowek CSV)
+        records: Iterator slownikow
+        fmt: "csv" lub "ndjson"
+
+    Yields:
+        str: Kolejne porcje eksportu
+    """
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer, delimiter=';')
+        writer.writerow(fields)
+
+        def write(record):
+            writer.writerow([_csv_value(record[name]) for name in fields])
+    else:
+        def write(record):
+            buffer.write(json.dumps(record, ensure_ascii=False, default=_json_default))
+            buffer.write('\n')
+
+    pending = 0
+    for record in records:
+        write(record)
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    tail = buffer.getvalue()
+    if tail:
+        yield tail
+
+
+def _case_record(row, today, completed):
+    """Rekord eksportu sprawy z wiersza projekcji _CASE_COLUMNS."""
+    left = row.left_to_pay
+    if left is None:
+        left = calculate_left_to_pay(row.gross_price, row.paid_price)
+
+    record = {
+        'case_number': row.case_number,
+        'client_id': row.client_id,
+        'client_company_name': row.client_company_name,
+        'client_nip': row.client_nip,
+        'client_email': row.client_email,
+        'invoice_number': row.invoice_number,
+        'payment_due_date': row.payment_due_date,
+        'total_debt': grosz_to_pln(left),
+        'days_diff': (today - row.payment_due_date).days if row.payment_due_date else None,
+        'progress_percent': int((row.max_stage or 0) / 5 * 100),
+        'status': row.status,
+    }
+    if completed:
+        record.update({
+            'invoice_date': row.invoice_date,
+            'total_amount': grosz_to_pln(row.gross_price),
+            'paid_amount': grosz_to_pln(row.paid_price),
+            'paid_date': row.paid_date,
+            'payment_method': row.payment_method,
+            'updated_at': row.updated_at,
+        })
+    return record
+
+
+def _stream_case_rows(query, sort_by, sort_order, default_sort):
+    """Sortuje zapytanie spraw jak lista i czyta je kursorem serwerowym."""
+    _, column, order = case_service.resolve_sort(sort_by, sort_order, default_sort)
+    query = case_service.order_cases(query.with_entities(*_CASE_COLUMNS), column, order)
+    return query.yield_per(EXPORT_BATCH_SIZE)
+
+
+@replica_reads
+def iter_active_cases(account_id, fmt, search_query="", sort_by="case_number", sort_order="asc"):
+    """
+    Generator eksportu aktywnych spraw (filtry i sortowanie jak lista spraw aktywnych).
+
+    Args:
+        account_id: ID konta
+        fmt: "csv" lub "ndjson"
+        search_query: Zapytanie wyszukiwania (juz w lowercase)
+        sort_by: Kolumna sortowania
+        sort_order: "asc" lub "desc"
+
+    Yields:
+        str: Kolejne porcje eksportu
+    """
+    today = date.today()
+    rows = _stream_case_rows(
+        case_service.build_active_cases_query(account_id, search_query),
+        sort_by, sort_order, case_service.DEFAULT_SORT_ACTIVE
+    )
+    yield from _iter_export(ACTIVE_FIELDS, (_case_record(row, today, False) for row in rows), fmt)
+    log.info(f"[export_service] Eksport aktywnych spraw konta {account_id} ({fmt}) zakonczony")
+
+
+@replica_reads
+def iter_completed_cases(account_id, fmt, search_query="", sort_by="case_number", sort_order="asc",
+                         show_unpaid=False):
+    """
+    Generator eksportu zakonczonych spraw (filtry i sortowanie jak lista zakonczonych).
+
+    Args:
+        account_id: ID konta
+        fmt: "csv" lub "ndjson"
+        search_query: Zapytanie wyszukiwania (juz w lowercase)
+        sort_by: Kolumna sortowania
+        sort_order: "asc" lub "desc"
+        show_unpaid: Czy tylko nieoplacone
+
+    Yields:
+        str: Kolejne porcje eksportu
+    """
+    today = date.today()
+    rows = _stream_case_rows(
+        case_service.build_completed_cases_query(account_id, search_query, show_unpaid),
+        sort_by, sort_order, case_service.DEFAULT_SORT_COMPLETED
+    )
+    yield from _iter_export(COMPLETED_FIELDS, (_case_record(row, today, True) for row in rows), fmt)
+    log.info(f"[export_service] Eksport zakonczonych spraw konta {account_id} ({fmt}) zakonczony")
+
+
+@replica_reads
+def iter_notifications(account_id, fmt, search_query="", date_from=None, date_to=None, sort_order="desc"):
+    """
+    Generator eksportu historii powiadomien (NotificationLog, bez tresci wiadomosci).
+
+    Args:
+        account_id: ID konta
+        fmt: "csv" lub "ndjson"
+        search_query: Fraza (numer faktury, ID klienta, email - juz w lowercase)
+        date_from: Data wysylki od (wlacznie) lub None
+        date_to: Data wysylki do (wlacznie) lub None
+        sort_order: "asc" lub "desc" (po sent_at)
+
+    Yields:
+        str: Kolejne porcje eksportu
+    """
+    query = db.session.query(*(getattr(NotificationLog, name) for name in NOTIFICATION_FIELDS)).filter(
+        NotificationLog.account_id == account_id
+    )
+
+    if search_query:
+        pattern = f"%{escape_like(search_query)}%"
+        query = query.filter(or_(
+            NotificationLog.invoice_number.ilike(pattern, escape='\\'),
+            NotificationLog.client_id.ilike(pattern, escape='\\'),
+            NotificationLog.email_to.ilike(pattern, escape='\\'),
+        ))
+    if date_from:
+        query = query.filter(NotificationLog.sent_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(NotificationLog.sent_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    if sort_order == 'asc':
+        query = query.order_by(NotificationLog.sent_at.asc(), NotificationLog.id.asc())
+    else:
+        query = query.order_by(NotificationLog.sent_at.desc(), NotificationLog.id.desc())
+
+    rows = query.yield_per(EXPORT_BATCH_SIZE)
+    yield from _iter_export(NOTIFICATION_FIELDS, (row._asdict() for row in rows), fmt)
+    log.info(f"[export_service] Eksport powiadomien konta {account_id} ({fmt}) zakonczony")
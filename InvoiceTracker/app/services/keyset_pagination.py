@@ -0,0 +1,193 @@
+"""
+Paginacja kursorowa (keyset) dla list spraw.
+
+Zamiast OFFSET + COUNT(*) kolejna strona jest wyznaczana warunkiem
+"(kolumna, Case.id) za ostatnim wierszem poprzedniej strony" - koszt
+pobrania strony nie rosnie wraz z jej numerem.
+
+Porzadek bazowy: (kolumna NULLS FIRST, id) rosnaco. Sortowanie malejace to
+ten sam porzadek czytany od konca (NULLS LAST), a strona "poprzednia" to
+odczyt w przeciwnym kierunku z odwroceniem wyniku.
+
+Kursor (base64url JSON) zawiera kolumne i kierunek sortowania - kursor
+z innego sortowania lub z wartoscia innego typu niz kolumna sortowania jest
+ignorowany (start od pierwszej strony).
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+
+def _encode_value(value):
+    """Serializuje wartosc klucza sortowania do JSON."""
+    if isinstance(value, datetime):
+        return {'t': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    """Odtwarza wartosc klucza sortowania z JSON."""
+    if isinstance(value, dict):
+        if 't' in value:
+            return datetime.fromisoformat(value['t'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(sort_by, sort_order, value, row_id, direction):
+    """
+    Koduje kursor do uzycia w URL.
+
+    Args:
+        sort_by: Nazwa kolumny sortowania (klucz z mapy sortowania)
+        sort_order: "asc" lub "desc"
+        value: Wartosc kolumny sortowania granicznego wiersza
+        row_id: Case.id granicznego wiersza
+        direction: "next" (za wierszem) lub "prev" (przed wierszem)
+
+    Returns:
+        str: Kursor base64url
+    """
+    payload = {
+        's': sort_by,
+        'o': sort_order,
+        'v': _encode_value(value),
+        'i': row_id,
+        'd': direction,
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _matches_column(value, column):
+    """Czy wartosc z kursora ma typ kolumny sortowania (None = NULL pasuje zawsze)."""
+    if value is None or column is None:
+        return True
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        return True
+    if expected is datetime:
+        return isinstance(value, datetime)
+    if expected is date:
+        return isinstance(value, date) and not isinstance(value, datetime)
+    if isinstance(value, bool):
+        return expected is bool
+    if expected in (int, float):
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor, sort_by, sort_order, column=None):
+    """
+    Dekoduje kursor z URL.
+
+    Args:
+        cursor: Kursor base64url
+        sort_by: Nazwa biezacego sortowania
+        sort_order: "asc" lub "desc"
+        column: Kolumna sortowania - typ wartosci z kursora musi jej odpowiadac
+            (inaczej porownanie w SQL konczy sie bledem bazy)
+
+    Returns:
+        dict lub None: {'value', 'id', 'direction'} lub None dla pustego,
+        uszkodzonego lub niepasujacego do sortowania kursora
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if payload.get('s') != sort_by or payload.get('o') != sort_order:
+            return None
+        if payload.get('d') not in ('next', 'prev') or not isinstance(payload.get('i'), int):
+            return None
+        value = _decode_value(payload.get('v'))
+        if not _matches_column(value, column):
+            return None
+        return {
+            'value': value,
+            'id': payload['i'],
+            'direction': payload['d'],
+        }
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def _after(column, id_column, value, row_id):
+    """Wiersze za (value, row_id) w porzadku (kolumna NULLS FIRST, id) rosnaco."""
+    if value is None:
+        return or_(column.isnot(None), and_(column.is_(None), id_column > row_id))
+    return or_(column > value, and_(column == value, id_column > row_id))
+
+
+def _before(column, id_column, value, row_id):
+    """Wiersze przed (value, row_id) w porzadku (kolumna NULLS FIRST, id) rosnaco."""
+    if value is None:
+        return and_(column.is_(None), id_column < row_id)
+    return or_(column.is_(None), column < value, and_(column == value, id_column < row_id))
+
+
+def paginate_keyset(query, column, id_column, sort_by, sort_order, cursor, per_page, row_key):
+    """
+    Pobiera strone wynikow metoda keyset.
+
+    Args:
+        query: Zapytanie bez ORDER BY
+        column: Kolumna sortowania
+        id_column: Kolumna rozstrzygajaca (Case.id)
+        sort_by: Nazwa sortowania (zapisywana w kursorze)
+        sort_order: "asc" lub "desc"
+        cursor: Kursor z URL (None/"" = pierwsza strona)
+        per_page: Rozmiar strony
+        row_key: Funkcja wiersz -> (wartosc kolumny, id)
+
+    Returns:
+        dict: {'items', 'next_cursor', 'prev_cursor'}
+    """
+    position = decode_cursor(cursor, sort_by, sort_order, column)
+    direction = position['direction'] if position else 'next'
+
+    # Czy czytamy porzadek bazowy do przodu (rosnaco)?
+    forward = (sort_order != 'desc') == (direction == 'next')
+
+    if position:
+        boundary = _after if forward else _before
+        query = query.filter(boundary(column, id_column, position['value'], position['id']))
+
+    if forward:
+        query = query.order_by(column.asc().nullsfirst(), id_column.asc())
+    else:
+        query = query.order_by(column.desc().nullslast(), id_column.desc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if direction == 'prev':
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first_value, first_id = row_key(rows[0])
+        last_value, last_id = row_key(rows[-1])
+        if direction == 'next':
+            more_after, more_before = has_more, position is not None
+        else:
+            more_after, more_before = True, has_more
+        if more_after:
+            next_cursor = encode_cursor(sort_by, sort_order, last_value, last_id, 'next')
+        if more_before:
+            prev_cursor = encode_cursor(sort_by, sort_order, first_value, first_id, 'prev')
+
+    return {
+        'items': rows,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+    }
@@ -15,6 +15,22 @@ def generate_email(stage, invoice, account):
     Returns:
         tuple: (subject, body_html)
     """
+    email = build_email(stage, invoice, account)
+    if not email:
+        return ("", "")
+    return email['subject'], email['body_html']
+
+
+def build_email(stage, invoice, account):
+    """
+    Renderuje e-mail i zwraca rowniez dane potrzebne do ponownego renderowania.
+
+    NotificationLog w trybie szablonowym przechowuje tylko szablon (raz)
+    i parametry renderowania - tresc jest odtwarzana na zadanie.
+
+    Returns:
+        dict lub None: {'template_key', 'subject', 'body_html', 'render_params'}
+    """
     stage_keys_map = {
         "Przypomnienie o zbliżającym się terminie płatności": "stage_1",
         "Powiadomienie o upływie terminu płatności": "stage_2",
@@ -28,11 +44,11 @@ def generate_email(stage, invoice, account):
     template_key = stage if stage.startswith("stage_") else stage_keys_map.get(stage, None)
 
     if not template_key:
-        return ("", "")
+        return None
 
     template = MAIL_TEMPLATES.get(template_key)
     if not template:
-        return ("", "")
+        return None
 
     due_date_str = invoice.payment_due_date.strftime("%Y-%m-%d") if invoice.payment_due_date else "Brak"
     debt_amount = f"{invoice.gross_price / 100:.2f}"
@@ -57,7 +73,7 @@ def generate_email(stage, invoice, account):
     creditor_email = account.company_email_contact or account.email_from
     creditor_bank = account.company_bank_account or "BRAK RACHUNKU"
 
-    body_html = template["body_html"].format(
+    render_params = dict(
         # Dane klienta (dluznika) z faktury
         company_name=invoice.client_company_name or "",
         due_date=due_date_str,
@@ -76,4 +92,11 @@ def generate_email(stage, invoice, account):
         creditor_email=creditor_email,
         creditor_bank_account=creditor_bank
     )
-    return subject, body_html
+    body_html = template["body_html"].format(**render_params)
+
+    return {
+        'template_key': template_key,
+        'subject': subject,
+        'body_html': body_html,
+        'render_params': render_params
+    }
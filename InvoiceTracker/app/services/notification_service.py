@@ -1,15 +1,20 @@
 """
 Serwis powiadomien.
 Logika wysylki manualnych powiadomien, sprawdzanie duplikatow, logowanie.
+
+Wysylka odbywa sie przez NotificationOutbox (outbox_service) - zapis logu
+i oznaczenie wpisu jako wyslanego sa atomowe.
 """
 import logging
 from datetime import datetime
 
+from sqlalchemy import update
+
 from ..extensions import db
-from ..models import Case, Invoice, NotificationLog, Account
+from ..models import Case, Client, Invoice, NotificationLog, Account
 from ..utils import map_stage, stage_to_number
-from .send_email import send_email_for_account
-from .mail_utils import generate_email
+from .mail_utils import build_email
+from . import data_version, outbox_service
 
 log = logging.getLogger(__name__)
 
@@ -64,6 +69,66 @@ def create_notification_log(account_id, invoice, stage, mode, subject, body, ema
     return log_entry
 
 
+def recalculate_case_progress(account_id):
+    """
+    Przelicza Case.max_stage i Case.last_notified_at z NotificationLog dla konta.
+
+    Kolumny sa aktualizowane na biezaco przy zapisie logu - ta funkcja sluzy
+    do backfillu i naprawy (flask backfill-case-progress). Bulk UPDATE omija
+    przeliczenie kartoteki przy flush - Client.max_stage klientow zmienionych
+    spraw jest przeliczany jawnie w tej samej transakcji.
+
+    Args:
+        account_id: ID konta
+
+    Returns:
+        int: Liczba zaktualizowanych spraw
+    """
+    progress = {}
+    log_rows = db.session.query(
+        NotificationLog.invoice_number,
+        NotificationLog.stage,
+        NotificationLog.sent_at
+    ).filter(NotificationLog.account_id == account_id).yield_per(1000)
+
+    for invoice_number, stage, sent_at in log_rows:
+        stage_num = stage_to_number(stage)
+        if stage_num == 0:
+            continue
+        max_stage, last_notified_at = progress.get(invoice_number, (0, None))
+        if sent_at and (last_notified_at is None or sent_at > last_notified_at):
+            last_notified_at = sent_at
+        progress[invoice_number] = (max(max_stage, stage_num), last_notified_at)
+
+    cases = db.session.query(
+        Case.id, Case.case_number, Case.client_id, Case.max_stage, Case.last_notified_at, Case.updated_at
+    ).filter(Case.account_id == account_id).all()
+
+    updates = []
+    touched_clients = set()
+    for case_row in cases:
+        max_stage, last_notified_at = progress.get(case_row.case_number, (0, None))
+        if case_row.max_stage != max_stage or case_row.last_notified_at != last_notified_at:
+            updates.append({
+                'id': case_row.id,
+                'max_stage': max_stage,
+                'last_notified_at': last_notified_at,
+                'updated_at': case_row.updated_at  # Bez zmiany daty aktualizacji sprawy
+            })
+            touched_clients.add(case_row.client_id)
+
+    if updates:
+        db.session.execute(update(Case), updates)
+        # Bulk UPDATE omija unit of work - jawne przeliczenie kartoteki klientow
+        # (Client.max_stage) i zmiana wersji danych konta
+        Client.refresh(db.session.connection(), account_id, touched_clients)
+        data_version.mark_account_changed(account_id)
+    db.session.commit()
+
+    log.info(f"[notification_service] Przeliczono postep dla konta {account_id}: {len(updates)} spraw")
+    return len(updates)
+
+
 def send_manual_notification(account_id, case_number, stage):
     """
     Wysyla manualne powiadomienie dla sprawy.
@@ -137,8 +202,8 @@ def send_manual_notification(account_id, case_number, stage):
             }
 
         # Generuj email
-        subject, body_html = generate_email(mapped, inv, account)
-        if not subject or not body_html:
+        email = build_email(mapped, inv, account)
+        if not email or not email['subject'] or not email['body_html']:
             return {
                 'success': False,
                 'message': "Blad szablonu.",
@@ -156,23 +221,28 @@ def send_manual_notification(account_id, case_number, stage):
                 'case_closed': False
             }
 
-        # Wyslij email(e)
-        email_success = False
-        email_errors = []
-        emails = [email.strip() for email in effective_email.split(',') if email.strip()]
-
-        for email in emails:
-            try:
-                if send_email_for_account(account, email, subject, body_html, html=True):
-                    email_success = True
-                else:
-                    email_errors.append(f"Nieudana wysylka do {email}")
-            except Exception as e:
-                email_errors.append(f"{email}: {str(e)}")
-                log.error(f"Error sending manual email to {email}: {e}", exc_info=True)
-
-        if not email_success:
-            error_msg = "; ".join(email_errors) if email_errors else "Nieznany blad."
+        # Zapisz do outboxa i wyslij od razu (wysylka + log + zamkniecie w jednej transakcji)
+        entry = outbox_service.enqueue_manual_notification(
+            account_id=account_id,
+            invoice=inv,
+            stage=mapped,
+            subject=email['subject'],
+            body=email['body_html'],
+            email_to=effective_email,
+            template_key=email['template_key'],
+            render_params=email['render_params']
+        )
+        if entry is None:
+            return {
+                'success': False,
+                'message': f"Powiadomienie ({mapped}) jest wlasnie wysylane automatycznie - sprawdz historie za chwile.",
+                'message_type': 'warning',
+                'case_closed': False
+            }
+        delivery = outbox_service.deliver_entry(entry, account, auto_close=True, retry_on_failure=False)
+
+        if not delivery['success']:
+            error_msg = "; ".join(delivery['errors']) if delivery['errors'] else "Nieznany blad."
             return {
                 'success': False,
                 'message': f"Blad wysylki: {error_msg}",
@@ -180,28 +250,14 @@ def send_manual_notification(account_id, case_number, stage):
                 'case_closed': False
             }
 
-        # Aktualizuj fakture i utworz log
+        # Sprawa zamykana po etapie 5 (w transakcji deliver_entry)
+        case_closed = delivery['case_closed']
+
+        # Aktualizuj status windykacji faktury
         inv.debt_status = mapped
-        create_notification_log(
-            account_id=account_id,
-            invoice=inv,
-            stage=mapped,
-            mode="Manualne",
-            subject=subject,
-            body=body_html,
-            email_to=effective_email
-        )
         db.session.add(inv)
         db.session.commit()
 
-        # Zamknij sprawe po etapie 5
-        case_closed = False
-        if stage_to_number(mapped) >= 5 and case_obj.status == 'active':
-            case_obj.status = "closed_nieoplacone"
-            db.session.add(case_obj)
-            db.session.commit()
-            case_closed = True
-
         message = "Powiadomienie wyslane."
         if case_closed:
             message = "Powiadomienie wyslane. Sprawa zamknieta (nieoplacona) po wyslaniu etapu 5."
@@ -0,0 +1,449 @@
+"""
+Serwis kolejki powiadomien (transactional outbox).
+Planowanie wysylek zbiorczo do NotificationOutbox i oproznianie go partiami przez workery.
+
+Przeplyw:
+1. plan_notifications_for_account() - wybiera faktury i etapy do wysylki,
+   renderuje maile i zapisuje je do outboxa JEDNYM commitem
+2. drain_outbox() - pobiera partie wpisow (FOR UPDATE SKIP LOCKED), oznacza je
+   jako "sending" (claim) i zwalnia blokady
+3. deliver_entry() - wysyla mail, a nastepnie w JEDNEJ transakcji oznacza wpis
+   jako "sent" i zapisuje NotificationLog (+ ewentualne zamkniecie sprawy)
+
+Wpisy "sending" starsze niz SENDING_TIMEOUT (np. po restarcie workera) sa
+ponownie podejmowane przez kolejne oproznianie kolejki.
+
+Ponowienia po bledach SMTP (RETRY_BACKOFF x proba) i przejmowanie porzuconych
+wpisow "sending" wymagaja cyklicznego oprozniania - CRON /cron/drain_outbox
+co 5 minut (cron.yaml, do CRON_MAX_BATCHES partii na wywolanie). Wysylka
+o godzinie konta (/cron/run_mail) oproznia tylko wpisy gotowe w danej chwili.
+
+Wpisy "sent" / "failed" starsze niz RETENTION sa usuwane po kazdym oproznianiu
+(purge_outbox) - historia wysylek jest w NotificationLog.
+"""
+import json
+import logging
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, func, or_
+
+from ..extensions import db
+from ..models import Account, AccountScheduleSettings, Case, Invoice, NotificationLog, NotificationOutbox
+from ..tenant_context import tenant_context, sudo
+from ..utils import stage_to_number
+from .batch_scan import DEFAULT_SCAN_BATCH_SIZE, stream_scan
+from .mail_templates import MAIL_TEMPLATES
+from .mail_utils import build_email
+from .send_email import send_email_for_account
+
+log = logging.getLogger(__name__)
+
+# Parametry kolejki
+DEFAULT_BATCH_SIZE = 50
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = timedelta(minutes=5)
+# Limit partii jednego wywolania CRON /cron/drain_outbox (limit czasu zadania App Engine)
+CRON_MAX_BATCHES = 20
+SENDING_TIMEOUT = timedelta(minutes=15)
+# Jak dlugo trzymac wpisy zakonczone ("sent" / "failed") - deduplikacja planowania
+# potrzebuje ich tylko do konca dnia planowania (etap = dokladny dzien po terminie)
+RETENTION = timedelta(days=7)
+
+
+# =============================================================================
+# PLANOWANIE
+# =============================================================================
+
+def _load_sent_keys(account_id, stage_names):
+    """
+    Zwraca zbior (invoice_number, stage) juz wyslanych lub zakolejkowanych powiadomien.
+
+    Dwa zapytania dla calego konta zamiast osobnego sprawdzania kazdej faktury.
+    Wpisy outboxa to tylko kolejka z ostatnich dni (purge_outbox) - wyslane
+    wczesniej sa w NotificationLog.
+    """
+    sent = db.session.query(NotificationLog.invoice_number, NotificationLog.stage).filter(
+        NotificationLog.account_id == account_id,
+        NotificationLog.stage.in_(stage_names)
+    ).distinct().all()
+
+    queued = db.session.query(NotificationOutbox.invoice_number, NotificationOutbox.stage).filter(
+        NotificationOutbox.account_id == account_id,
+        NotificationOutbox.stage.in_(stage_names)
+    ).all()
+
+    return {(row.invoice_number, row.stage) for row in sent} | {(row.invoice_number, row.stage) for row in queued}
+
+
+def plan_notifications_for_account(account, notification_settings, batch_size=DEFAULT_SCAN_BATCH_SIZE):
+    """
+    Planuje automatyczne powiadomienia dla konta i zapisuje je zbiorczo do outboxa.
+
+    Logika wyboru faktur jest identyczna jak dotychczas w schedulerze:
+    aktywne sprawy, nieoplacone, z emailem, days_diff == offset etapu.
+
+    Args:
+        account: Obiekt Account
+        notification_settings: dict {stage_name: offset_days}
+        batch_size: Rozmiar partii przy skanowaniu faktur (stream_scan)
+
+    Returns:
+        int: Liczba nowych wpisow w outboxie
+    """
+    today = date.today()
+    already_handled = _load_sent_keys(account.id, list(notification_settings.keys()))
+
+    entries = []
+    active_invoices = (Invoice.query.join(Case, Invoice.case_id == Case.id)
+                       .filter(Case.status == "active", Invoice.account_id == account.id)
+                       .order_by(Invoice.invoice_date.desc(), Invoice.id.desc()))
+
+    for inv in stream_scan(active_invoices, batch_size=batch_size):
+        if not inv.payment_due_date:
+            continue
+
+        # FILTR: Pomijaj oplacone faktury
+        if inv.left_to_pay == 0 or inv.status == 'paid':
+            continue
+
+        effective_email = inv.get_effective_email()
+        if not effective_email or effective_email == "N/A":
+            continue
+
+        days_diff = (today - inv.payment_due_date).days
+
+        for stage_name, offset_value in notification_settings.items():
+            if days_diff != offset_value:
+                continue
+            if (inv.invoice_number, stage_name) in already_handled:
+                continue
+
+            email = build_email(stage_name, inv, account)
+            if not email or not email['subject'] or not email['body_html']:
+                log.warning(f"[outbox] Brak szablonu dla {stage_name}, pomijam fakture {inv.invoice_number}.")
+                continue
+
+            entries.append(NotificationOutbox(
+                account_id=account.id,
+                invoice_id=inv.id,
+                invoice_number=inv.invoice_number,
+                client_id=inv.client_id,
+                email_to=effective_email,
+                subject=email['subject'],
+                body=email['body_html'],
+                template_key=email['template_key'],
+                render_params=json.dumps(email['render_params'], ensure_ascii=False),
+                stage=stage_name,
+                mode="Automatyczne"
+            ))
+            already_handled.add((inv.invoice_number, stage_name))
+
+    if entries:
+        db.session.add_all(entries)
+        db.session.commit()
+
+    log.info(f"[outbox] Zaplanowano {len(entries)} powiadomien dla konta '{account.name}' (ID: {account.id})")
+    return len(entries)
+
+
+def enqueue_manual_notification(account_id, invoice, stage, subject, body, email_to,
+                                template_key=None, render_params=None):
+    """
+    Zapisuje manualne powiadomienie do outboxa i od razu je rezerwuje (status "sending").
+
+    Jesli dla etapu istnieje wpis "pending" / "failed" (np. po bledach SMTP),
+    jest on ponownie uzyty zamiast tworzenia duplikatu - wybierany FOR UPDATE
+    SKIP LOCKED, zeby nie przejac wiersza rezerwowanego wlasnie przez worker.
+    Wpis "sent" (log wysylki usuniety) jest uzywany do ponownej wysylki.
+    Wpis "sending" z aktualna blokada (worker w trakcie SMTP) nie jest
+    przejmowany - wysylka manualna jest odrzucana (brak podwojnego maila).
+
+    template_key/render_params (z mail_utils.build_email) pozwalaja zapisac
+    NotificationLog w trybie szablonowym.
+
+    Returns:
+        NotificationOutbox lub None: Wpis gotowy do deliver_entry() lub None,
+        gdy powiadomienie jest wlasnie wysylane przez worker
+    """
+    now = datetime.utcnow()
+    lookup = NotificationOutbox.query.filter_by(
+        account_id=account_id,
+        invoice_number=invoice.invoice_number,
+        stage=stage
+    )
+    entry = lookup.with_for_update(skip_locked=True).first()
+
+    if entry is None and lookup.first() is not None:
+        # Wiersz zablokowany - worker rezerwuje go w tej chwili (claim_batch)
+        db.session.rollback()
+        return None
+
+    if entry is not None and entry.status == "sending" and entry.locked_at and \
+            entry.locked_at >= now - SENDING_TIMEOUT:
+        db.session.rollback()
+        return None
+
+    if entry is None:
+        entry = NotificationOutbox(
+            account_id=account_id,
+            invoice_id=invoice.id,
+            invoice_number=invoice.invoice_number,
+            stage=stage,
+            attempts=0
+        )
+
+    entry.client_id = invoice.client_id
+    entry.email_to = email_to
+    entry.subject = subject
+    entry.body = body
+    entry.template_key = template_key
+    entry.render_params = json.dumps(render_params, ensure_ascii=False) if render_params is not None else None
+    entry.mode = "Manualne"
+    entry.status = "sending"
+    entry.attempts = (entry.attempts or 0) + 1
+    entry.locked_at = now
+    entry.last_error = None
+
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+
+# =============================================================================
+# WYSYLKA
+# =============================================================================
+
+def deliver_entry(entry, account, auto_close=False, retry_on_failure=True):
+    """
+    Wysyla pojedynczy wpis outboxa.
+
+    Po udanej wysylce w JEDNEJ transakcji:
+    - oznacza wpis jako "sent" i usuwa z niego tresc (body / render_params -
+      tresc przechowuje NotificationLog)
+    - zapisuje NotificationLog
+    - zamyka sprawe po etapie 5 (jesli auto_close)
+
+    Po nieudanej wysylce wpis wraca do "pending" z opoznieniem
+    lub przechodzi w "failed" po MAX_ATTEMPTS probach.
+
+    Args:
+        entry: Obiekt NotificationOutbox (status "sending")
+        account: Obiekt Account
+        auto_close: Czy zamknac sprawe po wyslaniu etapu 5
+        retry_on_failure: Czy ponowic wysylke pozniej (False dla wysylek manualnych -
+            uzytkownik widzi blad od razu i sam decyduje o ponowieniu)
+
+    Returns:
+        dict: Wynik z kluczami:
+            - success: bool
+            - errors: list[str]
+            - case_closed: bool
+    """
+    errors = []
+    email_success = False
+    emails = [email.strip() for email in (entry.email_to or '').split(',') if email.strip()]
+
+    for email in emails:
+        try:
+            if send_email_for_account(account, email, entry.subject, entry.body, html=True):
+                email_success = True
+            else:
+                errors.append(f"Nieudana wysylka do {email}")
+        except Exception as e:
+            errors.append(f"{email}: {str(e)}")
+            log.error(f"[outbox] Blad wysylki do {email} dla faktury {entry.invoice_number}: {e}")
+
+    now = datetime.utcnow()
+
+    if not email_success:
+        entry.last_error = "; ".join(errors) if errors else "Brak adresu email."
+        entry.locked_at = None
+        if not retry_on_failure or entry.attempts >= MAX_ATTEMPTS:
+            entry.status = "failed"
+        else:
+            entry.status = "pending"
+            entry.available_at = now + RETRY_BACKOFF * entry.attempts
+        db.session.add(entry)
+        db.session.commit()
+        return {'success': False, 'errors': errors, 'case_closed': False}
+
+    entry.status = "sent"
+    entry.sent_at = now
+    entry.locked_at = None
+    entry.last_error = "; ".join(errors) if errors else None
+    db.session.add(entry)
+
+    log_entry = NotificationLog(
+        account_id=entry.account_id,
+        client_id=entry.client_id,
+        invoice_number=entry.invoice_number,
+        email_to=entry.email_to,
+        subject=entry.subject,
+        stage=entry.stage,
+        mode=entry.mode,
+        sent_at=now,
+        scheduled_date=entry.created_at
+    )
+    template = MAIL_TEMPLATES.get(entry.template_key, {}).get('body_html') if entry.template_key else None
+    log_entry.set_body(
+        entry.body,
+        template_key=entry.template_key,
+        template=template,
+        render_params=json.loads(entry.render_params) if entry.render_params else None
+    )
+    db.session.add(log_entry)
+
+    # Tresc jest juz w NotificationLog (set_body) - outbox nie trzyma kopii HTML
+    entry.body = None
+    entry.render_params = None
+
+    case_closed = False
+    if auto_close and stage_to_number(entry.stage) >= 5:
+        case_obj = Case.query.filter_by(
+            case_number=entry.invoice_number,
+            account_id=entry.account_id
+        ).first()
+        if case_obj and case_obj.status == "active":
+            case_obj.status = "closed_nieoplacone"
+            db.session.add(case_obj)
+            case_closed = True
+
+    db.session.commit()
+    return {'success': True, 'errors': errors, 'case_closed': case_closed}
+
+
+def claim_batch(account_id=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Rezerwuje partie wpisow do wysylki.
+
+    SELECT ... FOR UPDATE SKIP LOCKED gwarantuje, ze rownolegle workery
+    nie pobiora tych samych wierszy. Po oznaczeniu wpisow jako "sending"
+    transakcja jest zatwierdzana, wiec blokady nie sa trzymane podczas SMTP.
+
+    Args:
+        account_id: Opcjonalne ograniczenie do jednego konta
+        batch_size: Maksymalny rozmiar partii
+
+    Returns:
+        list[int]: ID zarezerwowanych wpisow
+    """
+    now = datetime.utcnow()
+    query = NotificationOutbox.query.filter(
+        or_(
+            and_(NotificationOutbox.status == "pending", NotificationOutbox.available_at <= now),
+            and_(NotificationOutbox.status == "sending", NotificationOutbox.locked_at < now - SENDING_TIMEOUT)
+        )
+    )
+    if account_id is not None:
+        query = query.filter(NotificationOutbox.account_id == account_id)
+
+    entries = (query.order_by(NotificationOutbox.id)
+               .limit(batch_size)
+               .with_for_update(skip_locked=True)
+               .all())
+
+    for entry in entries:
+        entry.status = "sending"
+        entry.locked_at = now
+        entry.attempts = (entry.attempts or 0) + 1
+
+    claimed_ids = [entry.id for entry in entries]
+    db.session.commit()
+    return claimed_ids
+
+
+def drain_outbox(account_id=None, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """
+    Oproznia outbox partiami. Moze dzialac w wielu procesach jednoczesnie.
+
+    Args:
+        account_id: Opcjonalne ograniczenie do jednego konta (None = wszystkie)
+        batch_size: Rozmiar partii
+        max_batches: Limit partii na jedno wywolanie (None = do oproznienia)
+
+    Returns:
+        dict: Podsumowanie {'sent', 'failed', 'retry', 'batches', 'closed_cases', 'purged'}
+    """
+    summary = {'sent': 0, 'failed': 0, 'retry': 0, 'batches': 0, 'closed_cases': 0, 'purged': 0}
+    accounts = {}
+    auto_close_flags = {}
+
+    while max_batches is None or summary['batches'] < max_batches:
+        with sudo():
+            claimed_ids = claim_batch(account_id=account_id, batch_size=batch_size)
+        if not claimed_ids:
+            break
+        summary['batches'] += 1
+
+        for entry_id in claimed_ids:
+            with sudo():
+                entry = db.session.get(NotificationOutbox, entry_id)
+            if entry is None:
+                continue
+
+            if entry.account_id not in accounts:
+                with sudo():
+                    accounts[entry.account_id] = db.session.get(Account, entry.account_id)
+                with tenant_context(entry.account_id):
+                    settings = AccountScheduleSettings.get_for_account(entry.account_id)
+                    auto_close_flags[entry.account_id] = settings.auto_close_after_stage5
+
+            account = accounts[entry.account_id]
+
+            with tenant_context(entry.account_id):
+                if account is None or not account.is_active:
+                    entry.status = "failed"
+                    entry.locked_at = None
+                    entry.last_error = "Konto nie istnieje lub jest nieaktywne."
+                    db.session.commit()
+                    summary['failed'] += 1
+                    continue
+
+                try:
+                    result = deliver_entry(entry, account, auto_close=auto_close_flags[entry.account_id])
+                except Exception as e:
+                    log.error(f"[outbox] Blad przetwarzania wpisu {entry_id}: {e}", exc_info=True)
+                    db.session.rollback()
+                    continue
+
+            if result['success']:
+                summary['sent'] += 1
+                if result['case_closed']:
+                    summary['closed_cases'] += 1
+                log.info(f"[outbox] Wyslano {entry.invoice_number}, etap={entry.stage}")
+            elif entry.status == "failed":
+                summary['failed'] += 1
+            else:
+                summary['retry'] += 1
+
+    with sudo():
+        summary['purged'] = purge_outbox(account_id=account_id)
+
+    log.info(f"[outbox] Oproznianie zakonczone: {summary}")
+    return summary
+
+
+def purge_outbox(account_id=None, older_than=RETENTION):
+    """
+    Usuwa zakonczone wpisy outboxa ("sent" / "failed") starsze niz older_than.
+
+    Args:
+        account_id: Opcjonalne ograniczenie do jednego konta (None = wszystkie)
+        older_than: Wiek wpisu (timedelta) liczony od wysylki / utworzenia
+
+    Returns:
+        int: Liczba usunietych wpisow
+    """
+    cutoff = datetime.utcnow() - older_than
+    query = NotificationOutbox.query.filter(
+        NotificationOutbox.status.in_(("sent", "failed")),
+        func.coalesce(NotificationOutbox.sent_at, NotificationOutbox.created_at) < cutoff
+    )
+    if account_id is not None:
+        query = query.filter(NotificationOutbox.account_id == account_id)
+
+    purged = query.delete(synchronize_session=False)
+    db.session.commit()
+    if purged:
+        log.info(f"[outbox] Usunieto {purged} zakonczonych wpisow starszych niz {older_than}")
+    return purged
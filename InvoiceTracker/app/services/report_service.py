@@ -0,0 +1,162 @@
+"""
+Serwis raportow.
+Raport wiekowania naleznosci (aging) dla aktywnych spraw konta.
+
+Przedzialy liczone w SQL jednym zapytaniem GROUP BY - granice przedzialow
+to daty wyliczone w Pythonie (porownanie payment_due_date z data, bez
+arytmetyki dat zaleznej od dialektu). Wynik w cache per wersja danych konta
+i dzien (dni po terminie rosna codziennie bez zapisow).
+"""
+import logging
+from datetime import date, timedelta
+
+from sqlalchemy import case as sql_case, func, select
+
+from .. import cache
+from ..db_routing import replica_reads
+from ..extensions import db
+from ..models import Case, Invoice
+from .data_version import get_request_data_version
+from .export_service import csv_line
+from .finance_service import grosz_to_pln
+
+log = logging.getLogger(__name__)
+
+# Przedzialy wiekowania (klucz, etykieta) w kolejnosci raportu
+AGING_BUCKETS = [
+    ('current', 'Przed terminem'),
+    ('0-30', '0-30 dni'),
+    ('31-60', '31-60 dni'),
+    ('61-90', '61-90 dni'),
+    ('90+', 'Powyzej 90 dni'),
+    ('no_due_date', 'Brak terminu'),
+]
+
+CSV_BATCH_SIZE = 500
+
+
+def _aging_bucket(due_date_column, today):
+    """Wyrazenie CASE przypisujace przedzial wiekowania do terminu platnosci."""
+    return sql_case(
+        (due_date_column.is_(None), 'no_due_date'),
+        (due_date_column > today, 'current'),
+        (due_date_column >= today - timedelta(days=30), '0-30'),
+        (due_date_column >= today - timedelta(days=60), '31-60'),
+        (due_date_column >= today - timedelta(days=90), '61-90'),
+        else_='90+'
+    )
+
+
+def _compute_aging(account_id, today):
+    """
+    Liczy przedzialy wiekowania jednym zapytaniem (GROUP BY w podzapytaniu).
+
+    Returns:
+        dict: bucket -> {'count': int, 'amount': int (grosze)}
+    """
+    rows = (
+        select(
+            _aging_bucket(Invoice.payment_due_date, today).label('bucket'),
+            func.coalesce(Invoice.left_to_pay, 0).label('left_to_pay')
+        )
+        .join(Case, Case.id == Invoice.case_id)
+        .where(Case.account_id == account_id, Case.status == 'active')
+        .subquery()
+    )
+    result = db.session.execute(
+        select(rows.c.bucket, func.count(), func.sum(rows.c.left_to_pay)).group_by(rows.c.bucket)
+    )
+    return {bucket: {'count': int(count or 0), 'amount': int(amount or 0)} for bucket, count, amount in result}
+
+
+@replica_reads
+def get_aging_report(account_id):
+    """
+    Pobiera raport wiekowania naleznosci dla konta (cache per wersja danych i dzien).
+
+    Args:
+        account_id: ID konta
+
+    Returns:
+        dict: {'buckets': [{'key', 'label', 'count', 'amount', 'share'}],
+               'total_count', 'total_amount', 'as_of'}
+    """
+    today = date.today()
+    version = get_request_data_version(account_id)
+    totals = cache.get_or_compute(
+        account_id,
+        f"aging:{version}:{today.isoformat()}",
+        lambda: _compute_aging(account_id, today)
+    )
+
+    total_amount = sum(item['amount'] for item in totals.values())
+    buckets = []
+    for key, label in AGING_BUCKETS:
+        item = totals.get(key, {'count': 0, 'amount': 0})
+        buckets.append({
+            'key': key,
+            'label': label,
+            'count': item['count'],
+            'amount': grosz_to_pln(item['amount']),
+            'share': round(item['amount'] * 100 / total_amount, 1) if total_amount else 0.0,
+        })
+
+    return {
+        'buckets': buckets,
+        'total_count': sum(item['count'] for item in totals.values()),
+        'total_amount': grosz_to_pln(total_amount),
+        'as_of': today,
+    }
+
+
+@replica_reads
+def iter_aging_csv(account_id, detail=False):
+    """
+    Generator linii CSV raportu wiekowania (do odpowiedzi strumieniowej).
+
+    Args:
+        account_id: ID konta
+        detail: False - podsumowanie przedzialow, True - faktury z przedzialem
+
+    Yields:
+        str: Kolejne linie CSV
+    """
+    if not detail:
+        report = get_aging_report(account_id)
+        yield csv_line(['przedzial', 'liczba_spraw', 'kwota_pln', 'udzial_proc'])
+        for bucket in report['buckets']:
+            yield csv_line([bucket['label'], bucket['count'], f"{bucket['amount']:.2f}", bucket['share']])
+        yield csv_line(['RAZEM', report['total_count'], f"{report['total_amount']:.2f}", 100.0])
+        return
+
+    today = date.today()
+    labels = dict(AGING_BUCKETS)
+    yield csv_line(['numer_sprawy', 'id_klienta', 'nazwa', 'termin_platnosci',
+                     'dni_po_terminie', 'przedzial', 'do_zaplaty_pln'])
+
+    # Projekcja kolumn + yield_per - pamiec stala niezaleznie od liczby faktur
+    rows = db.session.execute(
+        select(
+            Case.case_number,
+            Case.client_id,
+            Case.client_company_name,
+            Invoice.payment_due_date,
+            Invoice.left_to_pay,
+            _aging_bucket(Invoice.payment_due_date, today).label('bucket')
+        )
+        .join(Invoice, Case.id == Invoice.case_id)
+        .where(Case.account_id == account_id, Case.status == 'active')
+        .order_by(Invoice.payment_due_date.asc(), Case.id.asc())
+        .execution_options(yield_per=CSV_BATCH_SIZE)
+    )
+    for row in rows:
+        days = (today - row.payment_due_date).days if row.payment_due_date else ''
+        yield csv_line([
+            row.case_number,
+            row.client_id,
+            row.client_company_name or '',
+            row.payment_due_date.isoformat() if row.payment_due_date else '',
+            days,
+            labels[row.bucket],
+            f"{grosz_to_pln(row.left_to_pay or 0):.2f}",
+        ])
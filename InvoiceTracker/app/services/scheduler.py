@@ -1,14 +1,11 @@
 # scheduler.py - Mail service functions
 # APScheduler usuniety - uzywa Cron + Cloud Tasks
-from datetime import datetime, timedelta, date
-import time
 from dotenv import load_dotenv
 
-from ..extensions import db
-from ..models import Invoice, NotificationLog, Case, NotificationSettings, Account, AccountScheduleSettings
+from ..models import NotificationSettings, Account, AccountScheduleSettings
 from ..tenant_context import tenant_context, sudo
-from .send_email import send_email_for_account
-from .mail_utils import generate_email
+from .. import sql_metrics
+from . import outbox_service
 
 load_dotenv()
 
@@ -29,9 +26,16 @@ def run_mail_for_single_account(app, account_id):
     Wysylka powiadomien dla pojedynczego konta.
     Wywolane przez scheduler per-profil.
 
+    Powiadomienia sa najpierw planowane zbiorczo do NotificationOutbox,
+    a nastepnie wysylane przez outbox_service.drain_outbox(). Wpisy odlozone
+    po bledzie SMTP wysyla pozniej CRON /cron/drain_outbox (co 5 minut).
+
     Args:
         app: Flask application context
         account_id (int): ID konta dla ktorego wyslac maile
+
+    Returns:
+        dict lub None: Podsumowanie oprozniania outboxa (None jesli pominieto konto)
     """
     with app.app_context(), tenant_context(account_id):
         # Używamy sudo() dla zapytania o Account (nie ma account_id)
@@ -48,7 +52,6 @@ def run_mail_for_single_account(app, account_id):
             return
 
         print(f"[scheduler] START wysylki dla konta: {account.name} (ID: {account_id})")
-        today = date.today()
 
         # Pobierz ustawienia powiadomien dla tego konta
         notification_settings = NotificationSettings.get_all_settings(account.id)
@@ -57,117 +60,25 @@ def run_mail_for_single_account(app, account_id):
             print(f"[scheduler] Brak ustawien powiadomien dla konta {account.name}. Pomijam.")
             return
 
-        processed_count = 0
-        error_count = 0
-        batch_size = 100
-        offset = 0
-
         # Uzyj auto_close_after_stage5 z ustawien zaawansowanych
         auto_close_enabled = settings.auto_close_after_stage5
 
-        while True:
-            # Pobierz faktury dla tego konta (account_id auto-filtrowany przez TENANT_MODELS)
-            # JOIN pozostaje dla filtra Case.status
-            active_invoices = (Invoice.query.join(Case, Invoice.case_id == Case.id)
-                               .filter(Case.status == "active")
-                               .order_by(Invoice.invoice_date.desc())
-                               .offset(offset)
-                               .limit(batch_size)
-                               .all())
-            if not active_invoices:
-                break
-
-            for inv in active_invoices:
-                if not inv.payment_due_date:
-                    continue
-
-                # FILTR: Pomijaj oplacone faktury
-                if inv.left_to_pay == 0 or inv.status == 'paid':
-                    continue
-
-                days_diff = (today - inv.payment_due_date).days
-
-                # Skip if no email is available (uzywamy effective email)
-                effective_email = inv.get_effective_email()
-                if not effective_email or effective_email == "N/A":
-                    continue
-
-                notification_sent = False
-                for stage_name, offset_value in notification_settings.items():
-                    if days_diff == offset_value:
-                        # Check if this notification was already sent
-                        existing_log = NotificationLog.query.filter_by(
-                            invoice_number=inv.invoice_number,
-                            stage=stage_name,
-                            account_id=account.id
-                        ).first()
-
-                        if existing_log:
-                            continue
-
-                        # Generuj i wyslij email
-                        subject, body_html = generate_email(stage_name, inv, account)
-                        if not subject or not body_html:
-                            print(f"[scheduler] Brak szablonu dla {stage_name}, pomijam fakture {inv.invoice_number}.")
-                            continue
-
-                        # Split multiple emails and send to each (uzywamy effective email)
-                        emails = [email.strip() for email in effective_email.split(',') if email.strip()]
-                        email_sent_success = False
-
-                        for email in emails:
-                            retries = 3
-                            for attempt in range(retries):
-                                try:
-                                    send_email_for_account(account, email, subject, body_html, html=True)
-                                    email_sent_success = True
-                                    break
-                                except Exception as e:
-                                    print(f"[scheduler] Blad wysylki maila do {email} dla faktury {inv.invoice_number} (proba {attempt+1}): {e}")
-                                    if attempt == retries - 1:
-                                        error_count += 1
-                                    time.sleep(5)
-
-                        if email_sent_success:
-                            # Log the notification (uzywamy effective email)
-                            new_log = NotificationLog(
-                                account_id=account.id,
-                                client_id=inv.client_id,
-                                invoice_number=inv.invoice_number,
-                                email_to=effective_email,
-                                subject=subject,
-                                body=body_html,
-                                stage=stage_name,
-                                mode="Automatyczne",
-                                scheduled_date=datetime.now()
-                            )
-                            db.session.add(new_log)
-                            db.session.commit()
-                            processed_count += 1
-                            notification_sent = True
-                            print(f"[scheduler] Wyslano mail dla {inv.invoice_number}, etap={stage_name}")
-
-                # Auto-zamykanie sprawy TYLKO PO WYSLANIU STAGE 5 (jesli wlaczone)
-                if notification_sent and auto_close_enabled:
-                    # Sprawdz czy wlasnie wyslano stage 5 dla tej faktury
-                    stage5_log = NotificationLog.query.filter_by(
-                        invoice_number=inv.invoice_number,
-                        account_id=account.id,
-                        stage="Przekazanie sprawy do windykatora zewnętrznego"
-                    ).first()
-
-                    if stage5_log:
-                        case_obj = Case.query.filter_by(
-                            case_number=inv.invoice_number,
-                            account_id=account.id
-                        ).first()
-                        if case_obj and case_obj.status == "active":
-                            case_obj.status = "closed_nieoplacone"
-                            db.session.add(case_obj)
-                            db.session.commit()
-                            print(f"[scheduler] Zamknieto sprawe {inv.invoice_number} (wyslano etap 5)")
-
-            offset += batch_size
+        with sql_metrics.track_queries(f"wysylka konta {account_id}") as query_stats:
+            # KROK 1: Planowanie - zbiorczy zapis do outboxa (account_id auto-filtrowany)
+            planned_count = outbox_service.plan_notifications_for_account(account, notification_settings)
+            print(f"[scheduler] Zaplanowano {planned_count} powiadomien dla konta '{account.name}'")
+
+            # KROK 2: Wysylka - oproznienie outboxa dla tego konta (wysylka + log w jednej transakcji)
+            summary = outbox_service.drain_outbox(account_id=account_id)
+        processed_count = summary['sent']
+        error_count = summary['failed'] + summary['retry']
+
+        if auto_close_enabled and summary['closed_cases']:
+            print(f"[scheduler] Zamknieto {summary['closed_cases']} spraw (wyslano etap 5)")
 
         # Summary
         print(f"[scheduler] KONIEC dla konta '{account.name}': Wyslano {processed_count} powiadomien, bledow: {error_count}")
+        if query_stats:
+            summary['sql'] = query_stats.summary()
+            print(f"[scheduler] SQL: {summary['sql']['queries']} zapytan, {summary['sql']['db_time_ms']} ms")
+        return summary
@@ -0,0 +1,107 @@
+"""
+Serwis wyszukiwania spraw.
+Filtr wyszukiwania dla list spraw (numer sprawy, ID klienta, nazwa firmy, NIP, email).
+
+Na PostgreSQL z rozszerzeniem pg_trgm (migracja 2026101903_trgm) wyszukiwanie
+korzysta z indeksow GIN (gin_trgm_ops) - ILIKE '%q%' nie wymaga pelnego skanu.
+Warunki sa grupowane per tabela (case / invoice) i laczone przez UNION ID spraw,
+bo OR pomiedzy tabelami zlaczenia uniemozliwia uzycie indeksow (BitmapOr dziala
+tylko w obrebie jednej tabeli).
+
+Fallback (SQLite, PostgreSQL bez pg_trgm): zwykly ILIKE z OR na zlaczeniu.
+"""
+import logging
+
+from sqlalchemy import or_, select, text, union
+
+from ..extensions import db
+from ..models import Case, Invoice
+
+log = logging.getLogger(__name__)
+
+# Trigramy wymagaja min. 3 znakow - krotsze frazy i tak skanuja tabele
+MIN_TRGM_LENGTH = 3
+
+# Cache wykrycia pg_trgm per silnik bazy (URL -> bool)
+_trgm_available = {}
+
+
+def escape_like(value):
+    """Escapuje znaki specjalne LIKE (%, _) w frazie uzytkownika."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def is_trgm_available():
+    """
+    Sprawdza czy baza obsluguje wyszukiwanie trigramowe (PostgreSQL + pg_trgm).
+
+    Wynik jest zapamietywany per silnik - sprawdzenie wykonywane raz na proces.
+
+    Returns:
+        bool: True jesli pg_trgm jest zainstalowane
+    """
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _trgm_available:
+        available = False
+        if engine.dialect.name == 'postgresql':
+            try:
+                with engine.connect() as conn:
+                    available = conn.execute(
+                        text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                    ).first() is not None
+            except Exception as e:
+                log.warning(f"[search] Nie udalo sie sprawdzic pg_trgm: {e}")
+        _trgm_available[key] = available
+        log.info(f"[search] pg_trgm dostepne: {available}")
+    return _trgm_available[key]
+
+
+def apply_case_search(query, search_query, account_id):
+    """
+    Dodaje filtr wyszukiwania do zapytania o sprawy (Case JOIN Invoice).
+
+    Args:
+        query: Zapytanie zawierajace Case i Invoice
+        search_query: Fraza wyszukiwania (juz w lowercase)
+        account_id: ID konta
+
+    Returns:
+        Query: Zapytanie z filtrem (bez zmian dla pustej frazy)
+    """
+    if not search_query:
+        return query
+
+    pattern = f"%{escape_like(search_query)}%"
+
+    if len(search_query) >= MIN_TRGM_LENGTH and is_trgm_available():
+        # Indeksy trigramowe per tabela + UNION ID spraw
+        case_ids = select(Case.id).where(
+            Case.account_id == account_id,
+            or_(
+                Case.case_number.ilike(pattern, escape='\\'),
+                Case.client_company_name.ilike(pattern, escape='\\'),
+                Case.client_id.ilike(pattern, escape='\\'),
+            )
+        )
+        invoice_case_ids = select(Invoice.case_id).where(
+            Invoice.account_id == account_id,
+            Invoice.case_id.isnot(None),
+            or_(
+                Invoice.client_nip.ilike(pattern, escape='\\'),
+                Invoice.client_email.ilike(pattern, escape='\\'),
+            )
+        )
+        matching_ids = union(case_ids, invoice_case_ids).subquery()
+        return query.filter(Case.id.in_(select(matching_ids.c[0])))
+
+    # Fallback - ILIKE na zlaczeniu
+    return query.filter(
+        or_(
+            Case.case_number.ilike(pattern, escape='\\'),
+            Case.client_company_name.ilike(pattern, escape='\\'),
+            Case.client_id.ilike(pattern, escape='\\'),
+            Invoice.client_nip.ilike(pattern, escape='\\'),
+            Invoice.client_email.ilike(pattern, escape='\\'),
+        )
+    )
@@ -0,0 +1,165 @@
+"""
+Serwis dziennych migawek konta (AccountDailySnapshot).
+
+Migawka zapisuje sumy widoczne na stronie spraw (aktywne, dlug, zamkniete
+oplacone/nieoplacone) oraz liczbe maili wyslanych danego dnia per etap.
+Wykresy trendow czytaja gotowe wiersze - koszt odczytu zalezy od liczby dni,
+nie od liczby faktur.
+
+Dzien maili liczony w UTC (NotificationLog.sent_at zapisywany w UTC).
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import case as sql_case, func
+
+from ..extensions import db
+from ..models import Account, AccountDailySnapshot, Case, Invoice, NotificationLog
+from ..tenant_context import tenant_context
+from ..utils import stage_to_number
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TREND_DAYS = 30
+MAX_TREND_DAYS = 366
+
+
+def _case_totals(account_id):
+    """Liczby spraw wg statusu i dlug aktywnych (jedno zapytanie agregujace)."""
+    is_active = Case.status == 'active'
+    row = (
+        db.session.query(
+            func.coalesce(func.sum(sql_case((is_active, 1), else_=0)), 0),
+            func.coalesce(func.sum(sql_case((is_active, func.coalesce(Invoice.left_to_pay, 0)), else_=0)), 0),
+            func.coalesce(func.sum(sql_case((Case.status == 'closed_oplacone', 1), else_=0)), 0),
+            func.coalesce(func.sum(sql_case((Case.status == 'closed_nieoplacone', 1), else_=0)), 0),
+        )
+        .select_from(Case)
+        .outerjoin(Invoice, Case.id == Invoice.case_id)
+        .filter(Case.account_id == account_id)
+        .one()
+    )
+    return {
+        'active_count': int(row[0]),
+        'total_debt': int(row[1]),
+        'closed_paid_count': int(row[2]),
+        'closed_unpaid_count': int(row[3]),
+    }
+
+
+def _emails_by_stage(account_id, snapshot_date):
+    """Liczba maili wyslanych danego dnia (UTC) per etap 1-5."""
+    day_start = datetime.combine(snapshot_date, time.min)
+    rows = (
+        db.session.query(NotificationLog.stage, func.count(NotificationLog.id))
+        .filter(
+            NotificationLog.account_id == account_id,
+            NotificationLog.sent_at >= day_start,
+            NotificationLog.sent_at < day_start + timedelta(days=1)
+        )
+        .group_by(NotificationLog.stage)
+        .all()
+    )
+    counts = {stage: 0 for stage in range(1, 6)}
+    for stage_text, count in rows:
+        stage_num = stage_to_number(stage_text)
+        if stage_num:
+            counts[stage_num] += count
+    return counts
+
+
+def take_daily_snapshot(account_id, snapshot_date=None):
+    """
+    Zapisuje (lub nadpisuje) migawke konta dla dnia.
+
+    Stan spraw to stan z chwili uruchomienia - migawke nalezy robic pod
+    koniec dnia (cron.yaml). Dla dat wstecznych poprawne sa tylko liczby maili.
+
+    Args:
+        account_id: ID konta
+        snapshot_date: Dzien migawki (domyslnie dzisiaj)
+
+    Returns:
+        AccountDailySnapshot: Zapisany wiersz
+    """
+    snapshot_date = snapshot_date or date.today()
+    totals = _case_totals(account_id)
+    emails = _emails_by_stage(account_id, snapshot_date)
+
+    snapshot = AccountDailySnapshot.query.filter_by(
+        account_id=account_id, snapshot_date=snapshot_date
+    ).first()
+    if not snapshot:
+        snapshot = AccountDailySnapshot(account_id=account_id, snapshot_date=snapshot_date)
+        db.session.add(snapshot)
+
+    for key, value in totals.items():
+        setattr(snapshot, key, value)
+    for stage_num, count in emails.items():
+        setattr(snapshot, f'emails_stage_{stage_num}', count)
+    snapshot.created_at = datetime.utcnow()
+
+    db.session.commit()
+    log.info(f"[snapshot] Konto {account_id}, {snapshot_date}: {totals['active_count']} aktywnych, "
+             f"{totals['total_debt']} gr dlugu")
+    return snapshot
+
+
+def take_snapshots_for_all_accounts(snapshot_date=None):
+    """
+    Zapisuje migawki wszystkich aktywnych kont (CRON).
+
+    Returns:
+        dict: {'accounts': int, 'errors': int}
+    """
+    accounts = Account.query.filter_by(is_active=True).order_by(Account.id).all()
+    summary = {'accounts': 0, 'errors': 0}
+
+    for account in accounts:
+        try:
+            with tenant_context(account.id):
+                take_daily_snapshot(account.id, snapshot_date)
+            summary['accounts'] += 1
+        except Exception as e:
+            log.error(f"[snapshot] Blad migawki konta {account.id}: {e}", exc_info=True)
+            db.session.rollback()
+            summary['errors'] += 1
+
+    return summary
+
+
+def get_trend(account_id, days=DEFAULT_TREND_DAYS):
+    """
+    Pobiera szereg czasowy migawek konta (ostatnie N dni).
+
+    Args:
+        account_id: ID konta
+        days: Liczba dni wstecz (1-366)
+
+    Returns:
+        dict: Dane gotowe do render_template (serie do wykresu + wiersze tabeli)
+    """
+    days = max(1, min(int(days), MAX_TREND_DAYS))
+    since = date.today() - timedelta(days=days - 1)
+
+    snapshots = (
+        AccountDailySnapshot.query
+        .filter(AccountDailySnapshot.account_id == account_id, AccountDailySnapshot.snapshot_date >= since)
+        .order_by(AccountDailySnapshot.snapshot_date.asc())
+        .all()
+    )
+
+    rows = [{
+        'date': s.snapshot_date.isoformat(),
+        'active_count': s.active_count,
+        'total_debt': s.total_debt / 100.0,
+        'closed_paid_count': s.closed_paid_count,
+        'closed_unpaid_count': s.closed_unpaid_count,
+        'emails': [s.emails_stage_1, s.emails_stage_2, s.emails_stage_3, s.emails_stage_4, s.emails_stage_5],
+    } for s in snapshots]
+
+    return {
+        'days': days,
+        'rows': rows,
+        'latest': rows[-1] if rows else None,
+    }
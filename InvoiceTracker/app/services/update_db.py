@@ -8,6 +8,7 @@ from datetime import datetime, date, timedelta
 import logging
 import traceback
 
+from .. import sql_metrics
 from ..extensions import db
 from ..models import Invoice, Case, SyncStatus, NotificationSettings, NotificationLog, Account, AccountScheduleSettings
 from ..tenant_context import tenant_context, sudo
@@ -439,15 +440,16 @@ def run_full_sync(account_id):
     total_processed_new, total_new_cases, total_api_new, new_duration = 0, 0, 0, 0.0
     total_processed_updates, total_active_after, total_closed_update, total_api_update, update_duration = 0, 0, 0, 0, 0.0
 
-    try:
-        total_processed_new, total_new_cases, total_api_new, new_duration = sync_new_invoices(account_id)
-    except Exception as e_new:
-        log.critical(f"[run_full_sync] Krytyczny blad w sync_new_invoices dla konta '{account.name}': {e_new}", exc_info=True)
+    with sql_metrics.track_queries(f"sync konta {account_id}") as query_stats:
+        try:
+            total_processed_new, total_new_cases, total_api_new, new_duration = sync_new_invoices(account_id)
+        except Exception as e_new:
+            log.critical(f"[run_full_sync] Krytyczny blad w sync_new_invoices dla konta '{account.name}': {e_new}", exc_info=True)
 
-    try:
-        total_processed_updates, total_active_after, total_closed_update, total_api_update, update_duration = update_existing_cases(account_id)
-    except Exception as e_update:
-        log.critical(f"[run_full_sync] Krytyczny blad w update_existing_cases dla konta '{account.name}': {e_update}", exc_info=True)
+        try:
+            total_processed_updates, total_active_after, total_closed_update, total_api_update, update_duration = update_existing_cases(account_id)
+        except Exception as e_update:
+            log.critical(f"[run_full_sync] Krytyczny blad w update_existing_cases dla konta '{account.name}': {e_update}", exc_info=True)
 
     total_processed_records = total_processed_new + total_processed_updates
     total_api_calls = total_api_new + total_api_update
@@ -468,7 +470,9 @@ def run_full_sync(account_id):
             new_invoices_processed=total_processed_new,
             updated_invoices_processed=total_processed_updates,
             new_sync_duration=new_duration,
-            update_sync_duration=update_duration
+            update_sync_duration=update_duration,
+            db_queries=query_stats.count if query_stats else None,
+            db_time=query_stats.db_time if query_stats else None
         )
         db.session.add(sync_record)
         db.session.commit()
@@ -481,5 +485,7 @@ def run_full_sync(account_id):
     log.info(f"  Nowe: {total_processed_new} faktur, {total_new_cases} spraw (API: {total_api_new}, czas: {new_duration:.2f}s)")
     log.info(f"  Aktualizacje: {total_processed_updates} faktur, {total_active_after} aktywnych, {total_closed_update} zamknietych (API: {total_api_update}, czas: {update_duration:.2f}s)")
     log.info(f"  Lacznie: {total_processed_records}. API: {total_api_calls}")
+    if query_stats:
+        log.info(f"  SQL: {query_stats.summary()}")
 
     return total_processed_records
@@ -0,0 +1,237 @@
+"""
+Rejestr wolnych zapytan SQL z planem wykonania.
+
+Zapytanie wykonywane dluzej niz SLOW_QUERY_MS (0 = wylaczone) trafia do
+bufora cyklicznego procesu (SLOW_QUERY_LOG_SIZE ostatnich wpisow) razem z:
+- SQL (tak jak wyslany do bazy),
+- znormalizowanymi parametrami (liczby i daty bez zmian, teksty jako typ
+  i dlugosc - bez danych klientow w logu),
+- planem EXPLAIN (ANALYZE off) - PostgreSQL / EXPLAIN QUERY PLAN - SQLite.
+
+EXPLAIN nie wykonuje zapytania; jest pobierany osobnym kursorem na tym samym
+polaczeniu (w PostgreSQL w SAVEPOINT - blad EXPLAIN nie przerywa transakcji
+zadania). Plan tego samego ksztaltu zapytania jest pobierany raz na
+PLAN_CACHE_TTL sekund.
+
+Podglad: GET /diagnostics/slow-queries (proces web, tylko DIAGNOSTICS_ADMIN_EMAILS -
+bufor zawiera zapytania wszystkich kont) lub flask slow-queries (plany kluczowych
+zapytan aplikacji na danych konta).
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .cache import LRUCache
+from . import sql_metrics
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LOG_SIZE = 100
+PLAN_CACHE_TTL = 600
+
+# Liczba elementow listy parametrow (IN) zapisywana w logu
+MAX_LIST_PARAMS = 5
+# Od ilu jednakowych kolejnych parametrow pozycyjnych zapisywac je jako "wartosc xN"
+MIN_COLLAPSED_RUN = 3
+
+_EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+# Stan modulu (ustawiany w configure_slow_queries)
+_threshold = None
+_entries = deque(maxlen=DEFAULT_LOG_SIZE)
+_lock = threading.Lock()
+_plans = LRUCache(max_entries=256, ttl=PLAN_CACHE_TTL)
+
+
+def _normalize_value(value):
+    """Parametr do logu - liczby / daty / bool bez zmian, tekst i bajty jako typ i dlugosc."""
+    if value is None or isinstance(value, (bool, int, float, Decimal)):
+        return value if not isinstance(value, Decimal) else str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return f"<str:{len(value)}>"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<bytes:{len(value)}>"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_normalize_value(item) for item in list(value)[:MAX_LIST_PARAMS]]
+        if len(value) > MAX_LIST_PARAMS:
+            items.append(f"... (+{len(value) - MAX_LIST_PARAMS})")
+        return items
+    return f"<{type(value).__name__}>"
+
+
+def normalize_parameters(parameters):
+    """
+    Parametry zapytania bez wartosci tekstowych (dict / sekwencja jak w DBAPI).
+
+    Parametry pozycyjne: kolejne jednakowe wartosci (rozwinieta lista IN)
+    zapisywane jako jedna pozycja "wartosc xN".
+    """
+    if isinstance(parameters, dict):
+        return {key: _normalize_value(value) for key, value in parameters.items()}
+    if not isinstance(parameters, (list, tuple)):
+        return None
+
+    runs = []
+    for value in (_normalize_value(item) for item in parameters):
+        if runs and runs[-1][0] == value:
+            runs[-1][1] += 1
+        else:
+            runs.append([value, 1])
+
+    normalized = []
+    for value, count in runs:
+        if count >= MIN_COLLAPSED_RUN:
+            normalized.append(f"{value} x{count}")
+        else:
+            normalized.extend([value] * count)
+    return normalized
+
+
+def _explain(conn, statement, parameters):
+    """
+    Plan zapytania osobnym kursorem DBAPI (bez zdarzen SQLAlchemy).
+
+    Returns:
+        list[str]: Linie planu (lub jedna linia z opisem bledu / braku obslugi)
+    """
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE off) '
+    elif dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        return [f"EXPLAIN nieobslugiwany dla dialektu {dialect}"]
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    savepoint = dialect == 'postgresql'
+    try:
+        if savepoint:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception as e:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return [f"Blad EXPLAIN: {e}"]
+        finally:
+            if savepoint:
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    except Exception as e:
+        log.warning(f"[slow_queries] Nie udalo sie pobrac planu: {e}")
+        return [f"Blad EXPLAIN: {e}"]
+    finally:
+        cursor.close()
+
+    # PostgreSQL: jedna kolumna tekstu; SQLite: (id, parent, notused, detail)
+    return [str(row[-1]) for row in rows]
+
+
+def _current_label():
+    """Opis zadania, w ktorym wykonano zapytanie (track_queries / sciezka HTTP)."""
+    stats = sql_metrics.current_query_stats()
+    if stats is not None:
+        return stats.label
+    if has_request_context():
+        return f"{request.method} {request.path}"
+    return None
+
+
+def _start_slow_query_timer(conn, cursor, statement, parameters, context, executemany):
+    """Listener before_cursor_execute - start pomiaru czasu zapytania."""
+    if context is not None:
+        context._slow_query_start = time.perf_counter()
+
+
+def _record_slow_query(conn, cursor, statement, parameters, context, executemany):
+    """Listener after_cursor_execute - zapisuje zapytanie dluzsze niz prog."""
+    start = getattr(context, '_slow_query_start', None)
+    if _threshold is None or start is None:
+        return
+    elapsed = time.perf_counter() - start
+    if elapsed * 1000 < _threshold:
+        return
+
+    shape = sql_metrics.statement_shape(statement)
+    plan = None
+    if not executemany and statement.lstrip().split(None, 1)[0].lower() in _EXPLAINABLE:
+        plan = _plans.get(shape)
+        if plan is None:
+            plan = _explain(conn, statement, parameters)
+            _plans.set(shape, plan)
+
+    entry = {
+        'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'duration_ms': round(elapsed * 1000, 1),
+        'label': _current_label(),
+        'sql': statement,
+        'parameters': normalize_parameters(parameters) if not executemany else f"<executemany:{len(parameters)}>",
+        'plan': plan,
+    }
+    with _lock:
+        _entries.append(entry)
+    log.warning(f"[slow_queries] {entry['duration_ms']} ms ({entry['label']}): {shape[:200]}")
+
+
+def get_slow_queries(limit=None):
+    """
+    Ostatnie wolne zapytania (od najnowszych).
+
+    Args:
+        limit: Maksymalna liczba wpisow (None = caly bufor)
+
+    Returns:
+        list[dict]: {'recorded_at', 'duration_ms', 'label', 'sql', 'parameters', 'plan'}
+    """
+    with _lock:
+        entries = list(reversed(_entries))
+    return entries[:limit] if limit else entries
+
+
+def clear_slow_queries():
+    """Czysci bufor wolnych zapytan i zapamietane plany."""
+    with _lock:
+        _entries.clear()
+    _plans.clear()
+
+
+def get_threshold_ms():
+    """Aktualny prog wolnego zapytania w ms (None = rejestr wylaczony)."""
+    return _threshold
+
+
+def set_threshold_ms(threshold_ms):
+    """
+    Zmienia prog wolnego zapytania (np. flask slow-queries --threshold-ms 0
+    rejestruje wszystkie zapytania). Listenery rejestrowane przy pierwszym wlaczeniu.
+
+    Args:
+        threshold_ms: Prog w ms (None = wylaczone)
+    """
+    global _threshold
+    _threshold = float(threshold_ms) if threshold_ms is not None else None
+    if _threshold is not None and not event.contains(Engine, 'before_cursor_execute', _start_slow_query_timer):
+        event.listen(Engine, 'before_cursor_execute', _start_slow_query_timer)
+        event.listen(Engine, 'after_cursor_execute', _record_slow_query)
+
+
+def configure_slow_queries(app):
+    """
+    Konfiguruje prog i rozmiar bufora wolnych zapytan.
+    Wywolywane w create_app() po init_app.
+    """
+    global _entries
+    _entries = deque(maxlen=app.config.get('SLOW_QUERY_LOG_SIZE', DEFAULT_LOG_SIZE))
+    threshold = app.config.get('SLOW_QUERY_MS', 0)
+    set_threshold_ms(threshold if threshold > 0 else None)
+    if _threshold is not None:
+        log.info(f"[slow_queries] Rejestr wolnych zapytan wlaczony (prog {_threshold:.0f} ms)")
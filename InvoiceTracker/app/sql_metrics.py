@@ -0,0 +1,265 @@
+"""
+Metryki SQL procesu.
+
+Cache kompilacji zapytan SQLAlchemy - kazde wykonanie zapytania jest
+liczone wg context.cache_hit (trafienie / chybienie / brak klucza cache /
+cache wylaczony). Niski udzial trafien oznacza, ze zapytania (np. filtr
+tenanta w do_orm_execute) kompilowane sa przy kazdym wykonaniu.
+
+Liczniki sa per proces (instancja App Engine, worker, CLI), od startu lub
+ostatniego reset_compile_cache_stats().
+
+Instrumentacja zadan (opcjonalna, SQL_INSTRUMENTATION=true) - liczba zapytan
+i czas bazy per zadanie HTTP lub zadanie w tle (track_queries), grupowanie
+powtarzajacych sie zapytan (ten sam SQL z innymi parametrami - wzorzec N+1),
+ostrzezenie w logu po przekroczeniu progow, naglowek Server-Timing.
+"""
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WARN_QUERIES = 100
+DEFAULT_WARN_DB_TIME_MS = 1000
+DEFAULT_WARN_REPEATED = 20
+
+# Liczba najczesciej powtarzanych zapytan w podsumowaniu / ostrzezeniu
+TOP_REPEATED = 3
+
+# Lista parametrow IN (?, ?, ?) / (%(p_1)s, %(p_2)s) -> (?) - ten sam ksztalt niezaleznie od dlugosci
+_PARAM = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_PARAM_LIST_RE = re.compile(rf'\(\s*{_PARAM}(?:\s*,\s*{_PARAM})+\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Nazwy CacheStats (context.cache_hit) -> klucz w statystykach
+_CACHE_STAT_KEYS = {
+    'CACHE_HIT': 'hits',
+    'CACHE_MISS': 'misses',
+    'CACHING_DISABLED': 'disabled',
+    'NO_CACHE_KEY': 'no_cache_key',
+    'NO_DIALECT_SUPPORT': 'no_dialect_support',
+}
+
+_lock = threading.Lock()
+_compile_cache_counts = dict.fromkeys(_CACHE_STAT_KEYS.values(), 0)
+
+
+def _count_compile_cache(conn, cursor, statement, parameters, context, executemany):
+    """Listener after_cursor_execute - zlicza wynik cache kompilacji."""
+    cache_hit = getattr(context, 'cache_hit', None)
+    key = _CACHE_STAT_KEYS.get(getattr(cache_hit, 'name', None))
+    if key is None:
+        return
+    with _lock:
+        _compile_cache_counts[key] += 1
+
+
+def get_compile_cache_stats():
+    """
+    Statystyki cache kompilacji zapytan od startu procesu.
+
+    Returns:
+        dict: {'hits', 'misses', 'disabled', 'no_cache_key', 'no_dialect_support',
+               'total', 'hit_rate'} - hit_rate w % trafien wsrod zapytan z kluczem cache
+    """
+    with _lock:
+        stats = dict(_compile_cache_counts)
+    cacheable = stats['hits'] + stats['misses']
+    stats['total'] = sum(stats.values())
+    stats['hit_rate'] = round(stats['hits'] * 100 / cacheable, 1) if cacheable else None
+    return stats
+
+
+def reset_compile_cache_stats():
+    """Zeruje liczniki cache kompilacji (np. przed pomiarem)."""
+    with _lock:
+        for key in _compile_cache_counts:
+            _compile_cache_counts[key] = 0
+
+
+def statement_shape(statement):
+    """Ksztalt zapytania - SQL bez nadmiarowych bialych znakow i z listami IN skroconymi do (?)."""
+    return _PARAM_LIST_RE.sub('(?)', _WHITESPACE_RE.sub(' ', statement).strip())
+
+
+class QueryStats:
+    """Statystyki zapytan SQL jednego zadania HTTP lub zadania w tle (track_queries)."""
+
+    def __init__(self, label, parent=None):
+        self.label = label
+        self.parent = parent
+        self.count = 0
+        self.db_time = 0.0
+        self.shapes = {}
+
+    def record(self, statement, elapsed):
+        """Dolicza wykonane zapytanie (takze do zadan nadrzednych)."""
+        shape = statement_shape(statement)
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.db_time += elapsed
+            entry = stats.shapes.setdefault(shape, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            stats = stats.parent
+
+    def repeated(self, min_count=2):
+        """
+        Zapytania wykonane co najmniej min_count razy (od najczestszych).
+
+        Returns:
+            list[tuple]: (ksztalt SQL, liczba wykonan, laczny czas w sekundach)
+        """
+        items = [(shape, count, elapsed) for shape, (count, elapsed) in self.shapes.items() if count >= min_count]
+        return sorted(items, key=lambda item: (-item[1], -item[2]))
+
+    def summary(self):
+        """Podsumowanie do logow / podsumowan uruchomien (czas w ms)."""
+        return {
+            'queries': self.count,
+            'db_time_ms': round(self.db_time * 1000, 1),
+            'repeated': [
+                {'count': count, 'db_time_ms': round(elapsed * 1000, 1), 'sql': shape[:200]}
+                for shape, count, elapsed in self.repeated()[:TOP_REPEATED]
+            ],
+        }
+
+    def server_timing(self):
+        """Wartosc naglowka Server-Timing (metryka db)."""
+        return f'db;dur={self.db_time * 1000:.1f};desc="{self.count} queries"'
+
+
+# Stan modulu (ustawiany w configure_sql_metrics)
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar('sql_query_stats', default=None)
+_instrumentation_enabled = False
+_thresholds = {
+    'queries': DEFAULT_WARN_QUERIES,
+    'db_time_ms': DEFAULT_WARN_DB_TIME_MS,
+    'repeated': DEFAULT_WARN_REPEATED,
+}
+
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    """Listener before_cursor_execute - start pomiaru (tylko gdy zadanie jest sledzone)."""
+    if context is not None and _current_stats.get() is not None:
+        context._sql_metrics_start = time.perf_counter()
+
+
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    """Listener after_cursor_execute - dolicza zapytanie do biezacego zadania."""
+    stats = _current_stats.get()
+    start = getattr(context, '_sql_metrics_start', None)
+    if stats is None or start is None:
+        return
+    stats.record(statement, time.perf_counter() - start)
+
+
+def is_instrumentation_enabled():
+    """Czy instrumentacja zadan jest wlaczona (SQL_INSTRUMENTATION)."""
+    return _instrumentation_enabled
+
+
+def current_query_stats():
+    """Statystyki biezacego sledzonego zadania lub None."""
+    return _current_stats.get()
+
+
+def report_query_stats(stats):
+    """Loguje ostrzezenia gdy zadanie przekroczylo progi (liczba zapytan, czas bazy, powtorzenia)."""
+    db_time_ms = stats.db_time * 1000
+    if stats.count > _thresholds['queries'] or db_time_ms > _thresholds['db_time_ms']:
+        log.warning(f"[sql_metrics] {stats.label}: {stats.count} zapytan, {db_time_ms:.1f} ms bazy "
+                    f"(progi: {_thresholds['queries']} zapytan, {_thresholds['db_time_ms']} ms)")
+    for shape, count, elapsed in stats.repeated(_thresholds['repeated'])[:TOP_REPEATED]:
+        log.warning(f"[sql_metrics] {stats.label}: mozliwe N+1 - {count}x ({elapsed * 1000:.1f} ms): {shape[:300]}")
+
+
+@contextmanager
+def track_queries(label):
+    """
+    Sledzi zapytania SQL wykonane w bloku (zadanie w tle, synchronizacja, wysylka).
+
+    Zagniezdzone bloki dolicza zapytania takze do blokow nadrzednych (np. zadanie
+    HTTP Cloud Tasks). Po wyjsciu z bloku loguje ostrzezenia o przekroczonych progach.
+
+    Usage:
+        with sql_metrics.track_queries(f"sync konta {account_id}") as query_stats:
+            ...
+        query_stats.summary() if query_stats else None
+
+    Args:
+        label: Opis sledzonego zadania (w ostrzezeniach)
+
+    Yields:
+        QueryStats lub None (instrumentacja wylaczona)
+    """
+    if not _instrumentation_enabled:
+        yield None
+        return
+
+    stats = QueryStats(label, parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        report_query_stats(stats)
+
+
+def configure_sql_metrics(app):
+    """
+    Rejestruje liczniki na zdarzeniach silnika (wszystkie silniki procesu)
+    i - przy SQL_INSTRUMENTATION - sledzenie zapytan per zadanie HTTP.
+    Wywolywane w create_app() po init_app.
+    """
+    global _instrumentation_enabled
+    if not event.contains(Engine, 'after_cursor_execute', _count_compile_cache):
+        event.listen(Engine, 'after_cursor_execute', _count_compile_cache)
+    log.debug("[sql_metrics] Liczniki cache kompilacji zapytan wlaczone")
+
+    _instrumentation_enabled = app.config.get('SQL_INSTRUMENTATION', False)
+    if not _instrumentation_enabled:
+        return
+
+    _thresholds.update({
+        'queries': app.config.get('SQL_WARN_QUERIES', DEFAULT_WARN_QUERIES),
+        'db_time_ms': app.config.get('SQL_WARN_DB_TIME_MS', DEFAULT_WARN_DB_TIME_MS),
+        'repeated': app.config.get('SQL_WARN_REPEATED', DEFAULT_WARN_REPEATED),
+    })
+    if not event.contains(Engine, 'before_cursor_execute', _start_query_timer):
+        event.listen(Engine, 'before_cursor_execute', _start_query_timer)
+        event.listen(Engine, 'after_cursor_execute', _record_query)
+
+    @app.before_request
+    def _start_request_tracking():
+        stats = QueryStats(f"{request.method} {request.path}")
+        g._sql_stats_token = _current_stats.set(stats)
+
+    @app.after_request
+    def _add_server_timing(response):
+        stats = _current_stats.get()
+        if stats is not None:
+            response.headers.add('Server-Timing', stats.server_timing())
+        return response
+
+    @app.teardown_request
+    def _finish_request_tracking(exc):
+        token = g.pop('_sql_stats_token', None)
+        if token is None:
+            return
+        stats = _current_stats.get()
+        _current_stats.reset(token)
+        if stats is not None:
+            report_query_stats(stats)
+
+    log.info(f"[sql_metrics] Instrumentacja zapytan wlaczona (progi: {_thresholds})")
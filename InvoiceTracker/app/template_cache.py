@@ -0,0 +1,125 @@
+"""
+Cache szablonow Jinja.
+
+Dwa mechanizmy:
+- bytecode cache - skompilowany kod szablonow zapisywany poza procesem:
+  wspolny Redis (CACHE_REDIS_URL) - nowa instancja App Engine nie kompiluje
+  szablonow od nowa, albo katalog JINJA_BYTECODE_CACHE_DIR (domyslnie katalog
+  tymczasowy - wspolny dla workerow gunicorn jednej instancji). Jinja sprawdza
+  sume kontrolna zrodla - zmieniony szablon jest kompilowany ponownie.
+- cache fragmentow - HTML wierszy list spraw (cases.html, completed.html)
+  renderowany przez cached_row(). Klucz: rodzaj wiersza, ID sprawy,
+  Account.data_version zadania (data_version.get_request_data_version) i data
+  (kolumna "dni po terminie"). Kazdy zapis danych konta zwieksza data_version -
+  wiersze sa renderowane ponownie, stare wpisy wygasaja same (LRU / TTL).
+  Cache jest lokalny dla procesu.
+"""
+import logging
+import os
+import tempfile
+from datetime import date
+
+from flask import has_request_context, session
+from jinja2 import FileSystemBytecodeCache, MemcachedBytecodeCache
+
+from .cache import LRUCache
+
+log = logging.getLogger(__name__)
+
+DEFAULT_FRAGMENT_MAX_ENTRIES = 5000
+DEFAULT_FRAGMENT_TTL = 3600
+
+# Bytecode w Redis - prefiks klucza i czas zycia (sekundy)
+BYTECODE_KEY_PREFIX = 'invoicetracker:jinja:'
+BYTECODE_TTL = 7 * 24 * 3600
+
+# Stan modulu (ustawiany w configure_template_cache)
+_fragments = None
+
+
+def cached_row(kind, macro, item):
+    """
+    Renderuje wiersz listy spraw makrem Jinja z uzyciem cache fragmentow.
+
+    Usage (szablon):
+        {% from "case_rows.html" import active_case_row %}
+        {% for c in cases %}{{ cached_row('active', active_case_row, c) }}{% endfor %}
+
+    Args:
+        kind: Rodzaj wiersza (czesc klucza - 'active' / 'completed')
+        macro: Makro renderujace wiersz (zalezne tylko od danych sprawy)
+        item: Slownik sprawy z kluczem 'id'
+
+    Returns:
+        Markup: HTML wiersza
+    """
+    case_id = item.get('id')
+    account_id = session.get('current_account_id') if has_request_context() else None
+    if _fragments is None or case_id is None or account_id is None:
+        return macro(item)
+
+    from .services import data_version
+
+    version = data_version.get_request_data_version(account_id)
+    if version is None:
+        return macro(item)
+
+    key = (kind, account_id, case_id, version, date.today().toordinal())
+    html = _fragments.get(key)
+    if html is None:
+        html = macro(item)
+        _fragments.set(key, html)
+    return html
+
+
+def clear_fragments():
+    """Czysci cache fragmentow procesu."""
+    if _fragments is not None:
+        _fragments.clear()
+
+
+def _build_bytecode_cache(app):
+    """Bytecode cache: Redis (CACHE_REDIS_URL) lub katalog; None = wylaczony."""
+    redis_url = app.config.get('CACHE_REDIS_URL')
+    if redis_url:
+        try:
+            import redis  # opcjonalna zaleznosc - tylko gdy CACHE_REDIS_URL ustawiony
+            client = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+            # Bledy Redis ignorowane (ignore_memcache_errors) - szablon jest wtedy kompilowany
+            return MemcachedBytecodeCache(client, prefix=BYTECODE_KEY_PREFIX, timeout=BYTECODE_TTL)
+        except ImportError:
+            log.warning("[template_cache] CACHE_REDIS_URL ustawiony, ale pakiet 'redis' nie jest zainstalowany - "
+                        "bytecode cache w katalogu")
+
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if directory is None:
+        directory = os.path.join(tempfile.gettempdir(), 'invoicetracker-jinja')
+    if not directory:
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        log.warning(f"[template_cache] Nie mozna utworzyc katalogu bytecode cache {directory}: {e}")
+        return None
+    return FileSystemBytecodeCache(directory)
+
+
+def configure_template_cache(app):
+    """
+    Konfiguruje bytecode cache Jinja i cache fragmentow (funkcja cached_row w szablonach).
+    Wywolywane w create_app() po init_app.
+    """
+    global _fragments
+
+    bytecode_cache = _build_bytecode_cache(app)
+    app.jinja_env.bytecode_cache = bytecode_cache
+    app.jinja_env.globals.update(cached_row=cached_row)
+
+    max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', DEFAULT_FRAGMENT_MAX_ENTRIES)
+    _fragments = LRUCache(
+        max_entries=max_entries,
+        ttl=app.config.get('FRAGMENT_CACHE_TTL', DEFAULT_FRAGMENT_TTL)
+    ) if max_entries else None
+
+    log.info(f"[template_cache] Bytecode cache: {type(bytecode_cache).__name__ if bytecode_cache else 'wylaczony'}, "
+             f"cache fragmentow: {max_entries or 'wylaczony'} wpisow")
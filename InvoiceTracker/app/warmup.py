@@ -0,0 +1,123 @@
+"""
+Rozgrzewanie instancji App Engine (GET /_ah/warmup).
+
+App Engine wysyla zadanie rozgrzewajace do nowej instancji zanim skieruje
+na nia ruch (app.yaml: inbound_services: - warmup). Bez niego koszt
+zimnego startu placi pierwsze zadanie uzytkownika:
+- polaczenia z baza (Cloud SQL przez unix socket, pre-ping),
+- kompilacja szablonow Jinja,
+- konfiguracja mapperow SQLAlchemy, obiekt Fernet (credentials kont),
+- import modulow ladowanych leniwie (providerzy API faktur, requests).
+
+Rozgrzewka jest jednorazowa w procesie - kolejne wywolania nic nie robia.
+"""
+import importlib
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+
+log = logging.getLogger(__name__)
+
+# Szablony widokow otwieranych zaraz po zalogowaniu
+WARMUP_TEMPLATES = (
+    'layout.html',
+    'layout_auth.html',
+    'login.html',
+    'select_account.html',
+    'cases.html',
+    'completed.html',
+    'case_rows.html',
+    'client_cases.html',
+    'case_detail.html',
+    'clients.html',
+)
+
+# Moduly ladowane leniwie przy starcie, potrzebne przy pierwszym sync / logowaniu
+WARMUP_MODULES = (
+    'requests',
+    '.providers.infakt',
+    '.providers.wfirma',
+)
+
+_lock = threading.Lock()
+_result = None
+
+
+def _open_pool_connections(engine):
+    """
+    Otwiera polaczenia puli (do pool_size) i oddaje je do puli jako bezczynne.
+
+    Returns:
+        int: Liczba otwartych polaczen
+    """
+    pool = engine.pool
+    size = pool.size() if isinstance(pool, QueuePool) else 1
+    connections = []
+    try:
+        for _ in range(size):
+            conn = engine.connect()
+            connections.append(conn)
+            conn.execute(text('SELECT 1'))
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def warm_up(app):
+    """
+    Rozgrzewa proces: pula polaczen, szablony, mappery i cache, moduly leniwe.
+
+    Args:
+        app: Instancja Flask application
+
+    Returns:
+        dict: {'already_warm': bool, 'connections': int, 'templates': int,
+               'timings_ms': {etap: ms}}
+    """
+    global _result
+    from .extensions import db
+    from .models import Account
+
+    with _lock:
+        if _result is not None:
+            return {**_result, 'already_warm': True}
+
+        timings = {}
+
+        start = time.perf_counter()
+        connections = sum(_open_pool_connections(engine) for engine in db.engines.values())
+        timings['db_pool'] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        for name in WARMUP_TEMPLATES:
+            app.jinja_env.get_template(name)
+        timings['templates'] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        configure_mappers()
+        Account._get_cipher()
+        timings['caches'] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        for module_name in WARMUP_MODULES:
+            importlib.import_module(module_name, package=__package__)
+        timings['modules'] = _elapsed_ms(start)
+
+        _result = {
+            'already_warm': False,
+            'connections': connections,
+            'templates': len(WARMUP_TEMPLATES),
+            'timings_ms': timings,
+        }
+
+    log.info(f"[warmup] Instancja rozgrzana: {connections} polaczen, {len(WARMUP_TEMPLATES)} szablonow, {timings}")
+    return _result
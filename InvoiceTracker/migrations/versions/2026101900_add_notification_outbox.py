@@ -0,0 +1,53 @@
+"""Add notification_outbox table (transactional outbox for e-mail notifications)
+
+Revision ID: 2026101900_outbox
+Revises: 2025121000_provider_settings
+Create Date: 2026-10-19
+
+Ta migracja:
+1. Tworzy tabele 'notification_outbox' - kolejke zaplanowanych powiadomien
+2. UNIQUE(account_id, invoice_number, stage) - jeden wpis na etap faktury
+3. Indeks (status, available_at) dla pobierania partii przez workery (SKIP LOCKED)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '2026101900_outbox'
+down_revision = '2025121000_provider_settings'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('account_id', sa.Integer(), sa.ForeignKey('account.id'), nullable=False),
+        sa.Column('invoice_id', sa.Integer(), sa.ForeignKey('invoice.id'), nullable=True),
+        sa.Column('invoice_number', sa.String(50), nullable=False),
+        sa.Column('client_id', sa.String(50), nullable=True),
+        sa.Column('email_to', sa.String(255), nullable=True),
+        sa.Column('subject', sa.String(200), nullable=True),
+        sa.Column('body', sa.Text(), nullable=True),
+        sa.Column('stage', sa.String(255), nullable=False),
+        sa.Column('mode', sa.String(20), nullable=True),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('available_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('account_id', 'invoice_number', 'stage', name='uq_outbox_account_invoice_stage'),
+    )
+    op.create_index('ix_notification_outbox_account_id', 'notification_outbox', ['account_id'])
+    op.create_index('idx_outbox_status_available', 'notification_outbox', ['status', 'available_at'])
+    print("[migration] Created 'notification_outbox' table")
+
+
+def downgrade():
+    op.drop_index('idx_outbox_status_available', table_name='notification_outbox')
+    op.drop_index('ix_notification_outbox_account_id', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
+    print("[migration] Dropped 'notification_outbox' table")
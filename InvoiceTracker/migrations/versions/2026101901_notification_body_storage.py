@@ -0,0 +1,173 @@
+"""Content-addressed, compressed storage of NotificationLog bodies
+
+Revision ID: 2026101901_notif_body
+Revises: 2026101900_outbox
+Create Date: 2026-10-19
+
+Ta migracja:
+1. Tworzy tabele 'notification_body' (digest SHA-256 -> tresc skompresowana zlib)
+2. Dodaje notification_log.body_digest (FK) i notification_log.render_params
+3. Dodaje notification_outbox.template_key i notification_outbox.render_params
+4. Przenosi istniejace tresci z notification_log.body do notification_body
+   (identyczne tresci zapisywane raz) i czysci kolumne body
+
+Downgrade odtwarza pelne tresci w notification_log.body.
+"""
+import hashlib
+import json
+import zlib
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+revision = '2026101901_notif_body'
+down_revision = '2026101900_outbox'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+notification_body = sa.table(
+    'notification_body',
+    sa.column('digest', sa.String),
+    sa.column('kind', sa.String),
+    sa.column('template_key', sa.String),
+    sa.column('data', sa.LargeBinary),
+    sa.column('size', sa.Integer),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def _store_bodies(conn, bodies):
+    """Zapisuje tresci (digest -> tekst) pomijajac juz istniejace."""
+    if not bodies:
+        return
+    rows = [{
+        'digest': digest,
+        'kind': 'body',
+        'template_key': None,
+        'data': zlib.compress(body.encode('utf-8'), 9),
+        'size': len(body),
+        'created_at': datetime.utcnow(),
+    } for digest, body in bodies.items()]
+
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        conn.execute(insert(notification_body).on_conflict_do_nothing(), rows)
+    else:
+        existing = {row[0] for row in conn.execute(
+            sa.select(notification_body.c.digest).where(notification_body.c.digest.in_(list(bodies)))
+        )}
+        rows = [row for row in rows if row['digest'] not in existing]
+        if rows:
+            conn.execute(notification_body.insert(), rows)
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    # 1. Tabela tresci
+    op.create_table(
+        'notification_body',
+        sa.Column('digest', sa.String(64), primary_key=True),
+        sa.Column('kind', sa.String(20), nullable=False, server_default='body'),
+        sa.Column('template_key', sa.String(20), nullable=True),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+    print("[migration] Created 'notification_body' table")
+
+    # 2. Kolumny NotificationLog
+    op.add_column('notification_log', sa.Column('body_digest', sa.String(64), nullable=True))
+    op.add_column('notification_log', sa.Column('render_params', sa.Text(), nullable=True))
+    op.create_index('ix_notification_log_body_digest', 'notification_log', ['body_digest'])
+    op.create_foreign_key(
+        'fk_notification_log_body',
+        'notification_log', 'notification_body',
+        ['body_digest'], ['digest']
+    )
+    print("[migration] Added notification_log.body_digest / render_params")
+
+    # 3. Kolumny NotificationOutbox
+    op.add_column('notification_outbox', sa.Column('template_key', sa.String(20), nullable=True))
+    op.add_column('notification_outbox', sa.Column('render_params', sa.Text(), nullable=True))
+    print("[migration] Added notification_outbox.template_key / render_params")
+
+    # 4. Konwersja istniejacych wpisow (partiami)
+    converted = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(text("""
+            SELECT id, body FROM notification_log
+            WHERE body IS NOT NULL AND body_digest IS NULL AND id > :last_id
+            ORDER BY id
+            LIMIT :limit
+        """), {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+
+        bodies = {}
+        updates = []
+        for row in rows:
+            digest = hashlib.sha256(f"body:{row.body}".encode('utf-8')).hexdigest()
+            bodies[digest] = row.body
+            updates.append({'id': row.id, 'digest': digest})
+
+        _store_bodies(conn, bodies)
+        conn.execute(
+            text("UPDATE notification_log SET body_digest = :digest, body = NULL WHERE id = :id"),
+            updates
+        )
+
+        converted += len(rows)
+        last_id = rows[-1].id
+        print(f"[migration] Converted {converted} notification_log rows...")
+
+    print(f"[migration] === SUKCES: {converted} tresci przeniesionych do notification_body ===")
+
+
+def downgrade():
+    conn = op.get_bind()
+
+    # Odtworz pelne tresci w notification_log.body
+    restored = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(text("""
+            SELECT l.id, l.render_params, b.kind, b.data
+            FROM notification_log l
+            JOIN notification_body b ON b.digest = l.body_digest
+            WHERE l.id > :last_id
+            ORDER BY l.id
+            LIMIT :limit
+        """), {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            body = zlib.decompress(row.data).decode('utf-8')
+            if row.kind == 'template':
+                body = body.format(**json.loads(row.render_params or '{}'))
+            updates.append({'id': row.id, 'body': body})
+
+        conn.execute(text("UPDATE notification_log SET body = :body WHERE id = :id"), updates)
+        restored += len(rows)
+        last_id = rows[-1].id
+
+    print(f"[migration] Restored {restored} notification_log bodies")
+
+    op.drop_column('notification_outbox', 'render_params')
+    op.drop_column('notification_outbox', 'template_key')
+
+    op.drop_constraint('fk_notification_log_body', 'notification_log', type_='foreignkey')
+    op.drop_index('ix_notification_log_body_digest', table_name='notification_log')
+    op.drop_column('notification_log', 'render_params')
+    op.drop_column('notification_log', 'body_digest')
+
+    op.drop_table('notification_body')
+    print("[migration] Dropped 'notification_body' table")
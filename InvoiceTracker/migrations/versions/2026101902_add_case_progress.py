@@ -0,0 +1,71 @@
+"""Add denormalized Case.max_stage / last_notified_at
+
+Revision ID: 2026101902_case_progress
+Revises: 2026101901_notif_body
+Create Date: 2026-10-19
+
+Ta migracja:
+1. Dodaje case.max_stage (0-5) i case.last_notified_at
+2. Indeks (account_id, status, max_stage) dla sortowania po postepie
+3. Wypelnia kolumny z notification_log (UPDATE...FROM PostgreSQL)
+
+Pozniejsza naprawa/ponowne przeliczenie: flask backfill-case-progress
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+revision = '2026101902_case_progress'
+down_revision = '2026101901_notif_body'
+branch_labels = None
+depends_on = None
+
+# Zamrozona kopia STAGE_MAPPING_PROGRESS z chwili migracji
+STAGE_NUMBERS = {
+    "Przypomnienie o zbliżającym się terminie płatności": 1,
+    "Powiadomienie o upływie terminu płatności": 2,
+    "Wezwanie do zapłaty": 3,
+    "Powiadomienie o zamiarze skierowania sprawy do windykatora zewnętrznego i publikacji na giełdzie wierzytelności": 4,
+    "Przekazanie sprawy do windykatora zewnętrznego": 5,
+}
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    op.add_column('case', sa.Column('max_stage', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('case', sa.Column('last_notified_at', sa.DateTime(), nullable=True))
+    op.create_index('idx_case_account_status_max_stage', 'case', ['account_id', 'status', 'max_stage'])
+    print("[migration] Dodano case.max_stage / case.last_notified_at")
+
+    # Numer etapu z tekstu logu (czesc przed " (" - jak utils.stage_to_number)
+    stage_case = "CASE split_part(l.stage, ' (', 1) " + " ".join(
+        f"WHEN :stage_{num} THEN {num}" for num in STAGE_NUMBERS.values()
+    ) + " ELSE 0 END"
+    params = {f"stage_{num}": name for name, num in STAGE_NUMBERS.items()}
+
+    result = conn.execute(text(f"""
+        UPDATE "case"
+        SET max_stage = p.max_stage,
+            last_notified_at = p.last_notified_at
+        FROM (
+            SELECT l.account_id,
+                   l.invoice_number,
+                   MAX({stage_case}) AS max_stage,
+                   MAX(CASE WHEN ({stage_case}) > 0 THEN l.sent_at END) AS last_notified_at
+            FROM notification_log l
+            GROUP BY l.account_id, l.invoice_number
+        ) p
+        WHERE "case".account_id = p.account_id
+          AND "case".case_number = p.invoice_number
+          AND p.max_stage > 0
+    """), params)
+    print(f"[migration] Wypelniono postep dla {result.rowcount} spraw")
+
+
+def downgrade():
+    op.drop_index('idx_case_account_status_max_stage', table_name='case')
+    op.drop_column('case', 'last_notified_at')
+    op.drop_column('case', 'max_stage')
+    print("[migration] Usunieto case.max_stage / case.last_notified_at")
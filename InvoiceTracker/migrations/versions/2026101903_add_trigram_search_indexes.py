@@ -0,0 +1,70 @@
+"""Add pg_trgm GIN indexes for case list search
+
+Revision ID: 2026101903_trgm
+Revises: 2026101902_case_progress
+Create Date: 2026-10-19
+
+Ta migracja:
+1. Instaluje rozszerzenie pg_trgm (CREATE EXTENSION IF NOT EXISTS)
+2. Tworzy indeksy GIN (gin_trgm_ops) na kolumnach wyszukiwania:
+   - case: case_number, client_id, client_company_name
+   - invoice: client_nip, client_email
+
+Jesli rozszerzenia nie da sie zainstalowac (brak uprawnien) lub baza nie jest
+PostgreSQL - migracja pomija indeksy, a search_service uzywa zwyklego ILIKE.
+"""
+from alembic import op
+from sqlalchemy import text
+
+
+revision = '2026101903_trgm'
+down_revision = '2026101902_case_progress'
+branch_labels = None
+depends_on = None
+
+TRGM_INDEXES = [
+    ('idx_case_case_number_trgm', 'case', 'case_number'),
+    ('idx_case_client_id_trgm', 'case', 'client_id'),
+    ('idx_case_client_company_name_trgm', 'case', 'client_company_name'),
+    ('idx_invoice_client_nip_trgm', 'invoice', 'client_nip'),
+    ('idx_invoice_client_email_trgm', 'invoice', 'client_email'),
+]
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    if conn.dialect.name != 'postgresql':
+        print("[migration] Baza nie jest PostgreSQL - pomijam indeksy trigramowe")
+        return
+
+    # SAVEPOINT - brak uprawnien do CREATE EXTENSION nie przerywa calej migracji
+    savepoint = conn.begin_nested()
+    try:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        savepoint.commit()
+    except Exception as e:
+        savepoint.rollback()
+        print(f"[migration] UWAGA: Nie udalo sie zainstalowac pg_trgm ({e}) - wyszukiwanie uzyje ILIKE")
+        return
+
+    for index_name, table_name, column_name in TRGM_INDEXES:
+        op.create_index(
+            index_name,
+            table_name,
+            [column_name],
+            postgresql_using='gin',
+            postgresql_ops={column_name: 'gin_trgm_ops'}
+        )
+        print(f"[migration] Utworzono indeks {index_name}")
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        return
+
+    for index_name, table_name, _ in TRGM_INDEXES:
+        op.execute(text(f'DROP INDEX IF EXISTS {index_name}'))
+        print(f"[migration] Usunieto indeks {index_name}")
+    # Rozszerzenie pg_trgm pozostaje (moze byc uzywane poza aplikacja)
@@ -0,0 +1,33 @@
+"""Add Account.data_version / data_changed_at
+
+Revision ID: 2026101904_data_version
+Revises: 2026101903_trgm
+Create Date: 2026-10-19
+
+Ta migracja:
+1. Dodaje account.data_version (licznik zmian danych konta, start 0)
+2. Dodaje account.data_changed_at (czas ostatniej zmiany - Last-Modified)
+
+Licznik jest zwiekszany w transakcjach zapisujacych dane konta
+(models.bump_account_data_version).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '2026101904_data_version'
+down_revision = '2026101903_trgm'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('account', sa.Column('data_version', sa.BigInteger(), nullable=False, server_default='0'))
+    op.add_column('account', sa.Column('data_changed_at', sa.DateTime(), nullable=True))
+    print("[migration] Dodano account.data_version / account.data_changed_at")
+
+
+def downgrade():
+    op.drop_column('account', 'data_changed_at')
+    op.drop_column('account', 'data_version')
+    print("[migration] Usunieto account.data_version / account.data_changed_at")
@@ -0,0 +1,97 @@
+"""Add client ledger table with precomputed debt aggregates
+
+Revision ID: 2026101905_client_ledger
+Revises: 2026101904_data_version
+Create Date: 2026-10-19
+
+Ta migracja:
+1. Tworzy tabele 'client' (kartoteka klienta per konto + agregaty spraw)
+2. Dodaje indeks case(account_id, client_id) - przeliczanie klienta i widok klienta
+3. Wypelnia kartoteke jednym INSERT ... SELECT (GROUP BY konto, klient;
+   dane kontaktowe z najnowszej faktury klienta)
+
+Pozniejsza naprawa/przebudowa: flask rebuild-client-ledger
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+revision = '2026101905_client_ledger'
+down_revision = '2026101904_data_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    op.create_table(
+        'client',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('account_id', sa.Integer(), sa.ForeignKey('account.id'), nullable=False),
+        sa.Column('client_id', sa.String(50), nullable=False),
+        sa.Column('company_name', sa.String(200), nullable=True),
+        sa.Column('nip', sa.String(50), nullable=True),
+        sa.Column('email', sa.String(100), nullable=True),
+        sa.Column('address', sa.String(255), nullable=True),
+        sa.Column('open_debt', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('active_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('closed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('oldest_due_date', sa.Date(), nullable=True),
+        sa.Column('max_stage', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('account_id', 'client_id', name='uq_client_account_client_id'),
+    )
+    op.create_index('ix_client_account_id', 'client', ['account_id'])
+    op.create_index('idx_client_account_open_debt', 'client', ['account_id', 'open_debt'])
+    op.create_index('idx_case_account_client', 'case', ['account_id', 'client_id'])
+    print("[migration] Created 'client' table")
+
+    result = conn.execute(text("""
+        INSERT INTO client (account_id, client_id, company_name, nip, email, address,
+                            open_debt, active_count, closed_count, oldest_due_date, max_stage, updated_at)
+        SELECT a.account_id,
+               a.client_id,
+               COALESCE(d.client_company_name, a.case_company_name),
+               COALESCE(d.client_nip, a.case_nip),
+               d.client_email,
+               d.client_address,
+               a.open_debt,
+               a.active_count,
+               a.closed_count,
+               a.oldest_due_date,
+               a.max_stage,
+               CURRENT_TIMESTAMP
+        FROM (
+            SELECT c.account_id,
+                   c.client_id,
+                   MAX(c.client_company_name) AS case_company_name,
+                   MAX(c.client_nip) AS case_nip,
+                   COALESCE(SUM(CASE WHEN c.status = 'active' THEN COALESCE(i.left_to_pay, 0) ELSE 0 END), 0) AS open_debt,
+                   COALESCE(SUM(CASE WHEN c.status = 'active' THEN 1 ELSE 0 END), 0) AS active_count,
+                   COALESCE(SUM(CASE WHEN c.status = 'active' THEN 0 ELSE 1 END), 0) AS closed_count,
+                   MIN(CASE WHEN c.status = 'active' THEN i.payment_due_date END) AS oldest_due_date,
+                   COALESCE(MAX(CASE WHEN c.status = 'active' THEN c.max_stage ELSE 0 END), 0) AS max_stage
+            FROM "case" c
+            LEFT JOIN invoice i ON i.case_id = c.id
+            GROUP BY c.account_id, c.client_id
+        ) a
+        LEFT JOIN (
+            SELECT account_id, client_id, client_company_name, client_nip, client_email, client_address,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY account_id, client_id
+                       ORDER BY invoice_date DESC NULLS LAST, id DESC
+                   ) AS rn
+            FROM invoice
+        ) d ON d.account_id = a.account_id AND d.client_id = a.client_id AND d.rn = 1
+    """))
+    print(f"[migration] Wypelniono kartoteke: {result.rowcount} klientow")
+
+
+def downgrade():
+    op.drop_index('idx_case_account_client', table_name='case')
+    op.drop_index('idx_client_account_open_debt', table_name='client')
+    op.drop_index('ix_client_account_id', table_name='client')
+    op.drop_table('client')
+    print("[migration] Dropped 'client' table")
@@ -0,0 +1,45 @@
+"""Add account_daily_snapshot time-series table
+
+Revision ID: 2026101906_daily_snapshot
+Revises: 2026101905_client_ledger
+Create Date: 2026-10-19
+
+Ta migracja:
+1. Tworzy tabele 'account_daily_snapshot' (jeden wiersz na konto i dzien)
+
+Wiersze zapisuje CRON /cron/daily_snapshot lub flask take-daily-snapshots.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '2026101906_daily_snapshot'
+down_revision = '2026101905_client_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'account_daily_snapshot',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('account_id', sa.Integer(), sa.ForeignKey('account.id'), nullable=False),
+        sa.Column('snapshot_date', sa.Date(), nullable=False),
+        sa.Column('active_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_debt', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('closed_paid_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('closed_unpaid_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('emails_stage_1', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('emails_stage_2', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('emails_stage_3', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('emails_stage_4', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('emails_stage_5', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('account_id', 'snapshot_date', name='uq_snapshot_account_date'),
+    )
+    print("[migration] Created 'account_daily_snapshot' table")
+
+
+def downgrade():
+    op.drop_table('account_daily_snapshot')
+    print("[migration] Dropped 'account_daily_snapshot' table")
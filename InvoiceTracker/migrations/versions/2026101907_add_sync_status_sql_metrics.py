@@ -0,0 +1,31 @@
+"""Add SQL instrumentation columns to sync_status
+
+Revision ID: 2026101907_sync_sql_metrics
+Revises: 2026101906_daily_snapshot
+Create Date: 2026-10-19
+
+Ta migracja:
+1. Dodaje kolumny 'db_queries' i 'db_time' do tabeli 'sync_status'
+
+Kolumny wypelniane tylko przy SQL_INSTRUMENTATION=true (inaczej NULL).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '2026101907_sync_sql_metrics'
+down_revision = '2026101906_daily_snapshot'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('sync_status', sa.Column('db_queries', sa.Integer(), nullable=True))
+    op.add_column('sync_status', sa.Column('db_time', sa.Float(), nullable=True))
+    print("[migration] Added 'db_queries' and 'db_time' columns to 'sync_status'")
+
+
+def downgrade():
+    op.drop_column('sync_status', 'db_time')
+    op.drop_column('sync_status', 'db_queries')
+    print("[migration] Dropped 'db_queries' and 'db_time' columns from 'sync_status'")
@@ -0,0 +1,35 @@
+"""Drop rendered content from sent notification_outbox rows
+
+Revision ID: 2026101908_compact_sent_outbox
+Revises: 2026101907_sync_sql_metrics
+Create Date: 2026-10-19
+
+Ta migracja:
+1. Czysci 'body' i 'render_params' wpisow 'notification_outbox' o statusie 'sent'
+
+Tresc wyslanych powiadomien jest przechowywana w 'notification_log'
+(NotificationLog.set_body). Nowe wpisy sa czyszczone przy wysylce
+(outbox_service.deliver_entry), a stare wpisy zakonczone usuwa purge_outbox.
+"""
+from alembic import op
+from sqlalchemy import text
+
+
+revision = '2026101908_compact_sent_outbox'
+down_revision = '2026101907_sync_sql_metrics'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    result = conn.execute(text(
+        "UPDATE notification_outbox SET body = NULL, render_params = NULL "
+        "WHERE status = 'sent' AND (body IS NOT NULL OR render_params IS NOT NULL)"
+    ))
+    print(f"[migration] Cleared content of {result.rowcount} sent 'notification_outbox' rows")
+
+
+def downgrade():
+    # Tresci nie da sie odtworzyc - pozostaje w notification_log
+    print("[migration] No-op: sent 'notification_outbox' content is kept in 'notification_log'")
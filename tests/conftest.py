@@ -0,0 +1,48 @@
+"""
+Wspolne fixtures testow - aplikacja na SQLite (plik tymczasowy).
+
+Uruchomienie (katalog glowny repozytorium):
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+_DB_DIR = tempfile.mkdtemp(prefix='invoicetracker-tests-')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+
+
+@pytest.fixture
+def app():
+    """Aplikacja z pusta baza (schemat z modeli - db.create_all)."""
+    from InvoiceTracker.app import create_app
+    from InvoiceTracker.app.extensions import db
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def account(app):
+    """Aktywne konto testowe."""
+    from InvoiceTracker.app.extensions import db
+    from InvoiceTracker.app.models import Account
+    from InvoiceTracker.app.tenant_context import sudo
+
+    with sudo():
+        account = Account(name='Test', is_active=True)
+        db.session.add(account)
+        db.session.commit()
+    return account
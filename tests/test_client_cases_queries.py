@@ -0,0 +1,76 @@
+"""
+Regresja N+1 widoku spraw klienta (case_service.get_client_cases).
+
+Liczba zapytan SQL nie moze zalezec od liczby spraw klienta.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from InvoiceTracker.app.extensions import db
+from InvoiceTracker.app.models import Case, Invoice
+from InvoiceTracker.app.services import case_service
+from InvoiceTracker.app.tenant_context import tenant_context
+
+CLIENT_ID = 'C1'
+
+
+def _add_cases(account_id, start, count):
+    """Dodaje sprawy klienta z fakturami (co trzecia zamknieta)."""
+    for i in range(start, start + count):
+        case = Case(
+            case_number=f"FV/{i}",
+            account_id=account_id,
+            client_id=CLIENT_ID,
+            client_company_name='Firma',
+            status='closed_oplacone' if i % 3 == 2 else 'active',
+            max_stage=i % 6,
+        )
+        db.session.add(case)
+        db.session.flush()
+        db.session.add(Invoice(
+            account_id=account_id,
+            invoice_number=f"FV/{i}",
+            invoice_date=date.today() - timedelta(days=30 + i),
+            payment_due_date=date.today() - timedelta(days=i),
+            gross_price=10000,
+            left_to_pay=10000,
+            paid_price=0,
+            status='sent',
+            client_id=CLIENT_ID,
+            client_company_name='Firma',
+            client_email=f"c{i}@example.com",
+            case_id=case.id,
+            currency='PLN',
+        ))
+    db.session.commit()
+
+
+def _count_queries(account_id):
+    """Liczba zapytan SQL wykonanych przez get_client_cases."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        db.session.expire_all()
+        result = case_service.get_client_cases(account_id, CLIENT_ID)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements), result
+
+
+def test_client_cases_query_count_does_not_grow_with_cases(account):
+    with tenant_context(account.id):
+        _add_cases(account.id, 0, 2)
+        few_queries, few = _count_queries(account.id)
+
+        _add_cases(account.id, 2, 18)
+        many_queries, many = _count_queries(account.id)
+
+    assert len(few['active_cases']) + len(few['completed_cases']) == 2
+    assert len(many['active_cases']) + len(many['completed_cases']) == 20
+    assert many_queries == few_queries